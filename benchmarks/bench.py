@@ -0,0 +1,258 @@
+"""Benchmark các đường nóng ở tầng service, không cần Tk.
+
+    python -m benchmarks.bench seed --database cafetlu_bench --orders 1000000
+    python -m benchmarks.bench run --database cafetlu_bench --output before.json
+    python -m benchmarks.bench compare before.json after.json
+
+Kết quả JSON gồm p50/p95/p99 (ms) và throughput (ops/s) cho từng kịch bản.
+"""
+from datetime import datetime
+import subprocess
+import argparse
+import platform
+import math
+import tempfile
+import random
+import json
+import time
+import sys
+import os
+
+
+def percentile(samples, p):
+    """Percentile theo nearest-rank trên danh sách đã sắp xếp"""
+    rank = math.ceil(p / 100 * len(samples))
+    return samples[max(0, min(len(samples), rank) - 1)]
+
+
+def measure(fn, iterations, warmup=3):
+    """Chạy fn nhiều lần, trả về thống kê độ trễ (ms) và throughput"""
+    for _ in range(warmup):
+        fn()
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'iterations': iterations,
+        'mean_ms': sum(latencies) / len(latencies),
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': latencies[-1],
+        'throughput_ops': iterations / elapsed if elapsed else None,
+    }
+
+
+def build_scenarios(rng, output_dir):
+    """Các kịch bản benchmark: tên -> (hàm, hệ số số lần lặp)"""
+    from services.menu import MenuService
+    from services.order import OrderService
+    from services.sales import SalesService
+    from services.cart import Cart
+    from utils.exporter import PDFExporter, get_receipt_template
+
+    menu_service = MenuService()
+    order_service = OrderService()
+    sales_service = SalesService()
+
+    menu = menu_service.get_available_coffees()
+    if not menu:
+        raise SystemExit("Database chưa có menu, hãy chạy 'seed' trước")
+    user_ids = [1]
+    keywords = ["cà", "phê", "trà", "latte", "sữa", "bạc", "x", "ca phe sua", "capucino"]
+
+    def random_cart():
+        cart = Cart()
+        for item in rng.sample(menu, k=min(len(menu), rng.randint(1, 5))):
+            cart.add(item, rng.choice("SML"), rng.randint(1, 3))
+        return cart.to_items()
+
+    def cart_updates():
+        # Mô phỏng một ca bán: thêm, sửa số lượng, xóa từng dòng
+        cart = Cart()
+        for item in rng.sample(menu, k=min(len(menu), 20)):
+            cart.add(item, rng.choice("SML"), 1)
+        for line in cart:
+            cart.set_quantity(line.item_id, line.size, line.quantity + 2)
+        for line in cart:
+            cart.remove(line.item_id, line.size)
+
+    def checkout():
+        order_service.create_order(rng.choice(user_ids), random_cart())
+
+    def menu_cold_load():
+        menu_service.cache.invalidate()
+        menu_service.get_available_coffees()
+
+    first_page = {}
+
+    def orders_first_page():
+        rows, cursor = order_service.get_orders_page(limit=200)
+        first_page['cursor'] = cursor
+
+    def orders_next_page():
+        order_service.get_orders_page(limit=200, after=first_page.get('cursor'))
+
+    receipt_cart = random_cart()
+    # Giỏ dài hơn một trang để đo cả phần chia trang
+    long_cart = [
+        dict(receipt_cart[index % len(receipt_cart)], name=f"{receipt_cart[index % len(receipt_cart)]['name']} {index}")
+        for index in range(60)
+    ]
+    template = get_receipt_template()
+
+    def pdf_export():
+        PDFExporter.export_order(0, receipt_cart, "Tổng tiền: 100,000 VND", output_dir=output_dir)
+
+    def receipt_render():
+        template.render(0, receipt_cart, "100,000 VND")
+
+    def receipt_render_long():
+        template.render(0, long_cart, "100,000 VND")
+
+    return {
+        'checkout': (checkout, 1),
+        'cart_updates': (cart_updates, 10),
+        'menu_search': (lambda: menu_service.search_items(rng.choice(keywords)), 10),
+        'menu_filter_by_temp': (lambda: menu_service.get_available_coffees_by_temp(rng.choice(("hot", "cold", "both"))), 10),
+        'menu_get_item': (lambda: menu_service.get_item_by_id(rng.choice(menu)['item_id']), 10),
+        'menu_cold_load': (menu_cold_load, 1),
+        'sales_daily': (sales_service.get_daily_sales, 1),
+        'sales_monthly': (sales_service.get_monthly_sales, 1),
+        'sales_yearly': (sales_service.get_yearly_sales, 1),
+        'orders_first_page': (orders_first_page, 1),
+        'orders_next_page': (orders_next_page, 1),
+        'order_details': (lambda: order_service.get_order_details(rng.randint(1, 1000)), 1),
+        'pdf_export': (pdf_export, 1),
+        'receipt_render': (receipt_render, 1),
+        'receipt_render_long': (receipt_render_long, 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as output_dir:
+        scenarios = build_scenarios(rng, output_dir)
+        selected = args.only or list(scenarios)
+        unknown = set(selected) - set(scenarios)
+        if unknown:
+            raise SystemExit(f"Không có kịch bản: {', '.join(sorted(unknown))}")
+        results = {}
+        for name in selected:
+            fn, factor = scenarios[name]
+            print(f"- {name} ...", file=sys.stderr)
+            results[name] = measure(fn, args.iterations * factor, warmup=args.warmup)
+
+    from services.order import OrderService
+    from database.db import get_pool
+    from database import metrics
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'database': os.getenv("DB_NAME"),
+        'iterations': args.iterations,
+        'results': results,
+        'checkout_stats': OrderService.checkout_stats(),
+        'pool': get_pool().stats(),
+        'db_metrics': metrics.registry.snapshot(),
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False, default=str)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+
+
+def compare(args):
+    """So sánh hai file kết quả, in thay đổi p50/p95/p99 theo %"""
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    with open(args.candidate, encoding='utf-8') as f:
+        candidate = json.load(f)['results']
+
+    print(f"{'scenario':<22}{'p50':>12}{'p95':>12}{'p99':>12}")
+    for name in sorted(set(baseline) & set(candidate)):
+        cells = []
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            before, after = baseline[name][key], candidate[name][key]
+            change = (after - before) / before * 100 if before else 0
+            cells.append(f"{change:+.1f}%")
+        print(f"{name:<22}" + "".join(f"{cell:>12}" for cell in cells))
+
+
+def seed_command(args):
+    from benchmarks.seed import seed
+    from database.db import Database
+    from services.sales import SalesService
+
+    db = Database()
+    summary = seed(db, menu_size=args.menu_size, orders=args.orders, staff=args.staff,
+                   days=args.days, batch_size=args.batch_size, seed_value=args.seed)
+    SalesService(db).rebuild()
+    print(json.dumps(summary, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CafeTLU service layer")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = sub.add_parser("seed", help="Tạo dữ liệu giả (XÓA dữ liệu cũ của database)")
+    seed_parser.add_argument("--database", required=True, help="Tên database riêng cho benchmark")
+    seed_parser.add_argument("--force", action="store_true", help="Cho phép seed vào DB_NAME đang cấu hình")
+    seed_parser.add_argument("--menu-size", type=int, default=50)
+    seed_parser.add_argument("--orders", type=int, default=10000)
+    seed_parser.add_argument("--staff", type=int, default=5)
+    seed_parser.add_argument("--days", type=int, default=365)
+    seed_parser.add_argument("--batch-size", type=int, default=5000)
+    seed_parser.add_argument("--seed", type=int, default=42)
+
+    run_parser = sub.add_parser("run", help="Chạy benchmark và in kết quả JSON")
+    run_parser.add_argument("--database", required=True, help="Tên database riêng cho benchmark")
+    run_parser.add_argument("--iterations", type=int, default=100)
+    run_parser.add_argument("--warmup", type=int, default=3)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--only", nargs="+", help="Chỉ chạy các kịch bản này")
+    run_parser.add_argument("--output", help="Ghi kết quả JSON ra file")
+
+    compare_parser = sub.add_parser("compare", help="So sánh hai file kết quả")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        return compare(args)
+
+    # Phải đặt trước khi pool kết nối được tạo
+    from utils.config import load_env
+    load_env()
+    if args.command == "seed" and args.database == os.getenv("DB_NAME") and not args.force:
+        raise SystemExit("Không seed vào database đang dùng cho cửa hàng (dùng --force nếu chắc chắn)")
+    os.environ["DB_NAME"] = args.database
+
+    if args.command == "seed":
+        seed_command(args)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Tạo dữ liệu giả cho benchmark trên một database MySQL riêng.
+
+Ví dụ chạy MySQL bằng Docker:
+    docker run -d --name cafetlu-bench -e MYSQL_ROOT_PASSWORD=bench \\
+        -e MYSQL_DATABASE=cafetlu_bench -p 3307:3306 mysql:8
+rồi đặt DB_HOST=127.0.0.1 DB_PORT=3307 DB_USER=root DB_PASSWORD=bench.
+"""
+from database.migrations import migrate
+from datetime import datetime, timedelta
+import random
+import time
+
+DRINKS = [
+    "Cà phê đen", "Cà phê sữa", "Bạc xỉu", "Cappuccino", "Latte", "Espresso",
+    "Trà đào", "Trà sữa", "Sinh tố bơ", "Nước cam", "Cacao", "Matcha đá xay",
+]
+
+
+def seed(db, menu_size=50, orders=10000, staff=5, days=365, max_lines=4, batch_size=5000, seed_value=42):
+    """Xóa dữ liệu cũ và sinh menu, nhân viên, hóa đơn ngẫu nhiên (có seed cố định)"""
+    rng = random.Random(seed_value)
+    migrate(db)
+
+    with db.transaction() as cursor:
+        for table in ("order_details", "orders", "menu", "users"):
+            cursor.execute(f"DELETE FROM {table}")
+
+        cursor.executemany(
+            "INSERT INTO users (user_id, username, password_hash, role) VALUES (%s, %s, %s, %s)",
+            [(i, f"staff{i}", "x", 'staff') for i in range(1, staff + 1)]
+        )
+
+        menu = []
+        for item_id in range(1, menu_size + 1):
+            name = f"{DRINKS[(item_id - 1) % len(DRINKS)]} {item_id}"
+            price = rng.randrange(20, 80) * 1000
+            menu.append((item_id, name, price, rng.choice("SML"), rng.random() > 0.1,
+                         rng.choice(("hot", "cold", "both"))))
+        cursor.executemany(
+            """INSERT INTO menu (item_id, name, price, size, is_available, temperature_type)
+            VALUES (%s, %s, %s, %s, %s, %s)""",
+            menu
+        )
+
+    prices = {row[0]: row[2] for row in menu}
+    start = datetime.now() - timedelta(days=days)
+    span = days * 24 * 3600
+    started = time.perf_counter()
+    detail_id = 0
+
+    for first in range(1, orders + 1, batch_size):
+        order_rows, detail_rows = [], []
+        for order_id in range(first, min(first + batch_size, orders + 1)):
+            total = 0
+            for _ in range(rng.randint(1, max_lines)):
+                item_id = rng.randint(1, menu_size)
+                quantity = rng.randint(1, 3)
+                total += prices[item_id] * quantity
+                detail_id += 1
+                detail_rows.append((detail_id, order_id, item_id, rng.choice("SML"), quantity, prices[item_id]))
+            order_date = start + timedelta(seconds=span * (order_id - 1) / orders)
+            order_rows.append((order_id, rng.randint(1, staff), order_date, total))
+
+        with db.transaction() as cursor:
+            cursor.executemany(
+                "INSERT INTO orders (order_id, user_id, order_date, total) VALUES (%s, %s, %s, %s)",
+                order_rows
+            )
+            cursor.executemany(
+                """INSERT INTO order_details (detail_id, order_id, item_id, size, quantity, unit_price)
+                VALUES (%s, %s, %s, %s, %s, %s)""",
+                detail_rows
+            )
+        done = order_rows[-1][0]
+        print(f"  {done}/{orders} hóa đơn ({time.perf_counter() - started:.1f}s)")
+
+    return {'menu_size': menu_size, 'orders': orders, 'order_lines': detail_id, 'staff': staff, 'days': days}
@@ -1,26 +1,318 @@
 import mysql.connector
-from dotenv import load_dotenv
+from database import metrics
+from utils.config import load_env
+from contextlib import contextmanager
+import itertools
+import threading
+import time
 import os
 
-load_dotenv()
+load_env()
+
+
+class PoolTimeoutError(Exception):
+    """Hết thời gian chờ lấy kết nối từ pool"""
+
+
+class ConnectionPool:
+    """Pool kết nối MySQL có giới hạn, dùng chung cho toàn tiến trình"""
+
+    def __init__(self, size=5, timeout=10.0, idle_timeout=300.0, health_check_after=30.0, **connect_args):
+        self.size = size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self._connect_args = connect_args
+        self._idle = []  # [(connection, thời điểm trả về pool)]
+        self._in_use = 0
+        self._waiting = 0
+        self._created = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=None):
+        """Lấy một kết nối, chờ tối đa `timeout` giây nếu pool đã đầy"""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        expired = []
+        conn = released_at = None
+        with self._cond:
+            while True:
+                expired += self._pop_expired()
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    break
+                if self._in_use < self.size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            acquired = conn is not None or self._in_use < self.size
+            if acquired:
+                self._in_use += 1
+
+        self._close_all(expired)
+        if not acquired:
+            raise PoolTimeoutError(
+                f"Không lấy được kết nối sau {timeout}s ({self.size}/{self.size} đang dùng)"
+            )
+        try:
+            if conn is not None and not self._is_healthy(conn, released_at):
+                self._close_all([conn])
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn, discard=False):
+        """Trả kết nối về pool; `discard=True` để đóng hẳn kết nối hỏng"""
+        if not discard:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if not discard:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+        if discard:
+            self._close_all([conn])
+
+    def close(self):
+        """Đóng toàn bộ kết nối đang rảnh"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        self._close_all(conn for conn, _ in idle)
+
+    def stats(self):
+        """Số liệu hiện tại của pool"""
+        with self._cond:
+            return {
+                'size': self.size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                'created': self._created,
+            }
+
+    def _connect(self):
+        conn = mysql.connector.connect(**self._connect_args)
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def _is_healthy(self, conn, released_at):
+        """Chỉ ping lại khi kết nối đã rảnh đủ lâu"""
+        if time.monotonic() - released_at < self.health_check_after:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _pop_expired(self):
+        """Tách các kết nối rảnh quá `idle_timeout` (gọi khi đang giữ lock)"""
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = [conn for conn, released_at in self._idle if released_at < cutoff]
+        if expired:
+            self._idle = [(conn, released_at) for conn, released_at in self._idle if released_at >= cutoff]
+        return expired
+
+    @staticmethod
+    def _close_all(connections):
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+# Lỗi cho thấy không kết nối được MySQL (khác lỗi của chính câu lệnh)
+CONNECTION_ERRORS = (
+    mysql.connector.errors.InterfaceError,
+    mysql.connector.errors.OperationalError,
+    PoolTimeoutError,
+)
+
+# Mã lỗi MySQL: trùng khóa unique, và các lỗi khóa có thể chạy lại transaction
+DUPLICATE_KEY_ERRNO = 1062
+RETRYABLE_ERRNOS = (1205, 1213)  # lock wait timeout, deadlock
+
+# Kiểu dòng trả về: dict (mặc định), tuple hoặc namedtuple để tiết kiệm bộ nhớ
+ROW_TYPES = {
+    'dict': {'dictionary': True},
+    'tuple': {},
+    'namedtuple': {'named_tuple': True},
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Pool dùng chung, cấu hình qua biến môi trường DB_POOL_*"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    size=int(os.getenv("DB_POOL_SIZE", 5)),
+                    timeout=float(os.getenv("DB_POOL_TIMEOUT", 10)),
+                    idle_timeout=float(os.getenv("DB_POOL_IDLE_TIMEOUT", 300)),
+                    host=os.getenv("DB_HOST"),
+                    user=os.getenv("DB_USER"),
+                    password=os.getenv("DB_PASSWORD"),
+                    database=os.getenv("DB_NAME"),
+                    port=int(os.getenv("DB_PORT", 3306)),
+                    connection_timeout=int(os.getenv("DB_CONNECT_TIMEOUT", 5))
+                )
+    return _pool
+
+
+# Lần gọi Database đang được đo trên luồng hiện tại
+_current = threading.local()
+
 
 class Database:
-    def __init__(self):
-        self.connection = mysql.connector.connect(
-            host=os.getenv("DB_HOST"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            database=os.getenv("DB_NAME"),
-            port=3306
-        )
+    def __init__(self, pool=None, registry=None):
+        self.pool = pool or get_pool()
+        self.metrics = registry or metrics.registry
+
+    @contextmanager
+    def _measure(self, kind, query):
+        """Đo thời gian một lần gọi và ghi vào registry, gắn với hàm service đã gọi"""
+        call = metrics.QueryCall(kind, query, metrics.caller_name())
+        outer = getattr(_current, 'call', None)
+        _current.call = call
+        started = time.perf_counter()
+        error = False
+        try:
+            yield call
+        except BaseException:
+            error = True
+            raise
+        finally:
+            _current.call = outer
+            self.metrics.observe(call, (time.perf_counter() - started) * 1000, error)
+
+    def _acquire(self, call=None):
+        started = time.perf_counter()
+        conn = self.pool.acquire()
+        wait_ms = (time.perf_counter() - started) * 1000
+        self.metrics.observe_wait(wait_ms)
+        call = call or getattr(_current, 'call', None)
+        if call is not None:
+            call.wait_ms += wait_ms
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Mượn một kết nối từ pool và luôn trả lại khi xong"""
+        conn = self._acquire()
+        discard = False
+        try:
+            yield conn
+        except (mysql.connector.errors.InterfaceError, mysql.connector.errors.OperationalError):
+            # Lỗi mạng/kết nối: không trả kết nối hỏng về pool
+            discard = True
+            raise
+        finally:
+            self.pool.release(conn, discard=discard)
+
+    @contextmanager
+    def cursor(self, row_type='dict', commit=False):
+        """Mở cursor trên kết nối mượn từ pool, đóng cursor và trả kết nối khi xong"""
+        with self.connection() as conn:
+            cursor = conn.cursor(**ROW_TYPES[row_type])
+            try:
+                yield cursor
+                if commit:
+                    conn.commit()
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def transaction(self, row_type='dict'):
+        """Chạy nhiều câu lệnh trên cùng một kết nối: commit khi xong, rollback khi lỗi"""
+        with self._measure('transaction', None), self.connection() as conn:
+            conn.start_transaction()
+            cursor = conn.cursor(**ROW_TYPES[row_type])
+            try:
+                yield cursor
+                conn.commit()
+            except BaseException:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                raise
+            finally:
+                cursor.close()
 
     def execute(self, query, params=None):
-        cursor = self.connection.cursor()
-        cursor.execute(query, params or ())
-        self.connection.commit()
-        return cursor.lastrowid
-
-    def fetch(self, query, params=None):
-        cursor = self.connection.cursor(dictionary=True)
-        cursor.execute(query, params or ())
-        return cursor.fetchall()
+        with self._measure('execute', query) as call, self.cursor(commit=True) as cursor:
+            cursor.execute(query, params or ())
+            call.rows = max(cursor.rowcount, 0)
+            return cursor.lastrowid
+
+    def fetch(self, query, params=None, row_type='dict'):
+        with self._measure('fetch', query) as call, self.cursor(row_type) as cursor:
+            cursor.execute(query, params or ())
+            rows = cursor.fetchall()
+            call.rows = len(rows)
+            return rows
+
+    def stream(self, query, params=None, batch_size=500, row_type='dict'):
+        """Đọc kết quả theo từng lô qua cursor không đệm (server-side), trả về từng list.
+
+        Thời gian đo chỉ gồm execute và các lần fetchmany, không tính thời
+        gian bên gọi xử lý từng lô.
+        """
+        # Lấy tên nơi gọi ngay lúc gọi, trước khi generator chạy lười
+        call = metrics.QueryCall('stream', query, metrics.caller_name())
+        return self._stream(call, params, batch_size, row_type)
+
+    def _stream(self, call, params, batch_size, row_type):
+        elapsed = 0.0
+        conn = self._acquire(call)
+        exhausted = failed = False
+        try:
+            started = time.perf_counter()
+            cursor = conn.cursor(buffered=False, **ROW_TYPES[row_type])
+            cursor.execute(call.query, params or ())
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                elapsed += time.perf_counter() - started
+                if not rows:
+                    break
+                call.rows += len(rows)
+                yield rows
+                started = time.perf_counter()
+            exhausted = True
+            cursor.close()
+        except Exception:
+            failed = True
+            raise
+        finally:
+            # Dừng giữa chừng thì còn dữ liệu chưa đọc trên kết nối: bỏ kết nối
+            # thay vì đọc nốt phần còn lại
+            self.pool.release(conn, discard=not exhausted)
+            self.metrics.observe(call, elapsed * 1000, error=failed)
+
+    def fetch_iter(self, query, params=None, batch_size=500, row_type='dict'):
+        """Như `stream` nhưng trả về từng dòng"""
+        return itertools.chain.from_iterable(self.stream(query, params, batch_size, row_type))
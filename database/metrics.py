@@ -0,0 +1,198 @@
+"""Số liệu truy vấn trong tiến trình: số lần gọi, số dòng, histogram độ trễ và
+thời gian chờ pool, gắn nhãn theo hàm service gọi tới Database.
+
+Truy vấn chậm hơn DB_SLOW_QUERY_MS (mặc định 200ms) được ghi vào
+slow_queries.log trong thư mục dữ liệu. Đặt DB_METRICS_DUMP=<file>.json hoặc
+<file>.prom để ghi số liệu ra file khi thoát chương trình.
+"""
+from utils.paths import get_data_dir
+from datetime import datetime
+import threading
+import atexit
+import bisect
+import json
+import sys
+import os
+
+# Cận trên (ms) của các bucket histogram, bucket cuối là +Inf
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Module không tính là "nơi gọi" khi dò ngược stack
+INTERNAL_MODULES = ("database.db", "database.metrics", "contextlib")
+
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS_MS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Ước lượng quantile theo cận trên của bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum_ms': round(self.sum, 3),
+            'max_ms': round(self.max, 3),
+            'p50_ms': _round(self.quantile(0.5)),
+            'p95_ms': _round(self.quantile(0.95)),
+            'p99_ms': _round(self.quantile(0.99)),
+        }
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+
+class QueryCall:
+    """Một lần gọi Database đang được đo"""
+    __slots__ = ('kind', 'query', 'caller', 'rows', 'wait_ms')
+
+    def __init__(self, kind, query, caller):
+        self.kind = kind
+        self.query = query
+        self.caller = caller
+        self.rows = 0
+        self.wait_ms = 0.0
+
+
+class MetricsRegistry:
+    """Bộ đếm và histogram theo (loại lệnh, nơi gọi), an toàn đa luồng"""
+
+    def __init__(self, slow_query_ms=None, slow_log_path=None):
+        if slow_query_ms is None:
+            slow_query_ms = float(os.getenv("DB_SLOW_QUERY_MS", 200))
+        self.slow_query_ms = slow_query_ms
+        self.slow_log_path = slow_log_path
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._calls = {}  # (kind, caller) -> [số lần, số lỗi, số dòng]
+            self._latency = {}  # (kind, caller) -> Histogram
+            self._pool_wait = Histogram()
+
+    def observe(self, call, elapsed_ms, error=False):
+        key = (call.kind, call.caller)
+        with self._lock:
+            counters = self._calls.get(key)
+            if counters is None:
+                counters = self._calls[key] = [0, 0, 0]
+                self._latency[key] = Histogram()
+            counters[0] += 1
+            counters[1] += error
+            counters[2] += call.rows
+            self._latency[key].observe(elapsed_ms)
+
+        if elapsed_ms >= self.slow_query_ms:
+            self._log_slow(call, elapsed_ms)
+
+    def observe_wait(self, wait_ms):
+        with self._lock:
+            self._pool_wait.observe(wait_ms)
+
+    def snapshot(self):
+        with self._lock:
+            queries = [
+                {
+                    'kind': kind,
+                    'caller': caller,
+                    'calls': counters[0],
+                    'errors': counters[1],
+                    'rows': counters[2],
+                    **self._latency[(kind, caller)].to_dict(),
+                }
+                for (kind, caller), counters in self._calls.items()
+            ]
+            pool_wait = self._pool_wait.to_dict()
+        queries.sort(key=lambda entry: entry['sum_ms'], reverse=True)
+        return {'queries': queries, 'pool_wait': pool_wait}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, ensure_ascii=False)
+
+    def to_prometheus(self):
+        """Định dạng text của Prometheus"""
+        lines = [
+            "# TYPE cafetlu_db_calls_total counter",
+            "# TYPE cafetlu_db_errors_total counter",
+            "# TYPE cafetlu_db_rows_total counter",
+            "# TYPE cafetlu_db_latency_ms histogram",
+        ]
+        with self._lock:
+            for (kind, caller), (calls, errors, rows) in sorted(self._calls.items()):
+                labels = f'kind="{kind}",caller="{caller}"'
+                lines.append(f"cafetlu_db_calls_total{{{labels}}} {calls}")
+                lines.append(f"cafetlu_db_errors_total{{{labels}}} {errors}")
+                lines.append(f"cafetlu_db_rows_total{{{labels}}} {rows}")
+                lines.extend(self._histogram_lines("cafetlu_db_latency_ms", labels, self._latency[(kind, caller)]))
+            lines.append("# TYPE cafetlu_db_pool_wait_ms histogram")
+            lines.extend(self._histogram_lines("cafetlu_db_pool_wait_ms", "", self._pool_wait))
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Ghi số liệu ra file: .prom cho Prometheus, còn lại là JSON"""
+        text = self.to_prometheus() if path.endswith(".prom") else self.to_json()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    @staticmethod
+    def _histogram_lines(name, labels, histogram):
+        sep = "," if labels else ""
+        cumulative = 0
+        for bound, count in zip(BUCKETS_MS + ("+Inf",), histogram.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}'
+        block = f"{{{labels}}}" if labels else ""
+        yield f"{name}_sum{block} {histogram.sum:.3f}"
+        yield f"{name}_count{block} {histogram.count}"
+
+    def _log_slow(self, call, elapsed_ms):
+        query = " ".join((call.query or "").split())[:1000]
+        line = (
+            f"{datetime.now().isoformat(timespec='milliseconds')}\t{elapsed_ms:.1f}ms\t"
+            f"wait={call.wait_ms:.1f}ms\trows={call.rows}\t{call.kind}\t{call.caller}\t{query}\n"
+        )
+        try:
+            path = self.slow_log_path or os.path.join(get_data_dir(), "slow_queries.log")
+            with self._log_lock, open(path, 'a', encoding='utf-8') as f:
+                f.write(line)
+        except OSError:
+            pass  # Không ghi được log thì bỏ qua, không làm hỏng truy vấn
+
+
+def caller_name():
+    """Hàm đầu tiên ngoài tầng database trên stack, vd. services.order.OrderService.get_all_orders"""
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get('__name__') in INTERNAL_MODULES:
+        frame = frame.f_back
+    if frame is None:
+        return "?"
+    return f"{frame.f_globals.get('__name__')}.{frame.f_code.co_qualname}"
+
+
+registry = MetricsRegistry()
+
+if os.getenv("DB_METRICS_DUMP"):
+    atexit.register(registry.dump, os.getenv("DB_METRICS_DUMP"))
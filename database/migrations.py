@@ -0,0 +1,216 @@
+"""Quản lý schema theo phiên bản.
+
+    python -m database.migrations migrate   # áp dụng các migration còn thiếu
+    python -m database.migrations status    # xem phiên bản hiện tại
+
+Mỗi bước đều idempotent (CREATE ... IF NOT EXISTS, kiểm tra index/cột trước
+khi thêm) vì DDL của MySQL tự commit, không rollback được khi lỗi giữa chừng.
+
+Migrate là bước khi triển khai, không chạy lúc mở app: ứng dụng chỉ kiểm tra
+phiên bản schema. Nhiều máy chạy migrate cùng lúc thì lần lượt qua GET_LOCK.
+"""
+from database.db import Database
+from contextlib import contextmanager
+import argparse
+
+MIGRATION_LOCK = "cafetlu_migrate"
+
+
+def create_index(table, name, columns, unique=False):
+    """Bước migration: tạo index nếu chưa có"""
+    def step(db):
+        exists = db.fetch(
+            """SELECT 1 FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1""",
+            (table, name)
+        )
+        if not exists:
+            kind = "UNIQUE INDEX" if unique else "INDEX"
+            db.execute(f"CREATE {kind} {name} ON {table} ({columns})")
+    return step
+
+
+def add_column(table, name, definition):
+    """Bước migration: thêm cột nếu chưa có"""
+    def step(db):
+        exists = db.fetch(
+            """SELECT 1 FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s LIMIT 1""",
+            (table, name)
+        )
+        if not exists:
+            db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+    return step
+
+
+# Dòng đơn cũ chưa có đơn giá: lấy giá menu hiện tại (gần đúng nhất còn lại)
+BACKFILL_UNIT_PRICE = """UPDATE order_details od
+JOIN menu m ON m.item_id = od.item_id
+SET od.unit_price = m.price
+WHERE od.unit_price IS NULL"""
+
+
+def rebuild_sales_rollups(db):
+    from services.sales import SalesService
+    SalesService(db).rebuild()
+
+
+# (phiên bản, mô tả, các bước: câu SQL hoặc hàm nhận Database)
+MIGRATIONS = [
+    (1, "Bảng users, menu, orders, order_details", [
+        """CREATE TABLE IF NOT EXISTS users (
+            user_id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(50) NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            role VARCHAR(10) NOT NULL DEFAULT 'staff'
+        )""",
+        """CREATE TABLE IF NOT EXISTS menu (
+            item_id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            price DECIMAL(10, 2) NOT NULL,
+            size VARCHAR(5) NOT NULL DEFAULT 'S',
+            description TEXT,
+            is_available BOOLEAN NOT NULL DEFAULT TRUE,
+            temperature_type VARCHAR(10) NOT NULL DEFAULT 'hot'
+        )""",
+        """CREATE TABLE IF NOT EXISTS orders (
+            order_id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT,
+            order_date DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            total DECIMAL(12, 2) NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS order_details (
+            detail_id INT AUTO_INCREMENT PRIMARY KEY,
+            order_id INT NOT NULL,
+            item_id INT NOT NULL,
+            size VARCHAR(5) NOT NULL,
+            quantity INT NOT NULL
+        )""",
+    ]),
+    (2, "Index cho các truy vấn nóng", [
+        create_index("users", "uq_users_username", "username", unique=True),
+        create_index("users", "idx_users_role", "role"),
+        create_index("menu", "idx_menu_available_temp", "is_available, temperature_type"),
+        create_index("orders", "idx_orders_date", "order_date, order_id"),
+        create_index("orders", "idx_orders_user_date", "user_id, order_date"),
+        create_index("order_details", "idx_order_details_order", "order_id"),
+    ]),
+    (3, "menu.updated_at cho kiểm tra phiên bản cache", [
+        add_column("menu", "updated_at",
+                   "TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"),
+        create_index("menu", "idx_menu_updated_at", "updated_at"),
+    ]),
+    (4, "Bảng tổng hợp doanh số theo ngày", [
+        """CREATE TABLE IF NOT EXISTS sales_daily (
+            sale_date DATE NOT NULL PRIMARY KEY,
+            total_orders INT NOT NULL DEFAULT 0,
+            total_cups INT NOT NULL DEFAULT 0,
+            total_revenue DECIMAL(14, 2) NOT NULL DEFAULT 0
+        )""",
+        """CREATE TABLE IF NOT EXISTS sales_daily_item (
+            sale_date DATE NOT NULL,
+            item_id INT NOT NULL,
+            size VARCHAR(5) NOT NULL,
+            total_cups INT NOT NULL DEFAULT 0,
+            total_revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (sale_date, item_id, size)
+        )""",
+        """CREATE TABLE IF NOT EXISTS sales_daily_staff (
+            sale_date DATE NOT NULL,
+            user_id INT NOT NULL,
+            total_orders INT NOT NULL DEFAULT 0,
+            total_cups INT NOT NULL DEFAULT 0,
+            total_revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (sale_date, user_id)
+        )""",
+        # Số liệu được tính ở migration 6, khi dòng đơn đã có đơn giá
+    ]),
+    (5, "orders.idempotency_key chống tạo đơn trùng khi gửi lại", [
+        add_column("orders", "idempotency_key", "VARCHAR(64) NULL"),
+        create_index("orders", "uq_orders_idempotency_key", "idempotency_key", unique=True),
+    ]),
+    (6, "order_details.unit_price: đơn giá lúc bán cho doanh thu theo món", [
+        add_column("order_details", "unit_price", "DECIMAL(10, 2) NULL"),
+        BACKFILL_UNIT_PRICE,
+        rebuild_sales_rollups,
+    ]),
+]
+
+SCHEMA_TABLE = """CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+)"""
+
+
+@contextmanager
+def migration_lock(db, timeout=60):
+    """Giữ khóa tên MIGRATION_LOCK của MySQL trên một kết nối riêng trong lúc migrate"""
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK, timeout))
+            if cursor.fetchone()[0] != 1:
+                raise Exception(f"Lỗi migrate: máy khác đang migrate quá {timeout}s")
+            try:
+                yield
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+                cursor.fetchone()
+        finally:
+            cursor.close()
+
+
+def check_schema(db=None):
+    """Báo lỗi nếu database chưa được migrate tới phiên bản mà ứng dụng cần"""
+    version, latest = current_version(db), MIGRATIONS[-1][0]
+    if version < latest:
+        raise Exception(
+            f"Lỗi schema: database ở phiên bản {version}, cần {latest}. "
+            "Chạy: python -m database.migrations migrate"
+        )
+
+
+def current_version(db=None):
+    db = db or Database()
+    db.execute(SCHEMA_TABLE)
+    return db.fetch("SELECT COALESCE(MAX(version), 0) as version FROM schema_migrations")[0]['version']
+
+
+def migrate(db=None, target=None):
+    """Áp dụng lần lượt các migration chưa chạy, trả về danh sách phiên bản đã áp dụng"""
+    db = db or Database()
+    applied = []
+    with migration_lock(db):
+        # Đọc phiên bản sau khi có khóa: máy vừa giữ khóa có thể đã migrate xong
+        version = current_version(db)
+        for number, description, steps in MIGRATIONS:
+            if number <= version or (target is not None and number > target):
+                continue
+            for step in steps:
+                if callable(step):
+                    step(db)
+                else:
+                    db.execute(step)
+            db.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                (number, description)
+            )
+            applied.append(number)
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migration schema CafeTLU")
+    parser.add_argument("command", choices=("migrate", "status"))
+    parser.add_argument("--target", type=int, help="Chỉ migrate tới phiên bản này")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        applied = migrate(target=args.target)
+        print(f"Đã áp dụng: {applied}" if applied else "Schema đã ở phiên bản mới nhất")
+    print(f"Phiên bản hiện tại: {current_version()} / {MIGRATIONS[-1][0]}")
+
+
+if __name__ == "__main__":
+    main()
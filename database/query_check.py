@@ -0,0 +1,62 @@
+"""Chạy EXPLAIN cho mọi truy vấn khai báo trong EXPLAIN_QUERIES của các service
+và báo lỗi nếu có truy vấn quét toàn bảng (type = ALL) ngoài danh sách cho phép.
+
+    python -m database.query_check
+
+Nên chạy trên database đã migrate và có dữ liệu (vd. database benchmark), vì
+với bảng gần rỗng MySQL có thể chọn quét toàn bảng dù có index.
+"""
+from database.db import Database
+import importlib
+import sys
+
+SERVICE_MODULES = ("services.menu", "services.order", "services.sales", "services.auth", "services.analytics",
+                   "services.export", "services.zreport")
+
+# Dòng EXPLAIN cho bảng đích của INSERT luôn có type = ALL, không phải quét
+IGNORED_SELECT_TYPES = ("INSERT", "REPLACE")
+
+
+def collect_queries():
+    for module_name in SERVICE_MODULES:
+        module = importlib.import_module(module_name)
+        yield from module.EXPLAIN_QUERIES
+
+
+def full_scans(plan):
+    """Các bảng bị quét toàn bộ trong kết quả EXPLAIN (bỏ qua bảng dẫn xuất <derivedN>)"""
+    return [
+        row['table'] for row in plan
+        if row.get('type') == 'ALL'
+        and row.get('select_type') not in IGNORED_SELECT_TYPES
+        and not str(row.get('table') or '').startswith('<')
+    ]
+
+
+def check(db=None):
+    """Trả về danh sách (tên truy vấn, vấn đề); rỗng nghĩa là đạt"""
+    db = db or Database()
+    problems = []
+    for name, query, params, full_scan_ok in collect_queries():
+        try:
+            plan = db.fetch(f"EXPLAIN {query}", params or None)
+        except Exception as e:
+            problems.append((name, f"EXPLAIN lỗi: {str(e)}"))
+            continue
+        scanned = full_scans(plan)
+        if scanned and not full_scan_ok:
+            problems.append((name, f"quét toàn bảng {', '.join(scanned)}"))
+    return problems
+
+
+def main():
+    problems = check()
+    for name, problem in problems:
+        print(f"FAIL {name}: {problem}")
+    if problems:
+        sys.exit(1)
+    print("Tất cả truy vấn đều dùng index")
+
+
+if __name__ == "__main__":
+    main()
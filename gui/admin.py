@@ -1,9 +1,16 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from typing import Dict, List, Tuple, Optional
+from datetime import datetime, date, timedelta
 from services.menu import MenuService
 from services.auth import create_staff, check_username_exists
 from services.order import OrderService
+from services.sales import SalesService
+from services.export import OrderExporter, ExportCancelled
+from gui.tasks import TaskRunner, LoadingIndicator
+from gui.tree_binding import TreeBinding
+import threading
+import os
 
 
 class AdminDashboard:
@@ -26,13 +33,28 @@ class AdminDashboard:
         'both': 'Cả hai 🌡️'
     }
 
+    ORDER_PAGE_SIZE = 200
+    STATISTICS_DAYS = 30
+    WEEKDAYS = ("Thứ 2", "Thứ 3", "Thứ 4", "Thứ 5", "Thứ 6", "Thứ 7", "CN")
+    EXPORT_FORMATS = {"CSV": "csv", "CSV nén (gzip)": "csv.gz", "Parquet": "parquet"}
+    ALL_STAFF_LABEL = "Tất cả"
+
     def __init__(self):
         self.window = self._configure_window()
+        self.tasks = TaskRunner(self.window)
+        self.window.bind("<Destroy>", self._on_destroy)
         self.menu_service = MenuService()
         self.selected_item: Optional[Dict] = None
         self.order_service = OrderService()
         self.current_tab = 0
 
+        # Trạng thái phân trang hóa đơn
+        self._order_filters: Dict = {}
+        self._order_cursor = None
+        self._order_has_more = False
+        self._order_loading = False
+        self._staff_ids: Dict[str, Optional[int]] = {self.ALL_STAFF_LABEL: None}
+
         self._setup_styles()
         self._build_main_layout()
         self.load_data()
@@ -81,6 +103,10 @@ class AdminDashboard:
         self._add_sidebar_title(sidebar)
         self._add_sidebar_buttons(sidebar)
 
+        # Chỉ báo đang tải
+        self.loading = LoadingIndicator(sidebar, side=tk.BOTTOM, pady=10)
+        self.tasks.add_busy_listener(self.loading.set_busy)
+
     def _add_sidebar_title(self, parent):
         """Thêm tiêu đề sidebar"""
         title = tk.Label(
@@ -102,7 +128,10 @@ class AdminDashboard:
             ("Đổi trạng thái", self.toggle_availability),
             ("Tải lại", self.reload_data),
             ("Tạo Staff", self.open_create_staff_dialog),
-            ("Thống kê bán hàng", self.open_sales_statistics)
+            ("Thống kê bán hàng", self.open_sales_statistics),
+            ("Xuất dữ liệu", self.open_export_dialog),
+            ("Báo cáo cuối ngày", self.export_z_report),
+            ("Đơn offline lỗi", self.open_failed_orders_dialog)
         ]
 
         for text, command in buttons:
@@ -196,6 +225,7 @@ class AdminDashboard:
 
         self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         self.tree.bind("<<TreeviewSelect>>", self._on_item_selected)
+        self.menu_binding = TreeBinding(self.tree, key=lambda item: item['item_id'], render=self._menu_row)
 
     def _build_staff_treeview(self, parent):
         """Xây dựng treeview danh sách nhân viên"""
@@ -220,9 +250,41 @@ class AdminDashboard:
             self.staff_tree.column(col, **column_configs[col])
 
         self.staff_tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.staff_binding = TreeBinding(
+            self.staff_tree,
+            key=lambda staff: staff['user_id'],
+            render=lambda staff: (staff['user_id'], staff['username'], staff['role'])
+        )
+
+    def _build_order_filters(self, parent):
+        """Xây dựng thanh lọc hóa đơn theo ngày và nhân viên"""
+        filter_frame = ttk.Frame(parent)
+        filter_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+
+        ttk.Label(filter_frame, text="Từ ngày (dd/mm/yyyy):").pack(side=tk.LEFT)
+        self.order_from_entry = ttk.Entry(filter_frame, width=12)
+        self.order_from_entry.pack(side=tk.LEFT, padx=(5, 15))
+
+        ttk.Label(filter_frame, text="Đến ngày:").pack(side=tk.LEFT)
+        self.order_to_entry = ttk.Entry(filter_frame, width=12)
+        self.order_to_entry.pack(side=tk.LEFT, padx=(5, 15))
+
+        ttk.Label(filter_frame, text="Nhân viên:").pack(side=tk.LEFT)
+        self.order_staff_combo = ttk.Combobox(
+            filter_frame, values=[self.ALL_STAFF_LABEL], state="readonly", width=15
+        )
+        self.order_staff_combo.set(self.ALL_STAFF_LABEL)
+        self.order_staff_combo.pack(side=tk.LEFT, padx=(5, 15))
+
+        ttk.Button(filter_frame, text="Lọc", command=self._apply_order_filters).pack(side=tk.LEFT)
+
+        self.order_count_label = ttk.Label(filter_frame, text="")
+        self.order_count_label.pack(side=tk.RIGHT)
 
     def _build_order_treeview(self, parent):
         """Xây dựng treeview cho hóa đơn"""
+        self._build_order_filters(parent)
+
         # Container chính
         container = ttk.Frame(parent)
         container.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -251,6 +313,11 @@ class AdminDashboard:
             self.order_tree.heading(col, text=col)
             self.order_tree.column(col, width=column_widths[col], anchor='center')
 
+        # Cuộn gần cuối thì tải thêm trang
+        order_scroll = ttk.Scrollbar(order_frame, orient="vertical", command=self.order_tree.yview)
+        self.order_tree.configure(yscrollcommand=lambda first, last: self._on_order_scroll(order_scroll, first, last))
+
+        order_scroll.pack(side=tk.RIGHT, fill=tk.Y)
         self.order_tree.pack(fill=tk.BOTH, expand=True)
 
         # Treeview chi tiết
@@ -285,30 +352,114 @@ class AdminDashboard:
 
     #load dât
     def load_data(self):
-        """Tải lại dữ liệu menu"""
-        self._clear_treeview()
-        items = self.menu_service.get_all_coffees()
-        self._populate_treeview(items)
+        """Tải lại dữ liệu menu, chỉ vẽ lại các dòng thay đổi"""
+        def show(items):
+            self.menu_binding.set_rows(items)
+            self._on_item_selected()  # Dòng đang chọn có thể vừa bị xóa
+
+        self.tasks.submit(
+            self.menu_service.get_all_coffees,
+            key='menu',
+            on_success=show,
+            on_error=lambda e: messagebox.showerror("Lỗi", f"Không thể tải menu: {str(e)}")
+        )
 
     def load_staff_data(self):
         """Tải dữ liệu nhân viên"""
         from services.auth import get_all_staff
-        self._clear_staff_treeview()
-        staffs = get_all_staff()
-        self._populate_staff_treeview(staffs)
+        self.tasks.submit(
+            get_all_staff,
+            key='staff',
+            on_success=self.staff_binding.set_rows,
+            on_error=lambda e: messagebox.showerror("Lỗi", f"Không thể tải nhân viên: {str(e)}")
+        )
 
     def load_order_data(self):
-        """Tải dữ liệu hóa đơn"""
+        """Tải lại trang hóa đơn đầu tiên theo bộ lọc hiện tại"""
         self.order_tree.delete(*self.order_tree.get_children())
-        orders = self.order_service.get_all_orders()
-
-        for order in orders:
-            self.order_tree.insert("", "end", values=(
-                order['order_id'],
-                order['order_date'].strftime("%d/%m/%Y %H:%M"),
-                f"{order['total']:,.0f}₫",
-                order['total_items']
-            ))
+        self.order_detail_tree.delete(*self.order_detail_tree.get_children())
+        self._order_cursor = None
+        self._order_has_more = True
+        self._order_loading = False  # Trang đang tải dở (nếu có) sẽ bị bỏ qua
+        self._load_staff_filter()
+        self._load_next_order_page()
+
+    def _load_next_order_page(self):
+        """Tải trang hóa đơn kế tiếp trên luồng nền và nối vào cuối treeview"""
+        if self._order_loading or not self._order_has_more:
+            return
+        self._order_loading = True
+        cursor = self._order_cursor
+
+        def fetch():
+            rows, next_cursor = self.order_service.get_orders_page(
+                limit=self.ORDER_PAGE_SIZE, after=cursor, **self._order_filters
+            )
+            values = [
+                (
+                    order.order_id,
+                    order.order_date.strftime("%d/%m/%Y %H:%M"),
+                    f"{order.total:,.0f}₫",
+                    order.total_items or 0
+                )
+                for order in rows
+            ]
+            return values, next_cursor
+
+        def show(result):
+            values, next_cursor = result
+            self._order_loading = False
+            self._order_cursor = next_cursor
+            self._order_has_more = next_cursor is not None
+            for row in values:
+                self.order_tree.insert("", "end", values=row)
+            suffix = "" if self._order_has_more else " (hết)"
+            self.order_count_label.config(text=f"Đã tải {len(self.order_tree.get_children())} hóa đơn{suffix}")
+
+        def on_error(e):
+            self._order_loading = False
+            self._order_has_more = False
+            messagebox.showerror("Lỗi", f"Không thể tải hóa đơn: {str(e)}")
+
+        # Cùng key: đổi bộ lọc sẽ bỏ kết quả của trang đang tải dở
+        self.tasks.submit(fetch, key='orders', on_success=show, on_error=on_error)
+
+    def _on_order_scroll(self, scrollbar: ttk.Scrollbar, first, last):
+        """Cập nhật scrollbar và tải thêm khi cuộn gần cuối danh sách"""
+        scrollbar.set(first, last)
+        if float(last) >= 0.95:
+            self._load_next_order_page()
+
+    def _apply_order_filters(self):
+        """Đọc bộ lọc ngày/nhân viên và tải lại danh sách hóa đơn"""
+        filters = {}
+        for key, entry in (('date_from', self.order_from_entry), ('date_to', self.order_to_entry)):
+            text = entry.get().strip()
+            if not text:
+                continue
+            try:
+                filters[key] = datetime.strptime(text, "%d/%m/%Y").date()
+            except ValueError:
+                messagebox.showerror("Lỗi", "Ngày phải có dạng dd/mm/yyyy")
+                return
+
+        staff_id = self._staff_ids.get(self.order_staff_combo.get())
+        if staff_id is not None:
+            filters['user_id'] = staff_id
+
+        self._order_filters = filters
+        self.load_order_data()
+
+    def _load_staff_filter(self):
+        """Nạp danh sách nhân viên cho bộ lọc hóa đơn"""
+        from services.auth import get_all_staff
+
+        def show(staffs):
+            self._staff_ids = {self.ALL_STAFF_LABEL: None}
+            self._staff_ids.update({staff['username']: staff['user_id'] for staff in staffs})
+            self.order_staff_combo.config(values=list(self._staff_ids))
+
+        self.tasks.submit(get_all_staff, key='order_staff', on_success=show)
 
     def reload_data(self):
         """Tải lại dữ liệu dựa trên tab hiện tại"""
@@ -319,32 +470,17 @@ class AdminDashboard:
         elif self.current_tab == 2:
             self.load_order_data()
 
-    def _clear_treeview(self):
-        """Xóa toàn bộ dữ liệu treeview menu"""
-        self.tree.delete(*self.tree.get_children())
-
-    def _populate_treeview(self, items: List[Dict]):
-        """Đổ dữ liệu vào treeview menu"""
-        for item in items:
-            self.tree.insert("", "end", values=(
-                item['item_id'],
-                item['name'],
-                f"{item['price']:,.0f}",
-                item['size'],
-                self.TEMP_MAPPING[item['temperature_type']],
-                "🟢 Có" if item['is_available'] else "🔴 Hết"
-            ))
-
-    def _clear_staff_treeview(self):
-        self.staff_tree.delete(*self.staff_tree.get_children())
+    def _menu_row(self, item: Dict) -> tuple:
+        """Giá trị một dòng treeview menu"""
+        return (
+            item['item_id'],
+            item['name'],
+            f"{item['price']:,.0f}",
+            item['size'],
+            self.TEMP_MAPPING[item['temperature_type']],
+            "🟢 Có" if item['is_available'] else "🔴 Hết"
+        )
 
-    def _populate_staff_treeview(self, staffs):
-        for staff in staffs:
-            self.staff_tree.insert("", "end", values=(
-                staff['user_id'],
-                staff['username'],
-                staff['role'],
-            ))
     #--------------------------
 
     #event handlers
@@ -358,7 +494,7 @@ class AdminDashboard:
         elif self.current_tab == 2:
             self.load_order_data()
 
-    def _on_item_selected(self, event):
+    def _on_item_selected(self, event=None):
         """Xử lý sự kiện chọn item menu"""
         selected = self.tree.selection()
         self.selected_item = self.tree.item(selected[0])["values"] if selected else None
@@ -515,38 +651,310 @@ class AdminDashboard:
         )
         btn_submit.grid(row=2, column=1, pady=20)
 
+    def open_export_dialog(self):
+        """Xuất hóa đơn và chi tiết hóa đơn ra file, chạy nền và báo tiến độ"""
+        dialog = tk.Toplevel(self.window)
+        dialog.title("Xuất dữ liệu")
+        dialog.geometry("520x280")
+        dialog.resizable(False, False)
+
+        form = ttk.Frame(dialog, padding=15)
+        form.pack(fill=tk.BOTH, expand=True)
+
+        # Mặc định lấy khoảng ngày đang lọc ở tab hóa đơn
+        entries = {}
+        for row, (key, label, source) in enumerate((
+            ('date_from', "Từ ngày (dd/mm/yyyy):", self.order_from_entry),
+            ('date_to', "Đến ngày:", self.order_to_entry),
+        )):
+            ttk.Label(form, text=label).grid(row=row, column=0, sticky='w', pady=4)
+            entry = ttk.Entry(form, width=15)
+            entry.insert(0, source.get().strip())
+            entry.grid(row=row, column=1, sticky='w', pady=4)
+            entries[key] = entry
+
+        ttk.Label(form, text="Định dạng:").grid(row=2, column=0, sticky='w', pady=4)
+        format_combo = ttk.Combobox(form, values=list(self.EXPORT_FORMATS), state="readonly", width=15)
+        format_combo.set("CSV")
+        format_combo.grid(row=2, column=1, sticky='w', pady=4)
+
+        ttk.Label(form, text="Thư mục:").grid(row=3, column=0, sticky='w', pady=4)
+        folder_var = tk.StringVar(value=os.path.join(os.path.expanduser("~"), "Downloads"))
+        ttk.Entry(form, textvariable=folder_var, width=35).grid(row=3, column=1, sticky='w', pady=4)
+        ttk.Button(
+            form,
+            text="Chọn...",
+            command=lambda: folder_var.set(
+                filedialog.askdirectory(parent=dialog, initialdir=folder_var.get()) or folder_var.get()
+            )
+        ).grid(row=3, column=2, padx=5)
+
+        progress_bar = ttk.Progressbar(form, length=460, mode='determinate')
+        progress_bar.grid(row=4, column=0, columnspan=3, pady=(15, 5))
+        lbl_status = ttk.Label(form, text="")
+        lbl_status.grid(row=5, column=0, columnspan=3, sticky='w')
+
+        buttons = ttk.Frame(form)
+        buttons.grid(row=6, column=0, columnspan=3, pady=10)
+        btn_export = ttk.Button(buttons, text="Xuất")
+        btn_export.pack(side=tk.LEFT, padx=5)
+        btn_cancel = ttk.Button(buttons, text="Đóng")
+        btn_cancel.pack(side=tk.LEFT, padx=5)
+
+        cancel_event = threading.Event()
+        running = [False]
+
+        def show_progress(table, written, total):
+            if not dialog.winfo_exists():
+                return
+            progress_bar.config(maximum=max(total, 1), value=written)
+            lbl_status.config(text=f"{table}: {written:,}/{total:,} dòng")
+
+        def finish():
+            running[0] = False
+            if dialog.winfo_exists():
+                btn_export.config(state=tk.NORMAL)
+                btn_cancel.config(text="Đóng")
+
+        def on_success(paths):
+            finish()
+            if dialog.winfo_exists():
+                messagebox.showinfo("Thành công", "Đã xuất:\n" + "\n".join(paths), parent=dialog)
+                dialog.destroy()
+
+        def on_error(e):
+            finish()
+            if not dialog.winfo_exists():
+                return
+            if isinstance(e, ExportCancelled):
+                lbl_status.config(text=str(e))
+            else:
+                messagebox.showerror("Lỗi", f"Không thể xuất dữ liệu: {str(e)}", parent=dialog)
+
+        def start():
+            dates = {}
+            for key, entry in entries.items():
+                text = entry.get().strip()
+                if not text:
+                    dates[key] = None
+                    continue
+                try:
+                    dates[key] = datetime.strptime(text, "%d/%m/%Y").date()
+                except ValueError:
+                    messagebox.showerror("Lỗi", "Ngày phải có dạng dd/mm/yyyy", parent=dialog)
+                    return
+
+            cancel_event.clear()
+            running[0] = True
+            btn_export.config(state=tk.DISABLED)
+            btn_cancel.config(text="Hủy")
+            self.tasks.submit(
+                OrderExporter().export,
+                folder_var.get(),
+                self.EXPORT_FORMATS[format_combo.get()],
+                dates['date_from'],
+                dates['date_to'],
+                # Gọi từ worker: chuyển về luồng Tk trước khi chạm widget
+                progress=lambda *args: self.tasks.call_soon(show_progress, *args),
+                cancel_event=cancel_event,
+                key='export',
+                on_success=on_success,
+                on_error=on_error
+            )
+
+        def cancel_or_close():
+            if running[0]:
+                cancel_event.set()
+            else:
+                dialog.destroy()
+
+        def on_close():
+            cancel_event.set()
+            dialog.destroy()
+
+        btn_export.config(command=start)
+        btn_cancel.config(command=cancel_or_close)
+        dialog.protocol("WM_DELETE_WINDOW", on_close)
+
+    def open_failed_orders_dialog(self):
+        """Các đơn offline máy chủ từ chối (vd. món/nhân viên đã bị xóa): gửi lại, xuất file hoặc bỏ"""
+        journal = self.order_service.journal
+        dialog = tk.Toplevel(self.window)
+        dialog.title("Đơn offline lỗi")
+        dialog.geometry("900x400")
+
+        frame = ttk.Frame(dialog, padding=10)
+        frame.pack(fill=tk.BOTH, expand=True)
+        columns = ("Mã tạm", "Thời gian", "Số món", "Số lần thử", "Lỗi cuối")
+        tree = ttk.Treeview(frame, columns=columns, show='headings', style=self.STYLES['tree_style'])
+        for col, width in zip(columns, (80, 140, 70, 90, 480)):
+            tree.heading(col, text=col)
+            tree.column(col, width=width, anchor='w' if col == "Lỗi cuối" else 'center')
+        scroll_y = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scroll_y.set)
+        tree.pack(side='left', fill='both', expand=True)
+        scroll_y.pack(side='right', fill='y')
+
+        def load():
+            tree.delete(*tree.get_children())
+            for entry in journal.failed():
+                tree.insert('', 'end', iid=str(entry['local_id']), values=(
+                    f"L{entry['local_id']}",
+                    entry['order_date'].strftime('%d/%m/%Y %H:%M'),
+                    sum(line['quantity'] for line in entry['items']),
+                    entry['attempts'],
+                    entry['last_error'] or "",
+                ))
+
+        def selected_ids():
+            return [int(iid) for iid in tree.selection()]
+
+        def retry():
+            ids = selected_ids()
+            journal.retry_failed(ids or None)
+            load()
+            messagebox.showinfo("Đơn offline lỗi", "Đã đưa đơn về hàng chờ đồng bộ", parent=dialog)
+
+        def export():
+            path = filedialog.asksaveasfilename(
+                parent=dialog, defaultextension=".json", initialfile="don_offline_loi.json",
+                filetypes=[("JSON", "*.json")]
+            )
+            if path:
+                count = journal.export_failed(path)
+                messagebox.showinfo("Đơn offline lỗi", f"Đã xuất {count} đơn:\n{path}", parent=dialog)
+
+        def discard():
+            ids = selected_ids()
+            if not ids:
+                messagebox.showwarning("Cảnh báo", "Vui lòng chọn đơn cần bỏ", parent=dialog)
+                return
+            if messagebox.askyesno(
+                "Xác nhận", f"Bỏ hẳn {len(ids)} đơn? Nên xuất file trước để đối chiếu.", parent=dialog
+            ):
+                journal.discard_failed(ids)
+                load()
+
+        buttons = ttk.Frame(dialog, padding=(10, 0, 10, 10))
+        buttons.pack(fill=tk.X)
+        for text, command in (
+            ("Gửi lại (đã chọn hoặc tất cả)", retry),
+            ("Xuất JSON", export),
+            ("Bỏ đơn đã chọn", discard),
+            ("Đóng", dialog.destroy),
+        ):
+            ttk.Button(buttons, text=text, command=command).pack(side=tk.LEFT, padx=5)
+        load()
+
+    def export_z_report(self):
+        """Tạo báo cáo Z cho hôm nay (hoặc khoảng ngày đang lọc ở tab hóa đơn) ra PDF"""
+        from services.zreport import ZReportService
+
+        # Chỉ lọc một đầu thì báo cáo đúng ngày đó; không lọc thì hôm nay
+        date_from = self._order_filters.get('date_from') or self._order_filters.get('date_to') or date.today()
+        date_to = self._order_filters.get('date_to') or date_from
+        if date_from > date_to:
+            messagebox.showerror("Lỗi", "Từ ngày phải trước hoặc bằng đến ngày")
+            return
+        reprint = messagebox.askyesno("Báo cáo cuối ngày", "In lại toàn bộ hóa đơn trong báo cáo?")
+
+        self.tasks.submit(
+            ZReportService().export,
+            date_from,
+            date_to,
+            receipts='single' if reprint else None,
+            key='z_report',
+            on_success=lambda result: messagebox.showinfo(
+                "Thành công", f"Đã tạo báo cáo ({result[1]} hóa đơn in lại):\n{result[0]}"
+            ),
+            on_error=lambda e: messagebox.showerror("Lỗi", f"Không thể tạo báo cáo: {str(e)}")
+        )
+
     def open_sales_statistics(self):
-        """Mở thống kê bán hàng"""
+        """Tải số liệu trên luồng nền rồi mở thống kê bán hàng"""
+        def fetch():
+            # Theo kỳ/món/nhân viên đọc từ bảng tổng hợp cập nhật lúc thanh toán;
+            # pandas (nặng, chỉ nạp khi mở thống kê) chỉ dùng cho theo giờ và xu hướng
+            from services.analytics import get_sales_analytics
+            sales = SalesService()
+            analytics = get_sales_analytics()
+            analytics.refresh()
+            date_to = date.today()
+            date_from = date_to - timedelta(days=self.STATISTICS_DAYS - 1)
+            return {
+                'daily': sales.get_daily_sales(limit=30),
+                'monthly': sales.get_monthly_sales(limit=12),
+                'yearly': sales.get_yearly_sales(limit=5),
+                'items': sales.get_item_sales(date_from, date_to),
+                'staff': sales.get_staff_sales(date_from, date_to),
+                'heatmap': analytics.hourly_heatmap(date_from, date_to),
+                'trend': analytics.moving_average(window=7, days=self.STATISTICS_DAYS),
+            }
+
+        self.tasks.submit(
+            fetch,
+            key='sales',
+            on_success=self._show_sales_statistics,
+            on_error=lambda e: messagebox.showerror("Lỗi", f"Không thể tải thống kê: {str(e)}")
+        )
+
+    def _show_sales_statistics(self, stats: Dict):
+        """Hiển thị thống kê bán hàng"""
         dialog = tk.Toplevel()
         dialog.title("Thống Kê Bán Hàng")
         dialog.geometry("1400x600")
 
         notebook = ttk.Notebook(dialog)
 
+        def period_rows(data):
+            return [
+                (item[list(item.keys())[0]], item['total_orders'], item['total_cups'],
+                 f"{item['total_revenue']:,.0f}₫")
+                for item in data
+            ]
+
+        # Bảng nhiệt theo thứ trong tuần x giờ, chỉ hiện các giờ có bán
+        heatmap = stats['heatmap']
+        hours = [hour for hour in range(24) if heatmap[:, hour].any()]
+        days = self.STATISTICS_DAYS
+
         tabs = [
-            ("Theo Ngày", self.menu_service.get_daily_sales,
-             ("Ngày", "Số Đơn", "Tổng Cốc", "Doanh Thu")),
-            ("Theo Tháng", self.menu_service.get_monthly_sales,
-             ("Tháng", "Số Đơn", "Tổng Cốc", "Doanh Thu")),
-            ("Theo Năm", self.menu_service.get_yearly_sales,
-             ("Năm", "Số Đơn", "Tổng Cốc", "Doanh Thu"))
+            ("Theo Ngày", "THỐNG KÊ NGÀY", ("Ngày", "Số Đơn", "Tổng Cốc", "Doanh Thu"),
+             period_rows(stats['daily'])),
+            ("Theo Tháng", "THỐNG KÊ THÁNG", ("Tháng", "Số Đơn", "Tổng Cốc", "Doanh Thu"),
+             period_rows(stats['monthly'])),
+            ("Theo Năm", "THỐNG KÊ NĂM", ("Năm", "Số Đơn", "Tổng Cốc", "Doanh Thu"),
+             period_rows(stats['yearly'])),
+            ("Theo Món", f"THEO MÓN ({days} NGÀY)", ("Món", "Size", "Tổng Cốc", "Doanh Thu"),
+             [(item['name'] or f"#{item['item_id']}", item['size'], item['total_cups'],
+               f"{item['total_revenue']:,.0f}₫")
+              for item in stats['items']]),
+            ("Theo Nhân Viên", f"THEO NHÂN VIÊN ({days} NGÀY)", ("Nhân Viên", "Số Đơn", "Tổng Cốc", "Doanh Thu"),
+             [(staff['username'] or "(không rõ)", staff['total_orders'], staff['total_cups'], f"{staff['total_revenue']:,.0f}₫")
+              for staff in stats['staff']]),
+            ("Theo Giờ", f"SỐ ĐƠN THEO GIỜ ({days} NGÀY)", ("Thứ", *(f"{hour}h" for hour in hours)),
+             [(weekday, *(int(heatmap[index, hour]) for hour in hours))
+              for index, weekday in enumerate(self.WEEKDAYS)]),
+            ("Xu Hướng", "DOANH THU VÀ TRUNG BÌNH 7 NGÀY", ("Ngày", "Doanh Thu", "TB 7 Ngày"),
+             [(item['sale_date'], f"{item['total_revenue']:,.0f}₫", f"{item['moving_average']:,.0f}₫")
+              for item in stats['trend']]),
         ]
 
-        for tab_text, data_func, columns in tabs:
+        for tab_text, title, columns, rows in tabs:
             frame = ttk.Frame(notebook)
-            self._create_statistics_table(frame, data_func(), columns)
+            self._create_statistics_table(frame, title, columns, rows)
             notebook.add(frame, text=tab_text)
 
         notebook.pack(expand=True, fill='both', padx=10, pady=10)
 
-    def _create_statistics_table(self, parent, data: List[Dict], columns: Tuple):
+    def _create_statistics_table(self, parent, title: str, columns: Tuple, rows: List[Tuple]):
         """Tạo bảng thống kê"""
         container = ttk.Frame(parent)
         container.pack(fill='both', expand=True, padx=10, pady=10)
 
         lbl_title = ttk.Label(
             container,
-            text=f"THỐNG KÊ {columns[0].upper()}",
+            text=title,
             font=('Arial', 12, 'bold'),
             foreground=self.STYLES['secondary_color']
         )
@@ -564,25 +972,23 @@ class AdminDashboard:
             "Ngày": 120,
             "Tháng": 100,
             "Năm": 80,
+            "Món": 200,
+            "Nhân Viên": 150,
             "Số Đơn": 100,
             "Tổng Cốc": 120,
-            "Doanh Thu": 180
+            "Doanh Thu": 180,
+            "TB 7 Ngày": 180
         }
+        money_columns = ("Doanh Thu", "TB 7 Ngày")
 
         for col in columns:
             tree.heading(col, text=col)
             tree.column(col,
-                        width=col_widths.get(col, 100),
-                        anchor='center' if col != "Doanh Thu" else 'e'
+                        width=col_widths.get(col, 50),
+                        anchor='e' if col in money_columns else 'center'
                         )
 
-        for item in data:
-            values = (
-                item[list(item.keys())[0]],
-                item['total_orders'],
-                item['total_cups'],
-                f"{item['total_revenue']:,.0f}₫"
-            )
+        for values in rows:
             tree.insert('', 'end', values=values)
 
         scroll_y = ttk.Scrollbar(container, orient="vertical", command=tree.yview)
@@ -696,28 +1102,41 @@ class AdminDashboard:
             messagebox.showerror("Lỗi", f"Lỗi: {str(e)}")
 
     def _handle_create_staff(self, dialog: tk.Toplevel, username: str, password: str):
-        """Xử lý tạo staff mới"""
-        try:
-            if not username or not password:
-                messagebox.showerror("Lỗi", "Vui lòng điền đầy đủ username và password")
-                return
+        """Xử lý tạo staff mới; kiểm tra trùng tên và băm mật khẩu chạy trên luồng nền"""
+        if not username or not password:
+            messagebox.showerror("Lỗi", "Vui lòng điền đầy đủ username và password")
+            return
+
+        if len(password) < 6:
+            messagebox.showerror("Lỗi", "Password phải có ít nhất 6 ký tự")
+            return
 
+        def create():
             if check_username_exists(username):
-                messagebox.showerror("Lỗi", "Username đã tồn tại! Vui lòng chọn username khác")
-                return
+                return False
+            create_staff(username=username, password=password)
+            return True
 
-            if len(password) < 6:
-                messagebox.showerror("Lỗi", "Password phải có ít nhất 6 ký tự")
+        def on_result(created):
+            if not created:
+                messagebox.showerror("Lỗi", "Username đã tồn tại! Vui lòng chọn username khác")
                 return
-
-            create_staff(username=username, password=password)
             messagebox.showinfo("Thành công", "Tạo staff thành công!")
             dialog.destroy()
             if self.current_tab == 1:
                 self.load_staff_data()
-        except Exception as e:
-            messagebox.showerror("Lỗi", f"Tạo staff thất bại: {str(e)}")
+
+        self.tasks.submit(
+            create,
+            on_success=on_result,
+            on_error=lambda e: messagebox.showerror("Lỗi", f"Tạo staff thất bại: {str(e)}")
+        )
     #--------------------
 
+    def _on_destroy(self, event):
+        """Dừng worker khi đóng cửa sổ"""
+        if event.widget is self.window:
+            self.tasks.shutdown()
+
     def run(self):
         self.window.mainloop()
\ No newline at end of file
@@ -1,15 +1,17 @@
 import tkinter as tk
 from tkinter import messagebox
-from services.auth import login
-from database.db import Database
-import bcrypt
+from services.auth import login, create_session, LoginThrottledError
+from gui.tasks import TaskRunner
 
 
 class LoginWindow:
-    def __init__(self):
+    def __init__(self, bootstrap=None):
+        # Future của bước khởi tạo database chạy nền (kiểm tra schema, tạo admin)
+        self.bootstrap = bootstrap
         self.window = tk.Tk()
         self.window.title("Đăng Nhập")
         self.window.geometry("300x150")
+        self.tasks = TaskRunner(self.window)
 
         self.build_ui()
 
@@ -22,39 +24,51 @@ class LoginWindow:
         self.entry_pass = tk.Entry(self.window, show="*")
         self.entry_pass.grid(row=1, column=1)
 
-        tk.Button(self.window, text="Login", command=self.on_login).grid(row=2, column=1, pady=10)
-
-    def login(username, password):
-        db = Database()
-        user = db.fetch("SELECT * FROM users WHERE username = %s", (username,))
-        if not user:
-            return False, None, None  # Thêm user_id vào return
-
-        if bcrypt.checkpw(password.encode(), user[0]['password_hash'].encode()):
-            # Trả về (success, role, user_id)
-            return True, user[0]['role'], user[0]['id']
-        return False, None, None
+        self.btn_login = tk.Button(self.window, text="Login", command=self.on_login)
+        self.btn_login.grid(row=2, column=1, pady=10)
+        self.window.bind('<Return>', lambda event: self.on_login())
 
     def on_login(self):
         username = self.entry_user.get()
         password = self.entry_pass.get()
+        if str(self.btn_login.cget('state')) == tk.DISABLED:
+            return
 
-        # Nhận thêm user_id từ hàm login
-        success, role, user_id = login(username, password)
+        def verify():
+            if self.bootstrap is not None:
+                self.bootstrap.result()  # Chờ khởi tạo database xong, lỗi thì báo luôn
+            # bcrypt chậm có chủ đích nên chạy trên luồng nền, giao diện không bị đứng
+            success, role, user_id = login(username, password)
+            token = create_session(user_id, username, role, password) if success else None
+            return success, role, user_id, token
 
-        if success:
-            self.open_dashboard(role, user_id)  # Truyền user_id vào
-        else:
-            messagebox.showerror("Lỗi", "Sai thông tin đăng nhập!")
+        def on_result(result):
+            success, role, user_id, token = result
+            if success:
+                self.open_dashboard(role, user_id, username, token)
+            else:
+                self.btn_login.config(state=tk.NORMAL)
+                messagebox.showerror("Lỗi", "Sai thông tin đăng nhập!")
+
+        def on_error(e):
+            self.btn_login.config(state=tk.NORMAL)
+            if isinstance(e, LoginThrottledError):
+                messagebox.showwarning("Tạm khóa đăng nhập", str(e))
+                return
+            messagebox.showerror("Lỗi", f"Không thể đăng nhập: {str(e)}")
+
+        self.btn_login.config(state=tk.DISABLED)
+        self.tasks.submit(verify, on_success=on_result, on_error=on_error)
 
-    def open_dashboard(self, role, user_id):  # Thêm tham số user_id
+    def open_dashboard(self, role, user_id, username=None, session_token=None):
+        self.tasks.shutdown()
         self.window.destroy()
         if role == "admin":
             from gui.admin import AdminDashboard
             AdminDashboard()
         else:
             from gui.staff import StaffDashboard
-            StaffDashboard(user_id)  # Truyền user_id vào constructor
+            StaffDashboard(user_id, username, session_token)
 
     def run(self):
         self.window.mainloop()
\ No newline at end of file
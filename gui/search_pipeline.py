@@ -0,0 +1,108 @@
+from collections import OrderedDict
+from typing import Callable, List, Optional
+from services.search import fold
+from gui.tasks import TaskRunner
+
+
+class SearchPipeline:
+    """Tìm kiếm theo từng phím gõ: chờ `delay_ms` sau phím cuối rồi mới tìm.
+
+    - Gõ tiếp trong lúc chờ thì gộp lại, chỉ truy vấn cuối cùng được chạy;
+      truy vấn không đổi sau khi bỏ dấu/khoảng trắng thì bỏ qua.
+    - Truy vấn mới hủy truy vấn đang chờ/đang chạy (kết quả cũ bị bỏ qua).
+    - Kết quả được cache theo truy vấn: gõ thêm ký tự thì phần khớp tiền tố
+      chỉ lọc lại trong kết quả của tiền tố đã có; khớp gần đúng vẫn xét
+      toàn bộ menu.
+
+    `search(query, candidates=None)` chạy trên worker; `on_results(items)` nhận
+    danh sách món, hoặc None khi ô tìm kiếm trống.
+    """
+
+    def __init__(self, tasks: TaskRunner, search: Callable, on_results: Callable,
+                 on_error: Optional[Callable] = None, delay_ms: int = 250,
+                 key: str = 'search', max_cached: int = 32):
+        self.tasks = tasks
+        self.search = search
+        self.on_results = on_results
+        self.on_error = on_error
+        self.delay_ms = delay_ms
+        self.key = key
+        self.max_cached = max_cached
+        self._cache: "OrderedDict[str, List[dict]]" = OrderedDict()  # truy vấn đã bỏ dấu -> kết quả
+        self._wanted: Optional[str] = None  # truy vấn cần hiển thị
+        self._after_id = None
+
+    def update(self, query: str):
+        """Gọi ở mỗi phím gõ với nội dung ô tìm kiếm"""
+        folded = fold(query)
+        if not folded:
+            self._cancel()
+            self._wanted = ""
+            self.on_results(None)
+            return
+        if folded == self._wanted:
+            return
+
+        self._cancel()
+        self._wanted = folded
+        cached = self._cache.get(folded)
+        if cached is not None:
+            self._cache.move_to_end(folded)
+            self.on_results(cached)
+            return
+        self._after_id = self.tasks.root.after(self.delay_ms, self._run)
+
+    def refresh(self):
+        """Menu vừa đổi: bỏ cache và tìm lại ngay truy vấn hiện tại"""
+        self._cache.clear()
+        wanted, self._wanted = self._wanted, None
+        if not wanted:
+            self.update("")
+            return
+        self._cancel()
+        self._wanted = wanted
+        self._run()
+
+    def _cancel(self):
+        if self._after_id is not None:
+            self.tasks.root.after_cancel(self._after_id)
+            self._after_id = None
+        self.tasks.cancel(self.key)
+
+    def _run(self):
+        self._after_id = None
+        query = self._wanted
+        base = self._narrowest_cached(query)
+        candidates = None if base is None else [item['item_id'] for item in base]
+        self.tasks.submit(
+            self._lookup,
+            query,
+            candidates,
+            key=self.key,
+            on_success=lambda items: self._store(query, items),
+            on_error=self.on_error
+        )
+
+    def _lookup(self, query: str, candidates: Optional[List[int]]) -> List[dict]:
+        if candidates is not None:
+            items = self.search(query, candidates=candidates)
+            if items:
+                return items
+            # Lọc trong tiền tố không ra gì (vd. sửa lỗi gõ): tìm lại trên toàn menu
+        return self.search(query)
+
+    def _narrowest_cached(self, query: str) -> Optional[List[dict]]:
+        """Kết quả đã cache của tiền tố dài nhất của truy vấn"""
+        best = None
+        for cached_query in self._cache:
+            if query.startswith(cached_query) and (best is None or len(cached_query) > len(best)):
+                best = cached_query
+        return None if best is None else self._cache[best]
+
+    def _store(self, query: str, items: List[dict]):
+        self._cache[query] = items
+        self._cache.move_to_end(query)
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+        if query == self._wanted:
+            self.on_results(items)
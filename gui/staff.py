@@ -2,9 +2,16 @@ import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from services.menu import MenuService
 from services.order import OrderService
+from services.journal import is_provisional
+from services.cart import Cart, CartLine
+from services.auth import login, create_session, unlock_session, end_session, LoginThrottledError
 from utils.api import WeatherAPI
-from utils.exporter import PDFExporter
+from utils.receipt_queue import get_receipt_queue, ReceiptQueue, ReceiptQueueFull
+from gui.tasks import TaskRunner, LoadingIndicator
+from gui.tree_binding import TreeBinding
+from gui.search_pipeline import SearchPipeline
 from typing import Optional, Dict, List
+import uuid
 
 
 class StaffDashboard:
@@ -14,19 +21,46 @@ class StaffDashboard:
         'both': ('Cả hai 🌡️', '#4CAF50')
     }
 
-    def __init__(self, user_id: int):
+    WEATHER_REFRESH_MS = 10 * 60 * 1000
+    MENU_REFRESH_MS = 60 * 1000
+    SEARCH_DEBOUNCE_MS = 250
+
+    def __init__(self, user_id: int, username: Optional[str] = None, session_token: Optional[str] = None):
         self.user_id = user_id
-        self.cart: List[Dict] = []
+        self.username = username
+        self.session_token = session_token
+        self.lock_window: Optional[tk.Toplevel] = None
+        self.cart = Cart()
+        self.cart.add_listener(self._on_cart_changed)
         self.current_filter: Optional[str] = None
         self.search_keyword: str = ""
+        # ID các món đề xuất, chỉ tính lại khi cập nhật thời tiết
+        self.recommended_ids = set()
+        # Khóa chống tạo đơn trùng, giữ nguyên khi bấm lại với cùng giỏ hàng
+        self.checkout_key: Optional[str] = None
+        # Đang gửi đơn trên luồng nền: khóa giỏ hàng tới khi có kết quả
+        self.checkout_in_flight = False
 
         # Khởi tạo services
         self.menu_service = MenuService()
         self.order_service = OrderService()
         self.weather_api = WeatherAPI()
+        self.receipts = get_receipt_queue()
 
         # Cấu hình giao diện
         self.window = self._configure_window()
+        self.tasks = TaskRunner(self.window)
+        self.window.bind("<Destroy>", self._on_destroy)
+        self.search_pipeline = SearchPipeline(
+            self.tasks,
+            self.menu_service.search_items,
+            on_results=self._show_search_results,
+            on_error=lambda e: messagebox.showerror("Lỗi", f"Không thể tìm kiếm: {str(e)}"),
+            delay_ms=self.SEARCH_DEBOUNCE_MS,
+            key='menu_search'
+        )
+        self.receipts.add_listener(self._on_receipt_status)
+        self.order_service.journal.add_listener(self._on_sync_backlog)
         self._setup_ui()
         self._load_initial_data()
 
@@ -74,6 +108,14 @@ class StaffDashboard:
         )
         self.weather_label.pack(side=tk.LEFT, padx=5)
 
+        # Chỉ báo đang tải
+        self.loading = LoadingIndicator(header_frame, side=tk.LEFT, padx=10)
+        self.tasks.add_busy_listener(self.loading.set_busy)
+
+        # Khóa máy khi rời quầy, mở lại bằng mật khẩu của phiên đang đăng nhập
+        if self.username:
+            ttk.Button(header_frame, text="🔒 Khóa máy", command=self._lock_screen).pack(side=tk.RIGHT, padx=5)
+
         # Recommendation buttons
         self.recommendation_frame = ttk.Frame(header_frame)
         self.recommendation_frame.pack(side=tk.RIGHT, padx=10)
@@ -147,6 +189,13 @@ class StaffDashboard:
             self.tree_menu.heading(col, text=col)
 
         self.tree_menu.pack(fill=tk.BOTH, expand=True)
+        self.tree_menu.tag_configure('recommended', background='#e3f2fd')
+        self.menu_binding = TreeBinding(
+            self.tree_menu,
+            key=lambda item: item['item_id'],
+            render=self._menu_row,
+            tags=lambda item: ('recommended',) if item['item_id'] in self.recommended_ids else ()
+        )
 
     def _build_cart_frame(self, parent) -> ttk.Frame:
         """Xây dựng khung giỏ hàng"""
@@ -200,8 +249,17 @@ class StaffDashboard:
         )
         self.lbl_total.pack(fill=tk.X, pady=(10, 0))
 
+        # Trạng thái xuất hóa đơn chạy nền
+        self.lbl_receipt = ttk.Label(parent, text="", foreground="#666", anchor='e')
+        self.lbl_receipt.pack(fill=tk.X, pady=(5, 0))
+
+        # Số đơn lưu offline chưa đồng bộ lên máy chủ
+        self.lbl_sync = ttk.Label(parent, text="", foreground="#d32f2f", anchor='e')
+        self.lbl_sync.pack(fill=tk.X, pady=(5, 0))
+
     def _build_cart_action_buttons(self, parent):
         """Xây dựng các nút thao tác giỏ hàng"""
+        self.cart_buttons = []
         button_configs = [
             ("➕ Thêm", self._add_to_cart, "#4CAF50", tk.LEFT),
             ("❌ Xóa", self._remove_from_cart, "#f44336", tk.LEFT),
@@ -222,6 +280,8 @@ class StaffDashboard:
             )
             if text == "💰 Tạo đơn":
                 self.btn_checkout = btn
+            else:
+                self.cart_buttons.append(btn)
             btn.pack(side=side, padx=5)
     # ---------------------
 
@@ -230,84 +290,121 @@ class StaffDashboard:
         """Tải dữ liệu ban đầu"""
         self._load_menu()
         self._update_weather_recommendations()
+        self._show_sync_backlog(self.order_service.pending_sync_count(), self.order_service.failed_sync_count())
+        self.order_service.start_sync()
+
+    def _load_menu(self):
+        """Tải menu đang bán trên luồng nền, lặp lại định kỳ để thấy thay đổi từ admin"""
+        self.tasks.submit(
+            self.menu_service.get_available_coffees,
+            key='menu',
+            on_success=self._show_menu,
+            on_error=lambda e: messagebox.showerror("Lỗi", f"Không thể tải menu: {str(e)}")
+        )
+        self.window.after(self.MENU_REFRESH_MS, self._load_menu)
+
+    def _show_menu(self, items: List[Dict]):
+        """Cập nhật treeview theo menu mới, chỉ vẽ lại các dòng thay đổi"""
+        self.menu_binding.set_rows(items)
+        self.search_pipeline.refresh()
+
+    def _apply_menu_filter(self):
+        """Lọc menu đã tải ngay trên giao diện thay vì tải lại"""
+        self.search_pipeline.update(self.search_keyword)
+
+    def _show_search_results(self, items: Optional[List[Dict]]):
+        """Có từ khóa thì hiện kết quả tìm kiếm (bỏ qua lọc nhiệt độ như trước);
+        không có (items là None) thì lọc theo loại nhiệt độ đang chọn.
+        """
+        if items is not None:
+            self.menu_binding.show([item['item_id'] for item in items])
+            return
+        temp_type = self.current_filter
+        self.menu_binding.filter(lambda item: not temp_type or item['temperature_type'] == temp_type)
+
+    def _on_cart_changed(self, event: str, line: Optional[CartLine]):
+        """Cập nhật đúng dòng giỏ hàng vừa thay đổi"""
+        if not self.checkout_in_flight:
+            self.checkout_key = None  # Giỏ đã thay đổi: lần thanh toán sau là đơn mới
+        if event == Cart.ADDED:
+            self._insert_cart_item(line)
+        elif event == Cart.UPDATED:
+            self.tree_cart.item(self._cart_iid(line), values=self._cart_row(line))
+        elif event == Cart.REMOVED:
+            self.tree_cart.delete(self._cart_iid(line))
+        else:
+            self.tree_cart.delete(*self.tree_cart.get_children())
 
-    def _load_menu(self, temp_type: Optional[str] = None):
-        """Tải danh sách menu"""
-        try:
-            items = self._get_filtered_items(temp_type)
-            recommendations = self._get_recommendations()
-
-            self.tree_menu.delete(*self.tree_menu.get_children())
-
-            for item in items:
-                tags = ('recommended',) if item['item_id'] in recommendations else ()
-                self._insert_menu_item(item, tags)
-
-            self.tree_menu.tag_configure('recommended', background='#e3f2fd')
-
-        except Exception as e:
-            messagebox.showerror("Lỗi", f"Không thể tải menu: {str(e)}")
-
-    def _update_cart_display(self):
-        """Cập nhật hiển thị giỏ hàng"""
-        self.tree_cart.delete(*self.tree_cart.get_children())
-        total = 0
-
-        for item in self.cart:
-            subtotal = item['price'] * item['quantity']
-            total += subtotal
-            self._insert_cart_item(item, subtotal)
-
-        self.lbl_total.config(text=f"Tổng tiền: {total:,.0f} VND")
+        self.lbl_total.config(text=f"Tổng tiền: {self.cart.total:,.0f} VND")
         self._update_checkout_button_state()
 
-    def _insert_menu_item(self, item: Dict, tags: tuple):
-        """Thêm item vào treeview menu"""
-        self.tree_menu.insert("", "end", values=(
+    def _menu_row(self, item: Dict) -> tuple:
+        return (
             item['item_id'],
             item['name'],
             item['size'],
             self.TEMP_MAPPING[item['temperature_type']][0],
             f"{item['price']:,.0f}"
-        ), tags=tags)
+        )
 
-    def _insert_cart_item(self, item: Dict, subtotal: float):
-        """Thêm item vào treeview giỏ hàng"""
-        self.tree_cart.insert("", "end", values=(
-            item['item_id'],
-            item['name'],
-            item['size'],
-            self.TEMP_MAPPING[item['temperature_type']][0],
-            item['quantity'],
-            f"{subtotal:,.0f} VND"
-        ))
+    def _insert_cart_item(self, line: CartLine):
+        """Thêm dòng vào treeview giỏ hàng"""
+        self.tree_cart.insert("", "end", iid=self._cart_iid(line), values=self._cart_row(line))
+
+    @staticmethod
+    def _cart_iid(line: CartLine) -> str:
+        return f"{line.item_id}:{line.size}"
+
+    def _cart_row(self, line: CartLine) -> tuple:
+        return (
+            line.item_id,
+            line.name,
+            line.size,
+            self.TEMP_MAPPING[line.temperature_type][0],
+            line.quantity,
+            f"{line.subtotal:,.0f} VND"
+        )
     # ----------------------
 
     # Weather and Recommendations
     def _update_weather_recommendations(self):
-        """Cập nhật thông tin thời tiết và đề xuất"""
-        try:
+        """Cập nhật thông tin thời tiết và đề xuất trên luồng nền, lặp lại định kỳ"""
+        def fetch():
             weather = self.weather_api.get_weather() or {}
-            self._update_weather_display(weather)
-            self._update_recommendation_buttons(weather.get('temp', 25))
+            return weather, self.menu_service.get_recommendations(weather.get('temp', 25))
 
-        except Exception as e:
+        def on_error(e):
             print(f"Lỗi cập nhật thời tiết: {str(e)}")
             self.weather_label.config(text="Không thể cập nhật thời tiết")
 
+        self.tasks.submit(
+            fetch,
+            key='weather',
+            on_success=lambda result: self._show_weather(*result),
+            on_error=on_error
+        )
+        self.window.after(self.WEATHER_REFRESH_MS, self._update_weather_recommendations)
+
+    def _show_weather(self, weather: Dict, recommendations: List[Dict]):
+        """Hiển thị thời tiết, các nút đề xuất và tô màu món đề xuất"""
+        self._update_weather_display(weather)
+        self._update_recommendation_buttons(recommendations[:3])
+        self.recommended_ids = {item['item_id'] for item in recommendations}
+        self.menu_binding.refresh()
+
     def _update_weather_display(self, weather: Dict):
         """Cập nhật hiển thị thông tin thời tiết"""
         temp = weather.get('temp', 25)
         desc = weather.get('description', 'N/A').capitalize()
         self.weather_label.config(text=f"{temp}°C - {desc}")
 
-    def _update_recommendation_buttons(self, temperature: float):
+    def _update_recommendation_buttons(self, recommendations: List[Dict]):
         """Cập nhật các nút đề xuất theo nhiệt độ"""
         for widget in self.recommendation_frame.winfo_children():
             widget.destroy()
 
         self._create_filter_buttons()
-        self._create_temperature_buttons(temperature)
+        self._create_temperature_buttons(recommendations)
 
     def _create_filter_buttons(self):
         """Tạo các nút lọc"""
@@ -322,10 +419,8 @@ class StaffDashboard:
         )
         btn_all.pack(side=tk.LEFT, padx=2)
 
-    def _create_temperature_buttons(self, temperature: float):
+    def _create_temperature_buttons(self, recommendations: List[Dict]):
         """Tạo các nút lọc nhiệt độ"""
-        recommendations = self.menu_service.get_recommendations(temperature)[:3]
-
         for item in recommendations:
             temp_type = item['temperature_type']
             btn = tk.Button(
@@ -342,7 +437,7 @@ class StaffDashboard:
     def _apply_filter(self, temp_type: Optional[str]):
         """Áp dụng bộ lọc nhiệt độ"""
         self.current_filter = temp_type
-        self._load_menu(temp_type)
+        self._apply_menu_filter()
         self._update_button_styles()
 
     def _update_button_styles(self):
@@ -367,13 +462,15 @@ class StaffDashboard:
     # cart
     def _add_to_cart(self):
         """Thêm món vào giỏ hàng"""
+        if self.checkout_in_flight:
+            return
         selected = self.tree_menu.selection()
         if not selected:
             messagebox.showwarning("Cảnh báo", "Vui lòng chọn món từ menu")
             return
 
-        item_id = self.tree_menu.item(selected[0])['values'][0]
-        item = self.menu_service.get_item_by_id(item_id)
+        # Lấy từ dòng menu đã tải, không truy vấn trên luồng Tk (có thể treo khi mất kết nối)
+        item = self.menu_binding.row_for_iid(selected[0])
 
         if not self._validate_item_availability(item):
             return
@@ -381,46 +478,26 @@ class StaffDashboard:
         size = self._get_size_from_user()
         quantity = self._get_quantity_from_user()
 
-        if not size or not quantity:
+        if not size or not quantity or self.checkout_in_flight:
             return
 
         self._update_cart(item, size, quantity)
 
     def _remove_from_cart(self):
         """Xóa món khỏi giỏ hàng"""
+        if self.checkout_in_flight:
+            return
         selected = self.tree_cart.selection()
         if not selected:
             messagebox.showwarning("Cảnh báo", "Vui lòng chọn món trong giỏ")
             return
 
-        item_id = self.tree_cart.item(selected[0])['values'][0]
-        size = self.tree_cart.item(selected[0])['values'][2]
-
-        self.cart = [
-            item for item in self.cart
-            if not (item['item_id'] == item_id and item['size'] == size)
-        ]
-
-        self._update_cart_display()
+        item_id, size = selected[0].split(":")
+        self.cart.remove(int(item_id), size)
 
     def _update_cart(self, item: Dict, size: str, quantity: int):
         """Cập nhật giỏ hàng"""
-        existing_item = next(
-            (i for i in self.cart
-             if i['item_id'] == item['item_id'] and i['size'] == size),
-            None
-        )
-
-        if existing_item:
-            existing_item['quantity'] += quantity
-        else:
-            self.cart.append({
-                **item,
-                'size': size,
-                'quantity': quantity
-            })
-
-        self._update_cart_display()
+        self.cart.add(item, size, quantity)
 
     def _validate_item_availability(self, item: Dict) -> bool:
         """Kiểm tra món có sẵn không"""
@@ -446,71 +523,191 @@ class StaffDashboard:
         return None
 
     def _update_checkout_button_state(self):
-        """Cập nhật trạng thái nút thanh toán"""
-        state = tk.NORMAL if self.cart else tk.DISABLED
+        """Cập nhật trạng thái nút thanh toán và các nút sửa giỏ"""
+        state = tk.NORMAL if self.cart and not self.checkout_in_flight else tk.DISABLED
         self.btn_checkout.config(state=state)
+        for btn in self.cart_buttons:
+            btn.config(state=tk.DISABLED if self.checkout_in_flight else tk.NORMAL)
+
+    def _set_checkout_in_flight(self, in_flight: bool):
+        self.checkout_in_flight = in_flight
+        self._update_checkout_button_state()
     # ---------------------
 
     # order
     def _create_order(self):
-        """Tạo đơn hàng mới"""
-        try:
-            if not self.cart:
-                messagebox.showwarning("Cảnh báo", "Giỏ hàng trống!")
-                return
-
-            order_id = self.order_service.create_order(self.user_id, self.cart)
-            PDFExporter.export_order(order_id, self.cart, self.lbl_total.cget("text"))
-
-            self._show_order_success(order_id)
-            self._clear_cart()
+        """Tạo đơn hàng mới trên luồng nền; giỏ bị khóa tới khi có kết quả"""
+        if self.checkout_in_flight:
+            return
+        if not self.cart:
+            messagebox.showwarning("Cảnh báo", "Giỏ hàng trống!")
+            return
 
-        except Exception as e:
+        items = self.cart.to_items()
+        total_text = self.lbl_total.cget("text")
+        if self.checkout_key is None:
+            self.checkout_key = uuid.uuid4().hex
+        checkout_key = self.checkout_key
+
+        def submit():
+            order_id = self.order_service.create_order(self.user_id, items, idempotency_key=checkout_key)
+            try:
+                self.receipts.submit(order_id, items, total_text)
+                return order_id, None
+            except ReceiptQueueFull as e:
+                return order_id, str(e)
+
+        def on_success(result):
+            order_id, receipt_error = result
+            self._set_checkout_in_flight(False)
+            # Chỉ bỏ các món vừa tạo đơn, không xóa cả giỏ đang hiển thị
+            self.cart.subtract(items)
+            self._show_order_success(order_id, receipt_error)
+
+        def on_error(e):
+            # Giữ nguyên checkout_key: bấm lại với cùng giỏ không tạo đơn trùng
+            self._set_checkout_in_flight(False)
             messagebox.showerror("Lỗi", f"Lỗi khi tạo đơn: {str(e)}")
 
-    def _show_order_success(self, order_id: int):
+        # Khóa nút thanh toán và sửa giỏ để tránh bấm lặp/đổi giỏ khi đơn đang được ghi
+        self._set_checkout_in_flight(True)
+        self.tasks.submit(submit, on_success=on_success, on_error=on_error)
+
+    def _show_order_success(self, order_id: int, receipt_error: Optional[str] = None):
         """Hiển thị thông báo tạo đơn thành công"""
+        if is_provisional(order_id):
+            messagebox.showwarning(
+                "Đã lưu đơn tạm",
+                f"Mất kết nối máy chủ, đã lưu đơn tạm #{order_id}\n"
+                "Đơn sẽ được đồng bộ khi có kết nối trở lại."
+            )
+            return
+        if receipt_error:
+            messagebox.showwarning(
+                "Thành công",
+                f"Đã tạo đơn #{order_id}\nChưa xuất được hóa đơn: {receipt_error}"
+            )
+            return
         messagebox.showinfo(
             "Thành công",
-            f"Đã tạo đơn #{order_id}\nHóa đơn đã được xuất ra!"
+            f"Đã tạo đơn #{order_id}\nHóa đơn đang được xuất..."
         )
 
+    def _on_receipt_status(self, order_id, status: str, detail):
+        """Nhận trạng thái từ luồng xuất hóa đơn, chuyển về luồng Tk"""
+        self.tasks.call_soon(self._show_receipt_status, order_id, status, detail)
+
+    def _show_receipt_status(self, order_id, status: str, detail):
+        """Hiển thị trạng thái xuất hóa đơn"""
+        texts = {
+            ReceiptQueue.QUEUED: f"🧾 Hóa đơn #{order_id}: đang chờ xuất",
+            ReceiptQueue.DONE: f"🧾 Hóa đơn #{order_id}: đã xuất",
+            ReceiptQueue.RETRYING: f"🧾 Hóa đơn #{order_id}: lỗi, đang thử lại",
+            ReceiptQueue.FAILED: f"🧾 Hóa đơn #{order_id}: xuất thất bại",
+        }
+        self.lbl_receipt.config(text=texts.get(status, ""))
+        if status == ReceiptQueue.FAILED:
+            messagebox.showerror("Lỗi", f"Không thể xuất hóa đơn #{order_id}: {detail}")
+
+    def _on_sync_backlog(self, count: int, failed: int):
+        """Nhận số đơn chờ/lỗi đồng bộ từ luồng nhật ký, chuyển về luồng Tk"""
+        self.tasks.call_soon(self._show_sync_backlog, count, failed)
+
+    def _show_sync_backlog(self, count: int, failed: int = 0):
+        texts = []
+        if count:
+            texts.append(f"⏳ {count} đơn chưa đồng bộ lên máy chủ")
+        if failed:
+            texts.append(f"⚠ {failed} đơn bị máy chủ từ chối, cần admin kiểm tra")
+        self.lbl_sync.config(text="\n".join(texts))
+
     def _clear_cart(self):
         """Xóa toàn bộ giỏ hàng"""
         self.cart.clear()
-        self._update_cart_display()
     # -----------------
 
     # Utility
-    def _get_filtered_items(self, temp_type: Optional[str]) -> List[Dict]:
-        """Lấy danh sách item đã lọc"""
-        if self.search_keyword:
-            return self.menu_service.search_items(self.search_keyword)
-
-        items = self.menu_service.get_available_coffees()
-
-        if temp_type:
-            return [item for item in items if item['temperature_type'] == temp_type]
-
-        return items
-
-    def _get_recommendations(self) -> List[int]:
-        """Lấy danh sách ID các món được đề xuất"""
-        current_temp = self.weather_api.get_weather().get('temp', 25)
-        recommendations = self.menu_service.get_recommendations(current_temp)
-        return [item['item_id'] for item in recommendations]
-
     def _on_search(self, event=None):
         """Xử lý sự kiện tìm kiếm"""
         self.search_keyword = self.search_var.get().strip()
-        self._load_menu(self.current_filter)
+        self._apply_menu_filter()
 
     def _clear_search(self):
         """Xóa bộ lọc tìm kiếm"""
         self.search_var.set("")
         self.search_keyword = ""
-        self._load_menu(self.current_filter)
+        self._apply_menu_filter()
     # ----------------
 
+    # Khóa máy
+    def _lock_screen(self):
+        """Ẩn màn hình bán hàng, chỉ hiện ô nhập mật khẩu"""
+        if self.lock_window is not None:
+            return
+        self.window.withdraw()
+        self.lock_window = tk.Toplevel(self.window)
+        self.lock_window.title("Đã khóa")
+        self.lock_window.geometry("320x150")
+        self.lock_window.protocol("WM_DELETE_WINDOW", lambda: None)
+
+        ttk.Label(self.lock_window, text=f"🔒 Máy đang khóa ({self.username})",
+                  font=('Arial', 11, 'bold')).pack(pady=(15, 10))
+        password_var = tk.StringVar()
+        entry = ttk.Entry(self.lock_window, textvariable=password_var, show="*")
+        entry.pack(padx=20, fill=tk.X)
+        entry.focus_set()
+        self.btn_unlock = ttk.Button(self.lock_window, text="Mở khóa",
+                                     command=lambda: self._unlock(password_var.get()))
+        self.btn_unlock.pack(pady=10)
+        entry.bind('<Return>', lambda event: self._unlock(password_var.get()))
+
+    def _unlock(self, password: str):
+        """Mở khóa bằng phiên trong bộ nhớ; phiên hết hạn thì xác thực lại với máy chủ"""
+        try:
+            verified = unlock_session(self.session_token, password) if self.session_token else None
+        except LoginThrottledError as e:
+            messagebox.showwarning("Tạm khóa", str(e), parent=self.lock_window)
+            return
+        if verified is not None:
+            self._finish_unlock(verified)
+            return
+
+        def verify():
+            success, _, user_id = login(self.username, password)
+            if not success or user_id != self.user_id:
+                return None
+            return create_session(user_id, self.username, 'staff', password)
+
+        def on_result(token):
+            if token:
+                self.session_token = token
+            self._finish_unlock(token is not None)
+
+        def on_error(e):
+            self.btn_unlock.config(state=tk.NORMAL)
+            messagebox.showerror("Lỗi", f"Không thể xác thực: {str(e)}", parent=self.lock_window)
+
+        self.btn_unlock.config(state=tk.DISABLED)
+        self.tasks.submit(verify, key='unlock', on_success=on_result, on_error=on_error)
+
+    def _finish_unlock(self, verified: bool):
+        if not verified:
+            self.btn_unlock.config(state=tk.NORMAL)
+            messagebox.showerror("Lỗi", "Sai mật khẩu!", parent=self.lock_window)
+            return
+        self.lock_window.destroy()
+        self.lock_window = None
+        self.window.deiconify()
+    # ----------------
+
+    def _on_destroy(self, event):
+        """Dừng worker khi đóng cửa sổ"""
+        if event.widget is self.window:
+            self.receipts.remove_listener(self._on_receipt_status)
+            self.order_service.journal.remove_listener(self._on_sync_backlog)
+            if self.session_token:
+                end_session(self.session_token)
+            self.tasks.shutdown()
+
     def run(self):
         self.window.mainloop()
\ No newline at end of file
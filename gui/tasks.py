@@ -0,0 +1,128 @@
+import tkinter as tk
+from tkinter import ttk
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+from typing import Callable, Dict, Optional
+import queue
+
+
+class TaskRunner:
+    """Chạy tác vụ chậm (DB, mạng, file) trên thread pool.
+
+    Kết quả được đưa về luồng Tk bằng hàng đợi + after(), vì widget Tk chỉ
+    được chạm từ luồng chính. Các yêu cầu cùng `key` thay thế nhau: kết quả
+    của yêu cầu cũ bị bỏ qua (vd. tìm kiếm đã lỗi thời).
+    """
+
+    def __init__(self, root: tk.Misc, max_workers: int = 4, poll_ms: int = 50):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ui-worker")
+        self._results = queue.Queue()
+        self._generations: Dict[str, int] = {}
+        self._futures: Dict[str, object] = {}
+        self._pending = 0
+        self._busy_listeners = []
+        self._closed = False
+        self._after_id = self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, fn: Callable, *args, on_success: Optional[Callable] = None,
+               on_error: Optional[Callable] = None, key: Optional[str] = None, **kwargs):
+        """Chạy fn(*args, **kwargs) trên worker, gọi on_success/on_error trên luồng Tk"""
+        generation = None
+        if key is not None:
+            self.cancel(key)
+            generation = self._generations[key]
+        self._set_pending(1)
+
+        future = self._executor.submit(fn, *args, **kwargs)
+        if key is not None:
+            self._futures[key] = future
+        future.add_done_callback(
+            lambda f: self._results.put((f, key, generation, on_success, on_error))
+        )
+        return future
+
+    def cancel(self, key: str):
+        """Hủy yêu cầu đang chờ theo key; yêu cầu đã chạy thì kết quả bị bỏ qua"""
+        self._generations[key] = self._generations.get(key, 0) + 1
+        future = self._futures.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    def call_soon(self, callback: Callable, *args):
+        """Cho phép luồng khác nhờ chạy callback trên luồng Tk"""
+        self._results.put((None, None, None, lambda _: callback(*args), None))
+
+    def add_busy_listener(self, listener: Callable[[bool], None]):
+        """Đăng ký hàm nhận trạng thái bận/rảnh (dùng cho chỉ báo đang tải)"""
+        self._busy_listeners.append(listener)
+
+    def shutdown(self):
+        self._closed = True
+        try:
+            self.root.after_cancel(self._after_id)
+        except tk.TclError:
+            pass
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _poll(self):
+        while True:
+            try:
+                future, key, generation, on_success, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if future is None:
+                self._dispatch(on_success, None)
+                continue
+
+            self._set_pending(-1)
+            if key is not None:
+                if self._futures.get(key) is future:
+                    del self._futures[key]
+                if generation != self._generations.get(key):
+                    continue  # Đã có yêu cầu mới hơn
+            try:
+                result = future.result()
+            except CancelledError:
+                continue
+            except Exception as e:
+                if on_error:
+                    self._dispatch(on_error, e)
+                else:
+                    print(f"Lỗi tác vụ nền: {str(e)}")
+                continue
+            if on_success:
+                self._dispatch(on_success, result)
+
+        if not self._closed:
+            self._after_id = self.root.after(self.poll_ms, self._poll)
+
+    @staticmethod
+    def _dispatch(callback, value):
+        try:
+            callback(value)
+        except Exception as e:
+            print(f"Lỗi xử lý kết quả tác vụ: {str(e)}")
+
+    def _set_pending(self, delta: int):
+        was_busy = self._pending > 0
+        self._pending += delta
+        if was_busy != (self._pending > 0):
+            for listener in self._busy_listeners:
+                listener(self._pending > 0)
+
+
+class LoadingIndicator:
+    """Thanh tiến trình chạy khi TaskRunner đang bận"""
+
+    def __init__(self, parent, **pack_options):
+        self.bar = ttk.Progressbar(parent, mode='indeterminate', length=120)
+        self.pack_options = pack_options
+
+    def set_busy(self, busy: bool):
+        if busy:
+            self.bar.pack(**self.pack_options)
+            self.bar.start(15)
+        else:
+            self.bar.stop()
+            self.bar.pack_forget()
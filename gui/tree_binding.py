@@ -0,0 +1,96 @@
+from tkinter import ttk
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+
+
+class TreeBinding:
+    """Gắn danh sách dòng vào một Treeview theo khóa.
+
+    `set_rows` so sánh với lần trước và chỉ thêm/xóa/sửa các dòng thay đổi.
+    `show` lọc phía client: dòng bị ẩn được detach (vẫn giữ trong Treeview)
+    và gắn lại khi cần, không phải xóa rồi chèn lại toàn bộ.
+    """
+
+    def __init__(self, tree: ttk.Treeview, key: Callable, render: Callable,
+                 tags: Optional[Callable] = None):
+        self.tree = tree
+        self.key = key  # dòng -> khóa, cũng dùng làm iid
+        self.render = render  # dòng -> tuple values
+        self.tags = tags or (lambda row: ())
+        self._rows: Dict[Hashable, dict] = {}  # khóa -> dòng, theo thứ tự gốc
+        self._rendered: Dict[Hashable, tuple] = {}  # khóa -> (values, tags) đã vẽ
+        self._iids: Dict[Hashable, str] = {}
+        self._keys: Dict[str, Hashable] = {}  # iid -> khóa
+        self._visible: Optional[List[Hashable]] = None  # None: hiện tất cả theo thứ tự gốc
+
+    def __len__(self):
+        return len(self._rows)
+
+    def rows(self) -> List[dict]:
+        return list(self._rows.values())
+
+    def row_for_iid(self, iid: str) -> Optional[dict]:
+        key = self._keys.get(iid)
+        return None if key is None else self._rows.get(key)
+
+    def set_rows(self, rows: Iterable[dict]):
+        """Thay bằng danh sách mới, chỉ chạm vào các dòng khác lần trước"""
+        new_rows = {self.key(row): row for row in rows}
+
+        removed = [key for key in self._rows if key not in new_rows]
+        if removed:
+            self.tree.delete(*(self._iids[key] for key in removed))
+            for key in removed:
+                del self._keys[self._iids.pop(key)]
+                del self._rendered[key]
+
+        for key, row in new_rows.items():
+            rendered = (self.render(row), tuple(self.tags(row)))
+            iid = self._iids.get(key)
+            if iid is None:
+                # Dòng mới để detach, lượt sắp xếp bên dưới sẽ gắn vào đúng chỗ
+                iid = self.tree.insert("", "end", iid=str(key), values=rendered[0], tags=rendered[1])
+                self.tree.detach(iid)
+                self._iids[key] = iid
+                self._keys[iid] = key
+            elif self._rendered[key] != rendered:
+                self.tree.item(iid, values=rendered[0], tags=rendered[1])
+            self._rendered[key] = rendered
+
+        self._rows = new_rows
+        self._sync_children()
+
+    def refresh(self):
+        """Vẽ lại các dòng có values/tags thay đổi (vd. khi tập đề xuất đổi)"""
+        self.set_rows(self._rows.values())
+
+    def show(self, keys: Optional[Iterable[Hashable]] = None):
+        """Chỉ hiện các khóa này theo đúng thứ tự; None để hiện tất cả"""
+        self._visible = None if keys is None else [key for key in keys if key in self._rows]
+        self._sync_children()
+
+    def filter(self, predicate: Callable[[dict], bool]):
+        """Hiện các dòng thỏa predicate, giữ thứ tự gốc"""
+        self.show([key for key, row in self._rows.items() if predicate(row)])
+
+    def _sync_children(self):
+        visible = self._rows.keys() if self._visible is None else self._visible
+        desired = [self._iids[key] for key in visible if key in self._iids]
+        current = self.tree.get_children()
+        if list(current) == desired:
+            return
+
+        desired_set = set(desired)
+        hidden = [iid for iid in current if iid not in desired_set]
+        if hidden:
+            self.tree.detach(*hidden)
+
+        kept = [iid for iid in current if iid in desired_set]
+        current_set = set(kept)
+        if kept == [iid for iid in desired if iid in current_set]:
+            # Các dòng đang hiện đã đúng thứ tự: chỉ gắn thêm các dòng còn thiếu
+            for index, iid in enumerate(desired):
+                if iid not in current_set:
+                    self.tree.move(iid, "", index)
+        else:
+            for index, iid in enumerate(desired):
+                self.tree.move(iid, "", index)
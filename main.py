@@ -1,8 +1,52 @@
-from gui.login import LoginWindow
-from services.auth import initialize_admin
+from utils.startup import StartupProfiler
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+import sys
+import os
+
+
+def bootstrap_database(profiler):
+    """Kiểm tra phiên bản schema và tạo admin mặc định, chạy nền trong lúc cửa sổ đăng nhập hiện lên.
+
+    Migrate là bước triển khai riêng (python -m database.migrations migrate), không
+    chạy ở mỗi máy POS khi mở app.
+    """
+    with profiler.phase("db_bootstrap"):
+        from database.migrations import check_schema
+        from services.auth import initialize_admin
+
+        check_schema()
+        initialize_admin()
+
+
+def preload_fonts(profiler):
+    """Nạp font và dựng sẵn mẫu hóa đơn để lần in đầu không phải chờ"""
+    with profiler.phase("font_preload"):
+        from utils.exporter import get_receipt_template
+
+        try:
+            get_receipt_template()
+        except Exception as e:
+            print(f"Không nạp trước được font hóa đơn: {str(e)}")
+
 
 if __name__ == "__main__":
-    initialize_admin()
+    # Bản đóng gói (PyInstaller) cần dòng này để tiến trình con in hóa đơn hàng loạt chạy được
+    multiprocessing.freeze_support()
+
+    profiler = StartupProfiler(
+        enabled="--profile-startup" in sys.argv or os.getenv("CAFETLU_PROFILE_STARTUP") == "1"
+    )
+
+    with profiler.phase("import_login"):
+        from gui.login import LoginWindow
+
+    background = ThreadPoolExecutor(max_workers=2, thread_name_prefix="startup")
+    bootstrap = background.submit(bootstrap_database, profiler)
+    background.submit(preload_fonts, profiler)
+    background.shutdown(wait=False)
 
-    app = LoginWindow()
-    app.run()
\ No newline at end of file
+    with profiler.phase("login_window"):
+        app = LoginWindow(bootstrap=bootstrap)
+    app.window.after_idle(profiler.mark, "login_ready")
+    app.run()
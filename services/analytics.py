@@ -0,0 +1,273 @@
+"""Phân tích đơn hàng theo thời điểm bán bằng pandas/NumPy.
+
+Số liệu theo ngày/tháng/năm, theo món và theo nhân viên đọc từ các bảng tổng
+hợp (services.sales); ở đây chỉ tính những gì cần thời điểm của từng đơn:
+bảng nhiệt thứ x giờ và doanh thu trung bình trượt.
+
+Đơn được nạp theo lô (cursor không đệm) thành DataFrame có kiểu cố định và
+lưu theo tháng ở thư mục dữ liệu (Parquet nếu có pyarrow, không thì pickle),
+lần mở sau chỉ đọc thêm các đơn mới từ database.
+
+    python -m services.analytics            # cập nhật cache và in tóm tắt
+    python -m services.analytics --rebuild  # xóa cache, nạp lại toàn bộ
+"""
+from database.db import Database
+from utils.paths import get_data_dir
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
+import threading
+import argparse
+import shutil
+import json
+import os
+
+try:
+    import pyarrow  # noqa: F401  (chỉ cần để pandas ghi/đọc Parquet)
+    CACHE_FORMAT = 'parquet'
+except ImportError:
+    CACHE_FORMAT = 'pickle'
+
+# Đọc lại các đơn gần mốc đã nạp: id tự tăng được cấp trước khi transaction
+# commit, nên đơn có id nhỏ hơn vẫn có thể xuất hiện sau lần nạp trước
+REFETCH_OVERLAP = 200
+CHUNK_ROWS = 5000
+# Tăng khi đổi nội dung cache để cache cũ bị xóa và nạp lại
+CACHE_VERSION = 3
+
+MAX_ORDER_ID_QUERY = "SELECT COALESCE(MAX(order_id), 0) AS max_id FROM orders"
+
+ORDERS_QUERY = """
+SELECT order_id, order_date, total
+FROM orders
+WHERE order_id > %s AND order_id <= %s
+ORDER BY order_id
+"""
+
+ORDER_COLUMNS = {
+    'order_id': 'int32',
+    'order_date': 'datetime64[ns]',
+    'total': 'float64',
+}
+
+
+def _typed(frame, columns):
+    """Ép kiểu cột, kể cả DataFrame rỗng"""
+    if frame.empty:
+        frame = pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in columns.items()})
+    frame = frame.astype({name: dtype for name, dtype in columns.items() if name != 'order_date'})
+    frame['order_date'] = pd.to_datetime(frame['order_date'])
+    return frame
+
+
+def _concat(frames, columns):
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return _typed(pd.DataFrame(), columns)
+    return _typed(pd.concat(frames, ignore_index=True), columns)
+
+
+class ColumnarCache:
+    """Lưu DataFrame theo tháng (orders-YYYY-MM) cùng mốc order_id đã nạp"""
+
+    def __init__(self, path=None, cache_format=CACHE_FORMAT):
+        self.path = path or get_data_dir("analytics")
+        os.makedirs(self.path, exist_ok=True)
+        self.format = cache_format
+        self.meta_path = os.path.join(self.path, "meta.json")
+
+    def load_meta(self):
+        try:
+            with open(self.meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Cache ghi bằng định dạng khác (vd. vừa cài/gỡ pyarrow) hoặc phiên bản cũ thì bỏ
+        if meta.get('format') != self.format or meta.get('version') != CACHE_VERSION:
+            return None
+        return meta
+
+    def save_meta(self, max_order_id, months):
+        meta = {'format': self.format, 'version': CACHE_VERSION, 'max_order_id': int(max_order_id), 'months': sorted(months)}
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def read(self, kind, months, columns):
+        frames = []
+        for month in months:
+            file_path = self._file(kind, month)
+            if os.path.exists(file_path):
+                frames.append(pd.read_parquet(file_path) if self.format == 'parquet' else pd.read_pickle(file_path))
+        return _concat(frames, columns)
+
+    def write(self, kind, month, frame):
+        file_path = self._file(kind, month)
+        tmp_path = f"{file_path}.tmp"
+        if self.format == 'parquet':
+            frame.to_parquet(tmp_path, index=False)
+        else:
+            frame.to_pickle(tmp_path)
+        os.replace(tmp_path, file_path)
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path, exist_ok=True)
+
+    def _file(self, kind, month):
+        extension = 'parquet' if self.format == 'parquet' else 'pkl'
+        return os.path.join(self.path, f"{kind}-{month}.{extension}")
+
+
+class SalesAnalytics:
+    """Bảng đơn trong bộ nhớ và các phép tổng hợp vector hóa trên đó.
+
+    `refresh()` chỉ nạp các đơn có order_id lớn hơn mốc đã lưu (kể cả đơn
+    đồng bộ muộn từ máy offline, vì id của chúng vẫn mới), rồi ghi lại các
+    tháng bị ảnh hưởng. DataFrame chỉ được thay mới bằng một lần gán, không
+    sửa tại chỗ, nên các hàm tổng hợp đọc được trong lúc luồng khác đang nạp.
+    """
+
+    def __init__(self, db=None, cache=None):
+        self.db = db or Database()
+        self.cache = cache or ColumnarCache()
+        self._lock = threading.Lock()
+        self.orders = _typed(pd.DataFrame(), ORDER_COLUMNS)
+        self.max_order_id = 0
+        self._months = set()
+        self._opened = False
+
+    def refresh(self):
+        """Nạp cache (lần đầu) và các đơn mới; trả về số đơn vừa nạp"""
+        with self._lock:
+            if not self._opened:
+                self._open_cache()
+            upper = self.db.fetch(MAX_ORDER_ID_QUERY)[0]['max_id']
+            lower = max(0, self.max_order_id - REFETCH_OVERLAP)
+            if upper <= lower:
+                return 0
+
+            orders = self._load(ORDERS_QUERY, (lower, upper), ORDER_COLUMNS)
+            current = self.orders
+            known = current['order_id'] > lower
+            new_orders = orders[~orders['order_id'].isin(current.loc[known, 'order_id'])]
+
+            # Thay phần đọc lại bằng dữ liệu vừa nạp
+            self.orders = _concat([current[~known], orders], ORDER_COLUMNS)
+            changed = not new_orders.empty or len(orders) != int(known.sum())
+            self.max_order_id = max(self.max_order_id, int(upper))
+            if changed:
+                self._save_months(orders['order_date'].dt.strftime('%Y-%m').unique())
+            return len(new_orders)
+
+    def rebuild(self):
+        """Xóa cache và nạp lại toàn bộ"""
+        with self._lock:
+            self.cache.clear()
+            self.orders = _typed(pd.DataFrame(), ORDER_COLUMNS)
+            self.max_order_id = 0
+            self._months = set()
+            self._opened = True
+        return self.refresh()
+
+    def _open_cache(self):
+        meta = self.cache.load_meta()
+        if meta is None:
+            self.cache.clear()  # Bỏ file của định dạng/phiên bản cũ
+        else:
+            self._months = set(meta['months'])
+            self.orders = self.cache.read('orders', self._months, ORDER_COLUMNS)
+            self.max_order_id = meta['max_order_id']
+        self._opened = True
+
+    def _load(self, query, params, columns):
+        """Đọc theo lô, mỗi lô thành một DataFrame đã ép kiểu rồi ghép lại"""
+        frames = [
+            _typed(pd.DataFrame.from_records(rows, columns=list(columns)), columns)
+            for rows in self.db.stream(query, params, batch_size=CHUNK_ROWS, row_type='tuple')
+        ]
+        return _concat(frames, columns)
+
+    def _save_months(self, months):
+        """Ghi lại các tháng có dữ liệu mới (gọi khi đang giữ lock)"""
+        orders = self.orders
+        order_months = orders['order_date'].dt.strftime('%Y-%m')
+        for month in months:
+            self.cache.write('orders', month, orders[order_months == month].reset_index(drop=True))
+            self._months.add(month)
+        self.cache.save_meta(self.max_order_id, self._months)
+
+    def hourly_heatmap(self, date_from, date_to, value='orders'):
+        """Ma trận 7 x 24 (thứ Hai = 0, giờ 0-23): số đơn hoặc doanh thu ('revenue')"""
+        orders = self._between(self.orders, date_from, date_to)
+        weekday = orders['order_date'].dt.dayofweek.to_numpy()
+        hour = orders['order_date'].dt.hour.to_numpy()
+        weights = orders['total'].to_numpy() if value == 'revenue' else None
+        # Gom theo ô (thứ, giờ) bằng bincount trên chỉ số phẳng
+        cells = np.bincount(weekday * 24 + hour, weights=weights, minlength=7 * 24)
+        return cells.reshape(7, 24)
+
+    def moving_average(self, window=7, days=90):
+        """Doanh thu theo ngày (kể cả ngày không bán) và trung bình trượt `window` ngày"""
+        end = pd.Timestamp(date.today())
+        start = end - pd.Timedelta(days=days - 1 + window - 1)
+        orders = self._between(self.orders, start.date(), end.date())
+        daily = orders.groupby(orders['order_date'].dt.normalize())['total'].sum()
+        daily = daily.reindex(pd.date_range(start, end, freq='D'), fill_value=0.0)
+        average = daily.rolling(window, min_periods=1).mean()
+        return [
+            {'sale_date': day.strftime('%d/%m/%Y'), 'total_revenue': float(revenue), 'moving_average': float(avg)}
+            for day, revenue, avg in zip(daily.index[-days:], daily.to_numpy()[-days:], average.to_numpy()[-days:])
+        ][::-1]
+
+    @staticmethod
+    def _between(frame, date_from, date_to):
+        dates = frame['order_date']
+        return frame[(dates >= pd.Timestamp(date_from)) & (dates < pd.Timestamp(date_to) + pd.Timedelta(days=1))]
+
+
+_sales_analytics = None
+_sales_analytics_lock = threading.Lock()
+
+
+def get_sales_analytics():
+    """Bản dùng chung: dữ liệu đã nạp được giữ trong bộ nhớ giữa các lần mở thống kê"""
+    global _sales_analytics
+    with _sales_analytics_lock:
+        if _sales_analytics is None:
+            _sales_analytics = SalesAnalytics()
+        return _sales_analytics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cập nhật cache phân tích đơn hàng")
+    parser.add_argument("--rebuild", action="store_true", help="Xóa cache và nạp lại toàn bộ")
+    parser.add_argument("--days", type=int, default=30, help="Số ngày cho bảng nhiệt theo giờ")
+    args = parser.parse_args()
+
+    analytics = SalesAnalytics()
+    started = datetime.now()
+    loaded = analytics.rebuild() if args.rebuild else analytics.refresh()
+    elapsed = (datetime.now() - started).total_seconds()
+    print(f"Đã nạp {loaded} đơn mới trong {elapsed:.2f}s "
+          f"({len(analytics.orders)} đơn, cache {analytics.cache.format})")
+
+    date_to = date.today()
+    date_from = date_to - timedelta(days=args.days - 1)
+    heatmap = analytics.hourly_heatmap(date_from, date_to)
+    by_hour = heatmap.sum(axis=0)
+    print(f"  Giờ đông nhất {args.days} ngày: {int(by_hour.argmax())}h ({int(by_hour.max())} đơn)")
+    for row in analytics.moving_average(window=7, days=7):
+        print(f"  {row['sale_date']}: {row['total_revenue']:,.0f} (TB 7 ngày {row['moving_average']:,.0f})")
+
+
+# Truy vấn được kiểm tra bằng EXPLAIN (database.query_check).
+# Lần nạp đầu đọc toàn bảng là chủ ý; các lần sau là range theo order_id.
+EXPLAIN_QUERIES = [
+    ("SalesAnalytics.refresh.orders", ORDERS_QUERY, (0, 1000), True),
+]
+
+
+if __name__ == "__main__":
+    main()
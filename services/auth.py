@@ -1,44 +1,135 @@
 from database.db import Database
+from services.throttle import get_login_throttle, LoginThrottledError, TERMINAL_ID
+import threading
+import secrets
+import hashlib
 import bcrypt
+import hmac
+import time
+import os
+
+# Độ khó bcrypt cho mật khẩu mới; hash cũ khác độ khó được băm lại khi đăng nhập
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# Phiên đã xác thực (chỉ trong bộ nhớ) dùng để mở khóa nhanh máy POS; hết hạn thì
+# mở khóa phải xác thực lại bằng bcrypt. Mặc định ngắn, nơi triển khai có thể tăng.
+SESSION_TTL = float(os.getenv("SESSION_TTL", 15 * 60))
+
+USER_BY_USERNAME = "SELECT user_id, username, password_hash, role FROM users WHERE username = %s"
+USERNAME_EXISTS = "SELECT 1 FROM users WHERE username = %s LIMIT 1"
+INSERT_USER = "INSERT INTO users (username, password_hash, role) VALUES (%s, %s, %s)"
+STAFF_LIST = "SELECT user_id, username, role FROM users WHERE role = 'staff'"
+UPDATE_PASSWORD_HASH = "UPDATE users SET password_hash = %s WHERE user_id = %s"
+
+_session_key = secrets.token_bytes(32)  # Sinh lại mỗi lần chạy: phiên không sống qua khởi động lại
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def hash_password(password):
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(BCRYPT_ROUNDS)).decode()
+
+def hash_rounds(password_hash):
+    """Độ khó ghi trong hash bcrypt, vd. '$2b$12$...' -> 12"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return None
 
 def initialize_admin():
     """Tạo admin nếu chưa tồn tại"""
     db = Database()
-    existing_admin = db.fetch("SELECT * FROM users WHERE username = 'admin'")
+    existing_admin = db.fetch(USERNAME_EXISTS, ("admin",))
     if not existing_admin:
-        hashed_pw = bcrypt.hashpw(b"admin123", bcrypt.gensalt())
-        db.execute(
-            "INSERT INTO users (username, password_hash, role) VALUES (%s, %s, %s)",
-            ("admin", hashed_pw.decode(), "admin")
-        )
+        db.execute(INSERT_USER, ("admin", hash_password("admin123"), "admin"))
 
 def create_staff(username, password):
     """Chỉ Admin có thể gọi hàm này để tạo staff"""
     db = Database()
-    hashed_pw = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
-    db.execute(
-        "INSERT INTO users (username, password_hash, role) VALUES (%s, %s, 'staff')",
-        (username, hashed_pw.decode())
-    )
+    db.execute(INSERT_USER, (username, hash_password(password), 'staff'))
 
 def check_username_exists(username: str) -> bool:
     db = Database()
-    result = db.fetch("SELECT * FROM users WHERE username = %s", (username,))
+    result = db.fetch(USERNAME_EXISTS, (username,))
     return len(result) > 0
 
-def login(username, password):
+def login(username, password, terminal=None):
+    """Kiểm tra mật khẩu (chậm, không gọi trên luồng Tk), trả về (success, role, user_id).
+
+    Báo LoginThrottledError trước khi chạm tới MySQL/bcrypt nếu username hoặc
+    máy này đang bị khóa do đăng nhập sai nhiều lần.
+    """
+    throttle = get_login_throttle()
+    keys = throttle.keys_for(username, terminal or TERMINAL_ID)
+    throttle.check(keys)
+
     db = Database()
-    user = db.fetch("SELECT * FROM users WHERE username = %s", (username,))
+    user = db.fetch(USER_BY_USERNAME, (username,))
     if not user:
+        throttle.record_failure(keys)
         return False, None, None  # Thêm None cho user_id nếu không tìm thấy người dùng
-    if bcrypt.checkpw(password.encode(), user[0]['password_hash'].encode()):
+    password_hash = user[0]['password_hash']
+    if bcrypt.checkpw(password.encode(), password_hash.encode()):
+        throttle.record_success(keys)
+        if hash_rounds(password_hash) != BCRYPT_ROUNDS:
+            _rehash(db, user[0]['user_id'], password)
         return True, user[0]['role'], user[0]['user_id']  # Thêm user_id vào đây
+    throttle.record_failure(keys)
     return False, None, None  # Trả về None cho role và user_id nếu sai mật khẩu
 
+def _rehash(db, user_id, password):
+    """Băm lại với BCRYPT_ROUNDS hiện tại; lỗi thì để lần đăng nhập sau"""
+    try:
+        db.execute(UPDATE_PASSWORD_HASH, (hash_password(password), user_id))
+    except Exception as e:
+        print(f"Không cập nhật được hash mật khẩu: {str(e)}")
+
+def _password_mac(password):
+    return hmac.new(_session_key, password.encode(), hashlib.sha256).digest()
+
+def create_session(user_id, username, role, password):
+    """Ghi nhớ lần đăng nhập vừa xác thực, trả về token phiên"""
+    token = secrets.token_urlsafe(32)
+    with _sessions_lock:
+        _sessions[token] = {
+            'user_id': user_id,
+            'username': username,
+            'role': role,
+            'password_mac': _password_mac(password),
+            'expires_at': time.monotonic() + SESSION_TTL,
+        }
+    return token
+
+def unlock_session(token, password):
+    """Mở khóa bằng phiên còn hạn: chỉ so HMAC, không gọi MySQL hay bcrypt.
+
+    Trả về True/False, hoặc None nếu phiên không còn (cần đăng nhập lại bằng `login`).
+    """
+    with _sessions_lock:
+        session = _sessions.get(token)
+        if session is not None and session['expires_at'] <= time.monotonic():
+            del _sessions[token]
+            session = None
+    if session is None:
+        return None
+
+    # Mở khóa cũng bị giới hạn như đăng nhập, vì so HMAC rất nhanh nên dễ dò
+    throttle = get_login_throttle()
+    keys = throttle.keys_for(session['username'], TERMINAL_ID)
+    throttle.check(keys)
+    verified = hmac.compare_digest(session['password_mac'], _password_mac(password))
+    if verified:
+        throttle.record_success(keys)
+    else:
+        throttle.record_failure(keys)
+    return verified
+
+def end_session(token):
+    with _sessions_lock:
+        _sessions.pop(token, None)
+
 def get_all_staff():
     """Lấy danh sách tất cả nhân viên"""
     db = Database()
-    results = db.fetch("SELECT user_id, username, role FROM users WHERE role = 'staff'")
+    results = db.fetch(STAFF_LIST)
     return [
         {
             'user_id': row['user_id'],
@@ -46,4 +137,14 @@ def get_all_staff():
             'role': row['role'],
         }
         for row in results
-    ] if results else []
\ No newline at end of file
+    ] if results else []
+
+# Truy vấn được kiểm tra bằng EXPLAIN (database.query_check):
+# (tên, câu SQL, tham số mẫu, có được phép quét toàn bảng)
+EXPLAIN_QUERIES = [
+    ("auth.login", USER_BY_USERNAME, ("admin",), False),
+    ("auth.check_username_exists", USERNAME_EXISTS, ("admin",), False),
+    ("auth.create_staff", INSERT_USER, ("x", "x", "staff"), False),
+    ("auth.get_all_staff", STAFF_LIST, (), False),
+    ("auth.login.rehash", UPDATE_PASSWORD_HASH, ("x", 1), False),
+]
@@ -0,0 +1,113 @@
+class CartLine:
+    """Một dòng trong giỏ: chỉ giữ các cột cần cho hiển thị và tạo đơn"""
+    __slots__ = ('item_id', 'name', 'size', 'temperature_type', 'price', 'quantity')
+
+    def __init__(self, item_id, name, size, temperature_type, price, quantity):
+        self.item_id = item_id
+        self.name = name
+        self.size = size
+        self.temperature_type = temperature_type
+        self.price = price
+        self.quantity = quantity
+
+    @property
+    def key(self):
+        return self.item_id, self.size
+
+    @property
+    def subtotal(self):
+        return self.price * self.quantity
+
+    def to_dict(self):
+        return {
+            'item_id': self.item_id,
+            'name': self.name,
+            'size': self.size,
+            'temperature_type': self.temperature_type,
+            'price': self.price,
+            'quantity': self.quantity,
+        }
+
+
+class Cart:
+    """Giỏ hàng theo khóa (item_id, size), tổng tiền cộng dồn theo từng thay đổi.
+
+    Mỗi thay đổi báo cho listener(event, line) với event là ADDED, UPDATED,
+    REMOVED hoặc CLEARED (line là None), để giao diện chỉ vẽ lại đúng dòng đó.
+    Không phụ thuộc Tk nên dùng được trong benchmark.
+    """
+
+    ADDED, UPDATED, REMOVED, CLEARED = 'added', 'updated', 'removed', 'cleared'
+
+    def __init__(self):
+        self._lines = {}  # (item_id, size) -> CartLine, giữ thứ tự thêm
+        self._listeners = []
+        self.total = 0
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __bool__(self):
+        return bool(self._lines)
+
+    def __iter__(self):
+        return iter(list(self._lines.values()))
+
+    def get(self, item_id, size):
+        return self._lines.get((item_id, size))
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def add(self, item, size, quantity):
+        """Thêm món (dict của menu); đã có cùng món và size thì cộng số lượng"""
+        line = self._lines.get((item['item_id'], size))
+        if line is not None:
+            return self.set_quantity(line.item_id, size, line.quantity + quantity)
+
+        line = CartLine(item['item_id'], item['name'], size, item['temperature_type'], item['price'], quantity)
+        self._lines[line.key] = line
+        self.total += line.subtotal
+        self._notify(self.ADDED, line)
+        return line
+
+    def set_quantity(self, item_id, size, quantity):
+        """Đổi số lượng một dòng; số lượng <= 0 thì xóa dòng"""
+        if quantity <= 0:
+            return self.remove(item_id, size)
+        line = self._lines[(item_id, size)]
+        self.total += line.price * (quantity - line.quantity)
+        line.quantity = quantity
+        self._notify(self.UPDATED, line)
+        return line
+
+    def remove(self, item_id, size):
+        line = self._lines.pop((item_id, size), None)
+        if line is not None:
+            self.total -= line.subtotal
+            self._notify(self.REMOVED, line)
+        return line
+
+    def clear(self):
+        self._lines.clear()
+        self.total = 0
+        self._notify(self.CLEARED, None)
+
+    def subtract(self, items):
+        """Trừ các món đã tạo đơn (kết quả của to_items); phần thêm sau đó vẫn được giữ"""
+        for item in items:
+            line = self._lines.get((item['item_id'], item['size']))
+            if line is not None:
+                self.set_quantity(line.item_id, line.size, line.quantity - item['quantity'])
+
+    def to_items(self):
+        """Danh sách dict cho OrderService.create_order và hàng đợi hóa đơn"""
+        return [line.to_dict() for line in self._lines.values()]
+
+    def _notify(self, event, line):
+        for listener in list(self._listeners):
+            listener(event, line)
@@ -0,0 +1,238 @@
+"""Xuất hóa đơn và chi tiết hóa đơn ra CSV, CSV nén gzip hoặc Parquet.
+
+    python -m services.export --from 2025-01-01 --to 2025-01-31 --format csv.gz --out ./export
+
+Dữ liệu được đọc bằng cursor không đệm (server-side) và ghi ra file theo từng
+lô cố định, nên bộ nhớ dùng không phụ thuộc số dòng. File được ghi vào tên tạm
+rồi mới đổi tên, xuất dở (lỗi/hủy) không để lại file hỏng.
+"""
+from database.db import Database
+from datetime import datetime, date, timedelta
+import argparse
+import gzip
+import csv
+import os
+
+BATCH_ROWS = 2000
+
+EXPORT_ORDERS_QUERY = """
+SELECT o.order_id, o.order_date, o.user_id, u.username, o.total
+FROM orders o
+LEFT JOIN users u ON u.user_id = o.user_id
+{where}
+ORDER BY o.order_date, o.order_id
+"""
+
+EXPORT_LINES_QUERY = """
+SELECT od.order_id, o.order_date, u.username, od.item_id, m.name, od.size, od.quantity, od.unit_price AS price
+FROM orders o
+JOIN order_details od ON od.order_id = o.order_id
+LEFT JOIN menu m ON m.item_id = od.item_id
+LEFT JOIN users u ON u.user_id = o.user_id
+{where}
+ORDER BY o.order_date, o.order_id
+"""
+
+COUNT_ORDERS_QUERY = "SELECT COUNT(*) AS row_count FROM orders o {where}"
+COUNT_LINES_QUERY = """SELECT COUNT(*) AS row_count
+FROM orders o JOIN order_details od ON od.order_id = o.order_id {where}"""
+
+# Bảng xuất: (câu truy vấn, câu đếm, [(cột, kiểu Parquet)])
+EXPORT_TABLES = {
+    'orders': (EXPORT_ORDERS_QUERY, COUNT_ORDERS_QUERY, [
+        ('order_id', 'int64'),
+        ('order_date', 'timestamp'),
+        ('user_id', 'int64'),
+        ('username', 'string'),
+        ('total', 'decimal(12,2)'),
+    ]),
+    'order_lines': (EXPORT_LINES_QUERY, COUNT_LINES_QUERY, [
+        ('order_id', 'int64'),
+        ('order_date', 'timestamp'),
+        ('username', 'string'),
+        ('item_id', 'int64'),
+        ('name', 'string'),
+        ('size', 'string'),
+        ('quantity', 'int64'),
+        ('price', 'decimal(10,2)'),
+    ]),
+}
+
+EXPORT_FORMATS = {'csv': '.csv', 'csv.gz': '.csv.gz', 'parquet': '.parquet'}
+
+
+class ExportCancelled(Exception):
+    """Người dùng hủy khi đang xuất"""
+
+    def __init__(self):
+        super().__init__("Đã hủy xuất dữ liệu")
+
+
+def build_date_filter(date_from=None, date_to=None):
+    """Điều kiện lọc theo ngày đặt đơn; `date_to` được tính trọn ngày"""
+    conditions, params = [], []
+    if date_from is not None:
+        conditions.append("o.order_date >= %s")
+        params.append(date_from)
+    if date_to is not None:
+        if isinstance(date_to, date) and not isinstance(date_to, datetime):
+            date_to = date_to + timedelta(days=1)
+        conditions.append("o.order_date < %s")
+        params.append(date_to)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, tuple(params)
+
+
+class CsvBatchWriter:
+    """Ghi CSV (UTF-8 có BOM để Excel đọc đúng tiếng Việt), nén gzip nếu cần"""
+
+    def __init__(self, path, columns, compress=False):
+        opener = gzip.open if compress else open
+        self._file = opener(path, 'wt', encoding='utf-8-sig', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([name for name, _ in columns])
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetBatchWriter:
+    """Ghi Parquet theo từng row group bằng pyarrow"""
+
+    def __init__(self, path, columns):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise Exception("Cần cài pyarrow để xuất Parquet (pip install pyarrow)")
+
+        types = {
+            'int64': pa.int64(),
+            'string': pa.string(),
+            'timestamp': pa.timestamp('s'),
+            'decimal(12,2)': pa.decimal128(12, 2),
+            'decimal(10,2)': pa.decimal128(10, 2),
+        }
+        self._pa = pa
+        self._schema = pa.schema([(name, types[kind]) for name, kind in columns])
+        self._writer = pq.ParquetWriter(path, self._schema, compression='snappy')
+
+    def write(self, rows):
+        arrays = [
+            self._pa.array([row[index] for row in rows], type=field.type)
+            for index, field in enumerate(self._schema)
+        ]
+        self._writer.write_batch(self._pa.RecordBatch.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def open_writer(path, columns, fmt):
+    if fmt == 'parquet':
+        return ParquetBatchWriter(path, columns)
+    return CsvBatchWriter(path, columns, compress=(fmt == 'csv.gz'))
+
+
+class OrderExporter:
+    def __init__(self, db=None, batch_size=BATCH_ROWS):
+        self.db = db or Database()
+        self.batch_size = batch_size
+
+    def export(self, output_dir, fmt='csv', date_from=None, date_to=None,
+               tables=tuple(EXPORT_TABLES), progress=None, cancel_event=None):
+        """Xuất các bảng ra `output_dir`, trả về danh sách đường dẫn file.
+
+        `progress(bảng, số dòng đã ghi, tổng số dòng)` được gọi sau mỗi lô;
+        đặt `cancel_event` (threading.Event) để dừng giữa chừng.
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise Exception(f"Định dạng không hỗ trợ: {fmt}")
+        os.makedirs(output_dir, exist_ok=True)
+
+        where, params = build_date_filter(date_from, date_to)
+        span = f"{self._label(date_from)}-{self._label(date_to)}"
+        paths = []
+        for table in tables:
+            path = os.path.join(output_dir, f"{table}_{span}{EXPORT_FORMATS[fmt]}")
+            self._export_table(table, path, fmt, where, params, progress, cancel_event)
+            paths.append(path)
+        return paths
+
+    def _export_table(self, table, path, fmt, where, params, progress, cancel_event):
+        query, count_query, columns = EXPORT_TABLES[table]
+        total = self.db.fetch(count_query.format(where=where), params)[0]['row_count']
+        if progress:
+            progress(table, 0, total)
+
+        tmp_path = f"{path}.tmp"
+        writer = open_writer(tmp_path, columns, fmt)
+        written = 0
+        try:
+            batches = self.db.stream(query.format(where=where), params, batch_size=self.batch_size, row_type='tuple')
+            try:
+                for rows in batches:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise ExportCancelled()
+                    writer.write(rows)
+                    written += len(rows)
+                    if progress:
+                        progress(table, written, max(total, written))
+            finally:
+                batches.close()  # Dừng sớm thì trả kết nối ngay, không đọc nốt
+            writer.close()
+        except BaseException:
+            writer.close()
+            os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _label(day):
+        return day.strftime("%Y%m%d") if day else "all"
+
+
+def _parse_date(text):
+    return datetime.strptime(text, "%Y-%m-%d").date()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Xuất hóa đơn và chi tiết hóa đơn")
+    parser.add_argument("--from", dest="date_from", type=_parse_date, help="Từ ngày (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", type=_parse_date, help="Đến ngày, tính trọn ngày (YYYY-MM-DD)")
+    parser.add_argument("--format", choices=tuple(EXPORT_FORMATS), default="csv")
+    parser.add_argument("--out", default=".", help="Thư mục lưu file")
+    parser.add_argument("--tables", nargs="+", choices=tuple(EXPORT_TABLES), default=list(EXPORT_TABLES))
+    parser.add_argument("--batch-size", type=int, default=BATCH_ROWS)
+    args = parser.parse_args()
+
+    def progress(table, written, total):
+        print(f"\r{table}: {written}/{total} dòng", end="", flush=True)
+        if written == total:
+            print()
+
+    paths = OrderExporter(batch_size=args.batch_size).export(
+        args.out, args.format, args.date_from, args.date_to, args.tables, progress=progress
+    )
+    for path in paths:
+        print(f"Đã xuất: {path}")
+
+
+# Truy vấn được kiểm tra bằng EXPLAIN (database.query_check):
+# (tên, câu SQL, tham số mẫu, có được phép quét toàn bảng)
+_SAMPLE_FILTER = build_date_filter(date(2025, 1, 1), date(2025, 1, 31))
+EXPLAIN_QUERIES = [
+    ("OrderExporter.orders", EXPORT_ORDERS_QUERY.format(where=_SAMPLE_FILTER[0]), _SAMPLE_FILTER[1], False),
+    ("OrderExporter.order_lines", EXPORT_LINES_QUERY.format(where=_SAMPLE_FILTER[0]), _SAMPLE_FILTER[1], False),
+    ("OrderExporter.orders.count", COUNT_ORDERS_QUERY.format(where=_SAMPLE_FILTER[0]), _SAMPLE_FILTER[1], False),
+    ("OrderExporter.order_lines.count", COUNT_LINES_QUERY.format(where=_SAMPLE_FILTER[0]), _SAMPLE_FILTER[1], False),
+    # Xuất toàn bộ không lọc ngày: quét bảng là chủ ý
+    ("OrderExporter.orders.all", EXPORT_ORDERS_QUERY.format(where=""), (), True),
+]
+
+
+if __name__ == "__main__":
+    main()
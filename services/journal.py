@@ -0,0 +1,280 @@
+from database.db import CONNECTION_ERRORS
+from utils.paths import get_data_dir
+from datetime import datetime
+from decimal import Decimal
+import threading
+import sqlite3
+import json
+import time
+import uuid
+import os
+
+# Mã tạm của đơn lưu offline có dạng "L<số>", không trùng với order_id của MySQL
+PROVISIONAL_PREFIX = "L"
+
+
+def is_provisional(order_id):
+    return str(order_id).startswith(PROVISIONAL_PREFIX)
+
+
+class OrderJournal:
+    """Nhật ký đơn hàng cục bộ (SQLite) dùng khi không kết nối được MySQL.
+
+    Đơn được ghi xuống đĩa ngay (WAL, synchronous=FULL) và nhận mã tạm. Luồng
+    đồng bộ gửi lại từng lô lên MySQL khi máy chủ hoạt động trở lại; mỗi đơn có
+    idempotency_key nên gửi lại nhiều lần cũng không tạo đơn trùng.
+
+    Lô bị MySQL từ chối (không phải lỗi kết nối) thì gửi lại từng đơn; đơn lỗi
+    quá `max_attempts` lần bị đánh dấu failed và không chặn các đơn phía sau.
+    Listener(pending_count, failed_count) được gọi trên luồng ghi/đồng bộ khi số
+    đơn chờ/lỗi thay đổi.
+    """
+
+    SCHEMA = """CREATE TABLE IF NOT EXISTS pending_orders (
+        local_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        idempotency_key TEXT NOT NULL UNIQUE,
+        user_id INTEGER,
+        order_date TEXT NOT NULL,
+        items TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        failed INTEGER NOT NULL DEFAULT 0
+    )"""
+
+    def __init__(self, path=None, offline_cooldown=30.0, max_attempts=5):
+        self.path = path or os.path.join(get_data_dir("journal"), "orders.db")
+        self.offline_cooldown = offline_cooldown
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(self.SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(pending_orders)")}
+        if 'failed' not in columns:  # Nhật ký tạo từ bản cũ
+            self._conn.execute("ALTER TABLE pending_orders ADD COLUMN failed INTEGER NOT NULL DEFAULT 0")
+        self._offline_until = 0.0
+        self._listeners = []
+        self._thread = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    # Trạng thái kết nối: sau một lần lỗi kết nối thì ghi thẳng vào nhật ký trong
+    # `offline_cooldown` giây, không để mỗi lần thanh toán phải chờ timeout
+    @property
+    def offline(self):
+        return time.monotonic() < self._offline_until
+
+    def mark_offline(self):
+        self._offline_until = time.monotonic() + self.offline_cooldown
+
+    def mark_online(self):
+        self._offline_until = 0.0
+
+    def append(self, user_id, items, idempotency_key=None, order_date=None):
+        """Ghi một đơn vào nhật ký, trả về mã tạm"""
+        idempotency_key = idempotency_key or uuid.uuid4().hex
+        order_date = order_date or datetime.now()
+        lines = [
+            {
+                'item_id': item['item_id'],
+                'size': item['size'],
+                'quantity': item['quantity'],
+                'price': str(item['price']),
+            }
+            for item in items
+        ]
+        with self._lock:
+            # Cùng một key (bấm lại khi đang offline) thì giữ đơn đã ghi
+            self._conn.execute(
+                """INSERT OR IGNORE INTO pending_orders (idempotency_key, user_id, order_date, items)
+                VALUES (?, ?, ?, ?)""",
+                (idempotency_key, user_id, order_date.isoformat(sep=' ', timespec='seconds'),
+                 json.dumps(lines))
+            )
+            local_id = self._conn.execute(
+                "SELECT local_id FROM pending_orders WHERE idempotency_key = ?", (idempotency_key,)
+            ).fetchone()[0]
+        self._notify()
+        return f"{PROVISIONAL_PREFIX}{local_id}"
+
+    def pending(self, limit=50):
+        """Các đơn chờ đồng bộ (trừ đơn đã bị đánh dấu lỗi), cũ nhất trước"""
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT local_id, idempotency_key, user_id, order_date, items
+                FROM pending_orders WHERE failed = 0 ORDER BY local_id LIMIT ?""",
+                (limit,)
+            ).fetchall()
+        return [
+            {
+                'local_id': local_id,
+                'idempotency_key': key,
+                'user_id': user_id,
+                'order_date': datetime.fromisoformat(order_date),
+                'items': [{**line, 'price': Decimal(line['price'])} for line in json.loads(items)],
+            }
+            for local_id, key, user_id, order_date, items in rows
+        ]
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pending_orders WHERE failed = 0").fetchone()[0]
+
+    def failed_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pending_orders WHERE failed = 1").fetchone()[0]
+
+    def failed(self):
+        """Các đơn bị đánh dấu lỗi kèm lỗi cuối cùng, để kiểm tra/xử lý tay"""
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT local_id, idempotency_key, user_id, order_date, items, attempts, last_error
+                FROM pending_orders WHERE failed = 1 ORDER BY local_id"""
+            ).fetchall()
+        return [
+            {'local_id': local_id, 'idempotency_key': key, 'user_id': user_id,
+             'order_date': datetime.fromisoformat(order_date), 'items': json.loads(items),
+             'attempts': attempts, 'last_error': last_error}
+            for local_id, key, user_id, order_date, items, attempts, last_error in rows
+        ]
+
+    def retry_failed(self, local_ids=None):
+        """Đưa các đơn lỗi (hoặc chỉ `local_ids`) về hàng chờ, vd. sau khi admin khôi phục món/nhân viên"""
+        with self._lock:
+            if local_ids is None:
+                self._conn.execute("UPDATE pending_orders SET failed = 0, attempts = 0 WHERE failed = 1")
+            else:
+                self._conn.executemany(
+                    "UPDATE pending_orders SET failed = 0, attempts = 0 WHERE failed = 1 AND local_id = ?",
+                    [(i,) for i in local_ids]
+                )
+        self._notify()
+        self._wakeup.set()
+
+    def discard_failed(self, local_ids):
+        """Bỏ hẳn các đơn lỗi (nên export_failed trước để còn đối chiếu)"""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM pending_orders WHERE failed = 1 AND local_id = ?", [(i,) for i in local_ids]
+            )
+        self._notify()
+
+    def export_failed(self, path):
+        """Ghi các đơn lỗi ra file JSON để đối chiếu/nhập tay; trả về số đơn"""
+        entries = [
+            {**entry, 'order_date': entry['order_date'].isoformat(sep=' ')}
+            for entry in self.failed()
+        ]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        return len(entries)
+
+    def remove(self, local_ids):
+        with self._lock:
+            self._conn.executemany("DELETE FROM pending_orders WHERE local_id = ?", [(i,) for i in local_ids])
+        self._notify()
+
+    def record_failure(self, local_ids, error):
+        """Tăng số lần lỗi; quá `max_attempts` thì đánh dấu failed"""
+        with self._lock:
+            self._conn.executemany(
+                """UPDATE pending_orders
+                SET attempts = attempts + 1, last_error = ?, failed = (attempts + 1 >= ?)
+                WHERE local_id = ?""",
+                [(error, self.max_attempts, i) for i in local_ids]
+            )
+            quarantined = [
+                i for i in local_ids
+                if self._conn.execute("SELECT failed FROM pending_orders WHERE local_id = ?", (i,)).fetchone()[0]
+            ]
+        if quarantined:
+            print(f"Đơn offline {quarantined} bị máy chủ từ chối {self.max_attempts} lần, chuyển sang lỗi: {error}")
+        self._notify()
+
+    def start(self, replay, interval=15.0, batch_size=50):
+        """Khởi động luồng đồng bộ.
+
+        `replay(entries)` gửi một lô lên MySQL trong một transaction và phải bỏ
+        qua các đơn đã có (theo idempotency_key).
+        """
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, args=(replay, interval, batch_size), name="journal-sync", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+    def _run(self, replay, interval, batch_size):
+        while not self._stopping.is_set():
+            entries = self.pending(batch_size)
+            if entries and self._replay_batch(replay, entries):
+                continue  # Có tiến triển thì gửi lô tiếp ngay
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+
+    def _replay_batch(self, replay, entries):
+        """Gửi một lô; trả về True nếu có đơn được gửi xong"""
+        try:
+            replay(entries)
+        except CONNECTION_ERRORS:
+            # Máy chủ chưa lên: không phải lỗi của đơn, không tính vào số lần thử
+            return False
+        except Exception:
+            # Có đơn bị từ chối (vd. món/nhân viên đã bị xóa): gửi lại từng đơn
+            return self._replay_each(replay, entries)
+        self.mark_online()
+        self.remove([entry['local_id'] for entry in entries])
+        return True
+
+    def _replay_each(self, replay, entries):
+        sent = []
+        try:
+            for entry in entries:
+                try:
+                    replay([entry])
+                except CONNECTION_ERRORS:
+                    break
+                except Exception as e:
+                    self.record_failure([entry['local_id']], str(e))
+                else:
+                    sent.append(entry['local_id'])
+        finally:
+            if sent:
+                self.mark_online()
+                self.remove(sent)
+        return bool(sent)
+
+    def _notify(self):
+        if not self._listeners:
+            return
+        count, failed = self.pending_count(), self.failed_count()
+        for listener in list(self._listeners):
+            try:
+                listener(count, failed)
+            except Exception as e:
+                print(f"Lỗi listener nhật ký đơn: {str(e)}")
+
+
+_order_journal = None
+_order_journal_lock = threading.Lock()
+
+
+def get_order_journal():
+    """Nhật ký đơn dùng chung cho tiến trình"""
+    global _order_journal
+    with _order_journal_lock:
+        if _order_journal is None:
+            _order_journal = OrderJournal()
+        return _order_journal
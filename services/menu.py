@@ -1,17 +1,158 @@
 from database.db import Database
+from services.sales import SalesService
+from services.search import MenuSearchIndex
+import threading
+import time
+
+MENU_SNAPSHOT_QUERY = "SELECT * FROM menu"
+INSERT_MENU_ITEM = """INSERT INTO menu 
+            (name, price, size, description, is_available, temperature_type) 
+            VALUES (%s, %s, %s, %s, %s, %s)"""
+UPDATE_MENU_ITEM = """UPDATE menu SET 
+            name=%s, price=%s, size=%s, 
+            description=%s, is_available=%s,
+            temperature_type=%s 
+            WHERE item_id=%s"""
+DELETE_MENU_ITEM = "DELETE FROM menu WHERE item_id = %s"
+TOGGLE_MENU_ITEM = "UPDATE menu SET is_available = NOT is_available WHERE item_id = %s"
+
+
+class MenuSnapshot:
+    """Ảnh chụp bảng menu, đánh chỉ mục theo item_id và temperature_type"""
+    __slots__ = ('items', 'by_id', 'available', 'by_temp')
+
+    def __init__(self, rows):
+        self.items = sorted(rows, key=lambda row: row['item_id'])
+        self.by_id = {item['item_id']: item for item in self.items}
+        self.available = [item for item in self.items if item['is_available']]
+        # Giống điều kiện SQL `temperature_type IN (%s, 'both')`
+        self.by_temp = {
+            temp_type: [
+                item for item in self.available
+                if item['temperature_type'] in (temp_type, 'both')
+            ]
+            for temp_type in ('hot', 'cold', 'both')
+        }
+
+
+class MenuCache:
+    """Cache menu trong bộ nhớ, dùng chung cho mọi MenuService trong tiến trình.
+
+    Bị xóa khi admin ghi vào menu, và được kiểm tra lại bằng truy vấn
+    COUNT/MAX(updated_at) rẻ tiền (tối đa mỗi `check_interval` giây) để bắt
+    thay đổi từ máy khác. Nếu không đọc được phiên bản (bảng chưa có cột
+    updated_at, hoặc mất kết nối) thì nạp lại sau `max_age` giây; nạp lại lỗi
+    thì tiếp tục dùng ảnh chụp cũ. Mỗi lần nạp lại, chỉ mục tìm kiếm chỉ cập nhật các
+    món đã thay đổi.
+    """
+
+    VERSION_QUERY = "SELECT COUNT(*) AS item_count, MAX(updated_at) AS updated_at FROM menu"
+
+    def __init__(self, check_interval=5.0, max_age=60.0):
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._refreshing = False
+        self._generation = 0  # tăng mỗi lần invalidate
+        self.index = MenuSearchIndex()
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+            self._generation += 1
+
+    def get(self, db):
+        """Ảnh chụp menu hiện tại.
+
+        Lock chỉ giữ lúc đọc/thay ảnh chụp; truy vấn phiên bản và nạp lại chạy
+        ngoài lock. Trong lúc một luồng đang kiểm tra/nạp lại, các luồng khác
+        nhận ngay ảnh chụp cũ thay vì chờ database.
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            now = time.monotonic()
+            if snapshot is not None:
+                if self._refreshing or now - self._checked_at < self.check_interval:
+                    return snapshot
+                self._refreshing = True
+                self._checked_at = now
+            known_version, loaded_at, generation = self._version, self._loaded_at, self._generation
+
+        try:
+            version = self._read_version(db)
+            if snapshot is None:
+                stale = True
+            elif version is None or known_version is None:
+                # Không có phiên bản để so (mất kết nối hoặc thiếu cột updated_at):
+                # dùng tiếp ảnh chụp hiện có cho tới `max_age`
+                stale = now - loaded_at >= self.max_age
+            else:
+                stale = version != known_version
+            if not stale:
+                return snapshot
+
+            try:
+                fresh = MenuSnapshot(db.fetch(MENU_SNAPSHOT_QUERY))
+            except Exception as e:
+                if snapshot is None:
+                    raise
+                # Offline vẫn bán được: giữ menu cũ, lần kiểm tra sau thử nạp lại
+                print(f"Lỗi nạp lại menu, dùng bản đã lưu: {str(e)}")
+                return snapshot
+
+            with self._lock:
+                # Admin vừa ghi trong lúc đang nạp: bản này có thể đã cũ, không lưu lại
+                if generation == self._generation:
+                    self._snapshot = fresh
+                    self.index.sync(fresh.available)
+                    self._version = version
+                    self._loaded_at = self._checked_at = now
+            return fresh
+        finally:
+            if snapshot is not None:
+                with self._lock:
+                    self._refreshing = False
+
+    def search(self, db, keyword, limit=None, candidates=None):
+        """Tìm trong các món đang bán, kết quả đã xếp hạng.
+
+        Có `candidates` (lọc lại kết quả vừa tìm) thì không kiểm tra phiên bản menu.
+        """
+        if candidates is None or self._snapshot is None:
+            self.get(db)
+        with self._lock:
+            return self.index.search(keyword, limit=limit, candidates=candidates)
+
+    def _read_version(self, db):
+        try:
+            row = db.fetch(self.VERSION_QUERY)[0]
+            return row['item_count'], row['updated_at']
+        except Exception:
+            return None
+
+
+_menu_cache = MenuCache()
+
 
 class MenuService:
+    def __init__(self, cache=None):
+        self.db = Database()
+        self.cache = cache or _menu_cache
+
+    def _snapshot(self):
+        return self.cache.get(self.db)
+
     def get_all_coffees(self):
-        db = Database()
-        return db.fetch("SELECT * FROM menu")
+        return list(self._snapshot().items)
 
     def get_available_coffees(self):
-        db = Database()
-        return db.fetch("SELECT * FROM menu WHERE is_available = TRUE")
+        return list(self._snapshot().available)
 
     def add_coffee(self, name, price, size, description, temperature_type='hot', is_available=True):
-        db = Database()
-
         if not temperature_type:
             temperature_type = 'hot'
 
@@ -21,48 +162,33 @@ class MenuService:
         if not size:
             size = "S"
 
-        return db.execute(
-            """INSERT INTO menu 
-            (name, price, size, description, is_available, temperature_type) 
-            VALUES (%s, %s, %s, %s, %s, %s)""",
+        item_id = self.db.execute(
+            INSERT_MENU_ITEM,
             (name, price, size, description, is_available, temperature_type)
         )
+        self.cache.invalidate()
+        return item_id
 
-    def search_items(self, keyword):
-        db = Database()
-        return db.fetch(
-            "SELECT * FROM menu WHERE name LIKE %s AND is_available = TRUE",
-            (f"%{keyword}%",)
-        )
+    def search_items(self, keyword, limit=None, candidates=None):
+        return self.cache.search(self.db, keyword, limit=limit, candidates=candidates)
 
     def update_coffee(self, item_id, name, price, size, description, is_available, temperature_type):
-        db = Database()
-        db.execute(
-            """UPDATE menu SET 
-            name=%s, price=%s, size=%s, 
-            description=%s, is_available=%s,
-            temperature_type=%s 
-            WHERE item_id=%s""",
+        self.db.execute(
+            UPDATE_MENU_ITEM,
             (name, price, size, description, is_available, temperature_type, item_id)
         )
+        self.cache.invalidate()
 
     def delete_item(self, item_id):
-        db = Database()
-        db.execute("DELETE FROM menu WHERE item_id = %s", (item_id,))
+        self.db.execute(DELETE_MENU_ITEM, (item_id,))
+        self.cache.invalidate()
 
     def toggle_availability(self, item_id):
-        db = Database()
-        current = db.fetch("SELECT is_available FROM menu WHERE item_id = %s", (item_id,))[0]
-        new_status = not current['is_available']
-        db.execute(
-            "UPDATE menu SET is_available = %s WHERE item_id = %s",
-            (new_status, item_id)
-        )
+        self.db.execute(TOGGLE_MENU_ITEM, (item_id,))
+        self.cache.invalidate()
 
     def get_item_by_id(self, item_id):
-        db = Database()
-        result = db.fetch("SELECT * FROM menu WHERE item_id = %s", (item_id,))
-        return result[0] if result else None
+        return self._snapshot().by_id.get(item_id)
 
     def get_recommendations(self, temp):
         if temp < 20:
@@ -73,64 +199,29 @@ class MenuService:
             return self.get_available_coffees_by_temp('both')
 
     def get_available_coffees_by_temp(self, temp_type):
-        db = Database()
-        return db.fetch(
-            "SELECT * FROM menu WHERE is_available = TRUE AND temperature_type IN (%s, 'both')",
-            (temp_type,)
-        )
+        return list(self._snapshot().by_temp.get(temp_type, ()))
 
     def get_coffees_by_temperature(self, temp_type):
-        db = Database()
-        return db.fetch(
-            """SELECT * FROM menu 
-            WHERE is_available = TRUE 
-            AND temperature_type IN (%s, 'both')""",
-            (temp_type,))
+        return self.get_available_coffees_by_temp(temp_type)
 
+    # Thống kê đọc từ bảng tổng hợp theo ngày (services.sales)
     def get_daily_sales(self):
-        db = Database()
-        query = """
-            SELECT 
-                DATE_FORMAT(o.order_date, '%d/%m/%Y') as sale_date,
-                COUNT(DISTINCT o.order_id) as total_orders,
-                SUM(od.quantity) as total_cups,
-                SUM(o.total) as total_revenue
-            FROM orders o
-            JOIN order_details od ON o.order_id = od.order_id
-            GROUP BY sale_date
-            ORDER BY o.order_date DESC
-            LIMIT 30
-        """
-        return db.fetch(query)
+        return SalesService(self.db).get_daily_sales()
 
     def get_monthly_sales(self):
-        db = Database()
-        query = """
-            SELECT 
-                DATE_FORMAT(o.order_date, '%m/%Y') as sale_month,
-                COUNT(DISTINCT o.order_id) as total_orders,
-                SUM(od.quantity) as total_cups,
-                SUM(o.total) as total_revenue
-            FROM orders o
-            JOIN order_details od ON o.order_id = od.order_id
-            GROUP BY sale_month
-            ORDER BY o.order_date DESC
-            LIMIT 12
-        """
-        return db.fetch(query)
+        return SalesService(self.db).get_monthly_sales()
 
     def get_yearly_sales(self):
-        db = Database()
-        query = """
-            SELECT 
-                DATE_FORMAT(o.order_date, '%Y') as sale_year,
-                COUNT(DISTINCT o.order_id) as total_orders,
-                SUM(od.quantity) as total_cups,
-                SUM(o.total) as total_revenue
-            FROM orders o
-            JOIN order_details od ON o.order_id = od.order_id
-            GROUP BY sale_year
-            ORDER BY o.order_date DESC
-            LIMIT 5
-        """
-        return db.fetch(query)
\ No newline at end of file
+        return SalesService(self.db).get_yearly_sales()
+
+
+# Truy vấn được kiểm tra bằng EXPLAIN (database.query_check):
+# (tên, câu SQL, tham số mẫu, có được phép quét toàn bảng)
+EXPLAIN_QUERIES = [
+    ("MenuCache.load", MENU_SNAPSHOT_QUERY, (), True),
+    ("MenuCache.version", MenuCache.VERSION_QUERY, (), False),
+    ("MenuService.add_coffee", INSERT_MENU_ITEM, ("x", 1, "S", None, True, "hot"), False),
+    ("MenuService.update_coffee", UPDATE_MENU_ITEM, ("x", 1, "S", None, True, "hot", 1), False),
+    ("MenuService.delete_item", DELETE_MENU_ITEM, (1,), False),
+    ("MenuService.toggle_availability", TOGGLE_MENU_ITEM, (1,), False),
+]
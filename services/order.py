@@ -1,74 +1,290 @@
-from database.db import Database
+from database.db import Database, CONNECTION_ERRORS, DUPLICATE_KEY_ERRNO, RETRYABLE_ERRNOS
+from services.sales import SalesService
+from services.journal import get_order_journal
+from collections import deque
+from datetime import datetime, date, timedelta
+import time
+import uuid
+
+# Thời gian tạo đơn (ms) của các lần gần nhất, dùng chung cho mọi OrderService
+_checkout_latencies = deque(maxlen=500)
+
+ALL_ORDERS_QUERY = """
+SELECT 
+    o.order_id,
+    o.order_date,
+    o.total,
+    u.username,
+    SUM(od.quantity) as total_items
+FROM orders o
+LEFT JOIN users u ON o.user_id = u.user_id
+LEFT JOIN order_details od ON o.order_id = od.order_id
+GROUP BY o.order_id
+ORDER BY o.order_date DESC
+"""
+
+# Số món tính bằng subquery theo order_id nên chỉ chạy cho các dòng của trang
+ORDERS_PAGE_QUERY = """
+SELECT 
+    o.order_id,
+    o.order_date,
+    o.total,
+    u.username,
+    (SELECT SUM(od.quantity) FROM order_details od WHERE od.order_id = o.order_id) as total_items
+FROM orders o
+LEFT JOIN users u ON o.user_id = u.user_id
+{where}
+ORDER BY o.order_date DESC, o.order_id DESC
+LIMIT %s
+"""
+
+PRICES_QUERY = "SELECT item_id, price FROM menu WHERE item_id IN ({placeholders})"
+INSERT_ORDER = "INSERT INTO orders (user_id, total, idempotency_key) VALUES (%s, %s, %s)"
+# Đơn gửi lại từ nhật ký offline giữ nguyên thời điểm bán
+INSERT_REPLAYED_ORDER = """INSERT INTO orders (user_id, order_date, total, idempotency_key)
+                    VALUES (%s, %s, %s, %s)"""
+ORDER_BY_KEY_QUERY = "SELECT order_id FROM orders WHERE idempotency_key = %s"
+EXISTING_KEYS_QUERY = "SELECT idempotency_key FROM orders WHERE idempotency_key IN ({placeholders})"
+# Lưu đơn giá lúc bán: doanh thu theo món không đổi khi menu đổi giá hoặc xóa món
+INSERT_ORDER_DETAIL = """INSERT INTO order_details 
+                    (order_id, item_id, size, quantity, unit_price) 
+                    VALUES (%s, %s, %s, %s, %s)"""
+ORDER_DETAILS_QUERY = """
+SELECT 
+    COALESCE(m.name, CONCAT('#', od.item_id)) as name,
+    od.size,
+    od.quantity,
+    COALESCE(od.unit_price, 0) as price
+FROM order_details od
+LEFT JOIN menu m ON od.item_id = m.item_id
+WHERE od.order_id = %s
+"""
+
+
+def build_orders_page_query(limit, after=None, date_from=None, date_to=None, user_id=None):
+    """Dựng câu truy vấn phân trang hóa đơn và tham số tương ứng"""
+    conditions, params = [], []
+    if after is not None:
+        after_date, after_id = after
+        conditions.append("(o.order_date < %s OR (o.order_date = %s AND o.order_id < %s))")
+        params += [after_date, after_date, after_id]
+    if date_from is not None:
+        conditions.append("o.order_date >= %s")
+        params.append(date_from)
+    if date_to is not None:
+        if isinstance(date_to, date) and not isinstance(date_to, datetime):
+            date_to = date_to + timedelta(days=1)
+        conditions.append("o.order_date < %s")
+        params.append(date_to)
+    if user_id is not None:
+        conditions.append("o.user_id = %s")
+        params.append(user_id)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return ORDERS_PAGE_QUERY.format(where=where), tuple(params) + (limit,)
 
 class OrderService:
-    def __init__(self):
+    def __init__(self, journal=None):
         self.db = Database()
+        self.journal = journal or get_order_journal()
+        self.last_checkout_ms = None
+
+    def create_order(self, user_id, items, idempotency_key=None, attempts=3):
+        """Tạo đơn trên MySQL; mất kết nối thì ghi vào nhật ký offline và trả về mã tạm.
 
-    def create_order(self, user_id, items):
-        db = Database()
+        `idempotency_key` do phía gọi sinh một lần cho mỗi giỏ hàng: gửi lại cùng
+        key (bấm lặp, thử lại sau timeout) trả về order_id đã có thay vì tạo đơn
+        mới. Deadlock/lock wait timeout được thử lại tối đa `attempts` lần.
+        """
+        started = time.perf_counter()
+        idempotency_key = idempotency_key or uuid.uuid4().hex
         try:
+            if not items:
+                raise ValueError("Giỏ hàng trống")
+            if self.journal.offline:
+                return self._journal_order(user_id, items, idempotency_key)
+
+            for attempt in range(1, attempts + 1):
+                try:
+                    return self._insert_order(user_id, items, idempotency_key)
+                except Exception as e:
+                    errno = getattr(e, 'errno', None)
+                    if errno == DUPLICATE_KEY_ERRNO:
+                        existing = self.get_order_id_by_key(idempotency_key)
+                        if existing is not None:
+                            return existing
+                    if errno in RETRYABLE_ERRNOS and attempt < attempts:
+                        time.sleep(0.05 * 2 ** (attempt - 1))
+                        continue
+                    raise
+
+        except CONNECTION_ERRORS:
+            # Có thể đơn đã commit trước khi mất kết nối: cùng idempotency_key
+            # nên lúc đồng bộ sẽ được bỏ qua, không tạo trùng
+            self.journal.mark_offline()
+            try:
+                return self._journal_order(user_id, items, idempotency_key)
+            except Exception as e:
+                raise Exception(f"Lỗi tạo đơn: {str(e)}")
+        except Exception as e:
+            raise Exception(f"Lỗi tạo đơn: {str(e)}")
+        finally:
+            self.last_checkout_ms = (time.perf_counter() - started) * 1000
+            _checkout_latencies.append(self.last_checkout_ms)
+
+    def _insert_order(self, user_id, items, idempotency_key):
+        with self.db.transaction() as cursor:
+            # Lấy giá của tất cả món trong một truy vấn
+            item_ids = sorted({item['item_id'] for item in items})
+            placeholders = ", ".join(["%s"] * len(item_ids))
+            cursor.execute(PRICES_QUERY.format(placeholders=placeholders), tuple(item_ids))
+            prices = {row['item_id']: row['price'] for row in cursor.fetchall()}
+            missing = [item_id for item_id in item_ids if item_id not in prices]
+            if missing:
+                raise ValueError(f"Không tìm thấy món {missing}")
+
             # Tính tổng tiền
-            total = 0
-            for item in items:
-                result = db.fetch(
-                    "SELECT price FROM menu WHERE item_id = %s",
-                    (item['item_id'],)
-                )
-                total += result[0]['price'] * item['quantity']
+            total = sum(prices[item['item_id']] * item['quantity'] for item in items)
+
+            # Tạo đơn hàng; trùng idempotency_key thì báo lỗi 1062 và rollback
+            cursor.execute(INSERT_ORDER, (user_id, total, idempotency_key))
+            order_id = cursor.lastrowid
 
-            # Tạo đơn hàng
-            order_id = db.execute(
-                "INSERT INTO orders (user_id, total) VALUES (%s, %s)",
-                (user_id, total)
+            # Thêm chi tiết đơn bằng một lệnh insert nhiều dòng
+            cursor.executemany(
+                INSERT_ORDER_DETAIL,
+                [
+                    (order_id, item['item_id'], item['size'], item['quantity'], prices[item['item_id']])
+                    for item in items
+                ]
             )
 
-            # Thêm chi tiết đơn
-            for item in items:
-                db.execute(
-                    """INSERT INTO order_details 
-                    (order_id, item_id, size, quantity) 
-                    VALUES (%s, %s, %s, %s)""",
-                    (
-                        order_id,
-                        item['item_id'],
-                        item['size'],
-                        item['quantity'],
-                    )
-                )
+            # Cộng dồn vào bảng tổng hợp doanh số trong cùng transaction
+            SalesService.record_order(cursor, order_id)
 
-            return order_id
+        return order_id
 
+    def get_order_id_by_key(self, idempotency_key):
+        rows = self.db.fetch(ORDER_BY_KEY_QUERY, (idempotency_key,))
+        return rows[0]['order_id'] if rows else None
 
+    def _journal_order(self, user_id, items, idempotency_key):
+        """Ghi đơn vào nhật ký offline với giá đang hiển thị trong giỏ"""
+        try:
+            return self.journal.append(user_id, items, idempotency_key)
         except Exception as e:
-            raise Exception(f"Lỗi tạo đơn: {str(e)}")
+            raise Exception(f"mất kết nối máy chủ và không ghi được đơn tạm ({str(e)})")
+
+    def replay_orders(self, entries):
+        """Gửi một lô đơn từ nhật ký offline lên MySQL trong một transaction.
+
+        Đơn có idempotency_key đã tồn tại thì bỏ qua. Trả về {local_id: order_id}
+        của các đơn vừa tạo.
+        """
+        created = {}
+        with self.db.transaction() as cursor:
+            keys = [entry['idempotency_key'] for entry in entries]
+            placeholders = ", ".join(["%s"] * len(keys))
+            cursor.execute(EXISTING_KEYS_QUERY.format(placeholders=placeholders), tuple(keys))
+            existing = {row['idempotency_key'] for row in cursor.fetchall()}
+
+            for entry in entries:
+                if entry['idempotency_key'] in existing:
+                    continue
+                total = sum(item['price'] * item['quantity'] for item in entry['items'])
+                cursor.execute(
+                    INSERT_REPLAYED_ORDER,
+                    (entry['user_id'], entry['order_date'], total, entry['idempotency_key'])
+                )
+                order_id = cursor.lastrowid
+                cursor.executemany(
+                    INSERT_ORDER_DETAIL,
+                    [
+                        (order_id, item['item_id'], item['size'], item['quantity'], item['price'])
+                        for item in entry['items']
+                    ]
+                )
+                SalesService.record_order(cursor, order_id)
+                created[entry['local_id']] = order_id
+        return created
+
+    def start_sync(self):
+        """Khởi động luồng đồng bộ nhật ký offline lên MySQL"""
+        self.journal.start(self.replay_orders)
+
+    def pending_sync_count(self):
+        return self.journal.pending_count()
+
+    def failed_sync_count(self):
+        return self.journal.failed_count()
+
+    @staticmethod
+    def checkout_stats():
+        """Thống kê thời gian tạo đơn (ms) trên các lần gần nhất"""
+        samples = sorted(_checkout_latencies)
+        if not samples:
+            return {'count': 0}
+
+        def percentile(p):
+            return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+        return {
+            'count': len(samples),
+            'last_ms': _checkout_latencies[-1],
+            'avg_ms': sum(samples) / len(samples),
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'max_ms': samples[-1],
+        }
 
     def get_all_orders(self):
         """Lấy tất cả hóa đơn với tổng tiền và số lượng món"""
-        query = """
-        SELECT 
-            o.order_id,
-            o.order_date,
-            o.total,
-            u.username,
-            SUM(od.quantity) as total_items
-        FROM orders o
-        LEFT JOIN users u ON o.user_id = u.user_id
-        LEFT JOIN order_details od ON o.order_id = od.order_id
-        GROUP BY o.order_id
-        ORDER BY o.order_date DESC
+        return self.db.fetch(ALL_ORDERS_QUERY)
+
+    def iter_all_orders(self, batch_size=500, row_type='namedtuple'):
+        """Duyệt tất cả hóa đơn theo từng lô, không nạp toàn bộ vào bộ nhớ"""
+        return self.db.fetch_iter(ALL_ORDERS_QUERY, batch_size=batch_size, row_type=row_type)
+
+    def get_orders_page(self, limit=100, after=None, date_from=None, date_to=None,
+                        user_id=None, row_type='namedtuple'):
+        """Lấy một trang hóa đơn mới nhất trước, phân trang theo (order_date, order_id).
+
+        `after` là con trỏ trả về từ trang trước; `date_to` được tính trọn ngày.
+        Trả về (rows, next_cursor), next_cursor là None khi đã hết dữ liệu.
         """
-        return self.db.fetch(query)
+        # Lấy dư một dòng để biết còn trang sau hay không
+        query, params = build_orders_page_query(limit + 1, after, date_from, date_to, user_id)
+        rows = self.db.fetch(query, params, row_type=row_type)
+
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        last = rows[-1]
+        if row_type == 'dict':
+            return rows, (last['order_date'], last['order_id'])
+        return rows, (last[1], last[0])
 
     def get_order_details(self, order_id: int):
         """Lấy chi tiết đơn hàng cụ thể"""
-        query = """
-        SELECT 
-            m.name,
-            od.size,
-            od.quantity,
-            m.price
-        FROM order_details od
-        JOIN menu m ON od.item_id = m.item_id
-        WHERE od.order_id = %s
-        """
-        return self.db.fetch(query, (order_id,))
\ No newline at end of file
+        return self.db.fetch(ORDER_DETAILS_QUERY, (order_id,))
+
+
+# Truy vấn được kiểm tra bằng EXPLAIN (database.query_check):
+# (tên, câu SQL, tham số mẫu, có được phép quét toàn bảng)
+EXPLAIN_QUERIES = [
+    ("OrderService.create_order.prices", PRICES_QUERY.format(placeholders="%s, %s, %s"), (1, 2, 3), False),
+    ("OrderService.create_order.order", INSERT_ORDER, (1, 0, "x"), False),
+    ("OrderService.get_order_id_by_key", ORDER_BY_KEY_QUERY, ("x",), False),
+    ("OrderService.replay_orders.existing", EXISTING_KEYS_QUERY.format(placeholders="%s, %s"), ("a", "b"), False),
+    ("OrderService.replay_orders.order", INSERT_REPLAYED_ORDER, (1, datetime(2025, 1, 1), 0, "x"), False),
+    ("OrderService.create_order.details", INSERT_ORDER_DETAIL, (1, 1, "S", 1, 0), False),
+    # Danh sách đầy đủ chỉ dùng cho tác vụ duyệt toàn bộ, quét bảng là chủ ý
+    ("OrderService.get_all_orders", ALL_ORDERS_QUERY, (), True),
+    ("OrderService.get_orders_page", *build_orders_page_query(200), False),
+    ("OrderService.get_orders_page.after",
+     *build_orders_page_query(200, after=(datetime(2025, 1, 1), 1)), False),
+    ("OrderService.get_orders_page.date_range",
+     *build_orders_page_query(200, date_from=date(2025, 1, 1), date_to=date(2025, 1, 31)), False),
+    ("OrderService.get_orders_page.staff", *build_orders_page_query(200, user_id=1), False),
+    ("OrderService.get_order_details", ORDER_DETAILS_QUERY, (1,), False),
+]
@@ -0,0 +1,213 @@
+from database.db import Database
+from datetime import datetime, date
+import argparse
+
+# Bảng tổng hợp doanh số theo ngày (tạo bởi migration 4): cộng dồn khi thanh toán,
+# thống kê chỉ đọc từ đây
+ROLLUP_TABLES = ("sales_daily", "sales_daily_item", "sales_daily_staff")
+
+# {where}: lọc orders theo order_id (khi thanh toán) hoặc theo ngày (khi tính lại).
+# Số cốc lấy bằng subquery theo order_id để mỗi đơn chỉ được đếm một lần.
+ORDER_CUPS = """
+    SELECT
+        o.order_date,
+        o.user_id,
+        o.total,
+        (SELECT COALESCE(SUM(od.quantity), 0) FROM order_details od WHERE od.order_id = o.order_id) as cups
+    FROM orders o
+    WHERE {where}
+"""
+
+DAILY_ROLLUP = """
+INSERT INTO sales_daily (sale_date, total_orders, total_cups, total_revenue)
+SELECT DATE(t.order_date), COUNT(*), SUM(t.cups), SUM(t.total)
+FROM (""" + ORDER_CUPS + """) t
+GROUP BY DATE(t.order_date)
+ON DUPLICATE KEY UPDATE
+    total_orders = total_orders + VALUES(total_orders),
+    total_cups = total_cups + VALUES(total_cups),
+    total_revenue = total_revenue + VALUES(total_revenue)
+"""
+
+# Doanh thu theo món tính bằng đơn giá lưu trên dòng đơn lúc bán (migration 6),
+# không phụ thuộc giá menu hiện tại hay món đã bị xóa. Dòng cũ không khôi phục được
+# đơn giá (món đã xóa trước migration) chỉ được tính số cốc.
+ITEM_ROLLUP = """
+INSERT INTO sales_daily_item (sale_date, item_id, size, total_cups, total_revenue)
+SELECT
+    DATE(o.order_date),
+    od.item_id,
+    od.size,
+    SUM(od.quantity),
+    SUM(od.quantity * COALESCE(od.unit_price, 0))
+FROM orders o
+JOIN order_details od ON od.order_id = o.order_id
+WHERE {where}
+GROUP BY DATE(o.order_date), od.item_id, od.size
+ON DUPLICATE KEY UPDATE
+    total_cups = total_cups + VALUES(total_cups),
+    total_revenue = total_revenue + VALUES(total_revenue)
+"""
+
+STAFF_ROLLUP = """
+INSERT INTO sales_daily_staff (sale_date, user_id, total_orders, total_cups, total_revenue)
+SELECT DATE(t.order_date), COALESCE(t.user_id, 0), COUNT(*), SUM(t.cups), SUM(t.total)
+FROM (""" + ORDER_CUPS + """) t
+GROUP BY DATE(t.order_date), COALESCE(t.user_id, 0)
+ON DUPLICATE KEY UPDATE
+    total_orders = total_orders + VALUES(total_orders),
+    total_cups = total_cups + VALUES(total_cups),
+    total_revenue = total_revenue + VALUES(total_revenue)
+"""
+
+ROLLUPS = (DAILY_ROLLUP, ITEM_ROLLUP, STAFF_ROLLUP)
+
+DAILY_SALES_QUERY = """
+SELECT
+    DATE_FORMAT(sale_date, '%d/%m/%Y') as sale_date,
+    total_orders,
+    total_cups,
+    total_revenue
+FROM sales_daily
+ORDER BY sales_daily.sale_date DESC
+LIMIT {limit}
+"""
+
+MONTHLY_SALES_QUERY = """
+SELECT
+    DATE_FORMAT(MIN(sale_date), '%m/%Y') as sale_month,
+    SUM(total_orders) as total_orders,
+    SUM(total_cups) as total_cups,
+    SUM(total_revenue) as total_revenue
+FROM sales_daily
+GROUP BY YEAR(sale_date), MONTH(sale_date)
+ORDER BY YEAR(sale_date) DESC, MONTH(sale_date) DESC
+LIMIT {limit}
+"""
+
+YEARLY_SALES_QUERY = """
+SELECT
+    DATE_FORMAT(MIN(sale_date), '%Y') as sale_year,
+    SUM(total_orders) as total_orders,
+    SUM(total_cups) as total_cups,
+    SUM(total_revenue) as total_revenue
+FROM sales_daily
+GROUP BY YEAR(sale_date)
+ORDER BY YEAR(sale_date) DESC
+LIMIT {limit}
+"""
+
+ITEM_SALES_QUERY = """
+SELECT
+    s.item_id,
+    m.name,
+    s.size,
+    SUM(s.total_cups) as total_cups,
+    SUM(s.total_revenue) as total_revenue
+FROM sales_daily_item s
+LEFT JOIN menu m ON m.item_id = s.item_id
+WHERE s.sale_date BETWEEN %s AND %s
+GROUP BY s.item_id, m.name, s.size
+ORDER BY total_revenue DESC
+"""
+
+STAFF_SALES_QUERY = """
+SELECT
+    s.user_id,
+    u.username,
+    SUM(s.total_orders) as total_orders,
+    SUM(s.total_cups) as total_cups,
+    SUM(s.total_revenue) as total_revenue
+FROM sales_daily_staff s
+LEFT JOIN users u ON u.user_id = s.user_id
+WHERE s.sale_date BETWEEN %s AND %s
+GROUP BY s.user_id, u.username
+ORDER BY total_revenue DESC
+"""
+
+class SalesService:
+    def __init__(self, db=None):
+        self.db = db or Database()
+
+    @staticmethod
+    def record_order(cursor, order_id):
+        """Cộng một đơn vừa ghi vào các bảng tổng hợp, chạy trong transaction của đơn"""
+        for statement in ROLLUPS:
+            cursor.execute(statement.format(where="o.order_id = %s"), (order_id,))
+
+    def rebuild(self, since=None):
+        """Tính lại bảng tổng hợp từ ngày `since` (hoặc toàn bộ nếu None)"""
+        with self.db.transaction() as cursor:
+            if since is None:
+                for table in ROLLUP_TABLES:
+                    cursor.execute(f"DELETE FROM {table}")
+                where, params = "1 = 1", ()
+            else:
+                for table in ROLLUP_TABLES:
+                    cursor.execute(f"DELETE FROM {table} WHERE sale_date >= %s", (since,))
+                where, params = "o.order_date >= %s", (since,)
+
+            for statement in ROLLUPS:
+                cursor.execute(statement.format(where=where), params)
+
+    def catch_up(self):
+        """Tính lại từ ngày tổng hợp gần nhất, bắt kịp các đơn ghi ngoài luồng thanh toán"""
+        latest = self.db.fetch("SELECT MAX(sale_date) as latest FROM sales_daily")[0]['latest']
+        self.rebuild(latest)
+
+    def get_daily_sales(self, limit=30):
+        # Không truyền params để mysql-connector không đụng tới các ký tự % của DATE_FORMAT
+        return self.db.fetch(DAILY_SALES_QUERY.format(limit=int(limit)))
+
+    def get_monthly_sales(self, limit=12):
+        return self.db.fetch(MONTHLY_SALES_QUERY.format(limit=int(limit)))
+
+    def get_yearly_sales(self, limit=5):
+        return self.db.fetch(YEARLY_SALES_QUERY.format(limit=int(limit)))
+
+    def get_item_sales(self, date_from, date_to):
+        """Doanh số theo món và size trong khoảng ngày (tính cả hai đầu)"""
+        return self.db.fetch(ITEM_SALES_QUERY, (date_from, date_to))
+
+    def get_staff_sales(self, date_from, date_to):
+        """Doanh số theo nhân viên trong khoảng ngày (tính cả hai đầu)"""
+        return self.db.fetch(STAFF_SALES_QUERY, (date_from, date_to))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tính lại bảng tổng hợp doanh số")
+    parser.add_argument("--since", help="Chỉ tính lại từ ngày này (YYYY-MM-DD)")
+    parser.add_argument("--catch-up", action="store_true", help="Tính lại từ ngày tổng hợp gần nhất")
+    args = parser.parse_args()
+
+    service = SalesService()
+    if args.catch_up:
+        service.catch_up()
+    else:
+        since = datetime.strptime(args.since, "%Y-%m-%d").date() if args.since else None
+        service.rebuild(since)
+    print("Đã cập nhật bảng tổng hợp doanh số")
+
+
+# Truy vấn được kiểm tra bằng EXPLAIN (database.query_check):
+# (tên, câu SQL, tham số mẫu, có được phép quét toàn bảng)
+EXPLAIN_QUERIES = [
+    *[
+        (f"SalesService.record_order.{table}", statement.format(where="o.order_id = %s"), (1,), False)
+        for table, statement in zip(ROLLUP_TABLES, ROLLUPS)
+    ],
+    *[
+        (f"SalesService.rebuild.{table}", statement.format(where="o.order_date >= %s"), (date(2025, 1, 1),), False)
+        for table, statement in zip(ROLLUP_TABLES, ROLLUPS)
+    ],
+    ("SalesService.get_daily_sales", DAILY_SALES_QUERY.format(limit=30), (), False),
+    # Tháng/năm gộp từ bảng theo ngày: quét O(số ngày) là chủ ý
+    ("SalesService.get_monthly_sales", MONTHLY_SALES_QUERY.format(limit=12), (), True),
+    ("SalesService.get_yearly_sales", YEARLY_SALES_QUERY.format(limit=5), (), True),
+    ("SalesService.get_item_sales", ITEM_SALES_QUERY, (date(2025, 1, 1), date(2025, 1, 31)), False),
+    ("SalesService.get_staff_sales", STAFF_SALES_QUERY, (date(2025, 1, 1), date(2025, 1, 31)), False),
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+from collections import defaultdict
+import unicodedata
+import heapq
+import math
+
+
+def fold(text: str) -> str:
+    """Bỏ dấu tiếng Việt và chữ hoa: 'Cà phê Sữa Đá' -> 'ca phe sua da'"""
+    text = text.replace('đ', 'd').replace('Đ', 'D')
+    text = unicodedata.normalize('NFD', text)
+    return ' '.join(''.join(ch for ch in text if not unicodedata.combining(ch)).casefold().split())
+
+
+def trigrams(text: str) -> frozenset:
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class _Document:
+    __slots__ = ('item', 'name', 'words', 'grams')
+
+    def __init__(self, item):
+        self.item = item
+        self.name = fold(item['name'])
+        self.words = self.name.split()
+        self.grams = trigrams(self.name)
+
+
+class MenuSearchIndex:
+    """Chỉ mục tìm kiếm món trong bộ nhớ: bỏ dấu, khớp tiền tố từng từ và
+    khớp gần đúng bằng trigram cho lỗi gõ.
+
+    Thứ hạng: trùng tên > tên bắt đầu bằng truy vấn > mọi từ khớp tiền tố >
+    gần đúng (theo hệ số Dice trên trigram).
+    """
+
+    def __init__(self, min_similarity=0.35, fuzzy_below=5):
+        self.min_similarity = min_similarity
+        self.fuzzy_below = fuzzy_below  # Chỉ tìm gần đúng khi khớp tiền tố ít hơn số này
+        self._docs = {}
+        self._prefixes = defaultdict(set)
+        self._trigrams = defaultdict(set)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, item):
+        """Thêm hoặc thay thế một món"""
+        item_id = item['item_id']
+        if item_id in self._docs:
+            self.remove(item_id)
+
+        doc = _Document(item)
+        self._docs[item_id] = doc
+        for word in doc.words:
+            for end in range(1, len(word) + 1):
+                self._prefixes[word[:end]].add(item_id)
+        for gram in doc.grams:
+            self._trigrams[gram].add(item_id)
+
+    def remove(self, item_id):
+        doc = self._docs.pop(item_id, None)
+        if doc is None:
+            return
+        for word in doc.words:
+            for end in range(1, len(word) + 1):
+                self._discard(self._prefixes, word[:end], item_id)
+        for gram in doc.grams:
+            self._discard(self._trigrams, gram, item_id)
+
+    def sync(self, items):
+        """Cập nhật theo danh sách mới, chỉ động tới các món thêm/xóa/đổi"""
+        seen = set()
+        for item in items:
+            seen.add(item['item_id'])
+            doc = self._docs.get(item['item_id'])
+            if doc is None or doc.item != item:
+                self.add(item)
+        for item_id in self._docs.keys() - seen:
+            self.remove(item_id)
+
+    def search(self, query, limit=None, candidates=None):
+        """Trả về danh sách món theo thứ hạng.
+
+        `candidates` (kết quả của một tiền tố của truy vấn) chỉ giới hạn phần
+        khớp tiền tố/trùng tên; khớp gần đúng luôn xét toàn bộ chỉ mục, vì gõ
+        thêm ký tự có thể làm một món trước đó không khớp trở nên gần đúng.
+        """
+        folded = fold(query)
+        if not folded:
+            docs = [doc for item_id, doc in self._docs.items() if candidates is None or item_id in candidates]
+            docs.sort(key=lambda doc: doc.name)
+            return [doc.item for doc in docs[:limit]]
+
+        words = folded.split()
+        matched = set(self._prefixes.get(words[0], ()))
+        for word in words[1:]:
+            matched &= self._prefixes.get(word, set())
+        if candidates is not None:
+            matched &= set(candidates)
+
+        # Khóa sắp xếp: (hạng, tên đã bỏ dấu, item_id), nhỏ hơn là tốt hơn
+        ranked = []
+        for item_id in matched:
+            name = self._docs[item_id].name
+            if name == folded:
+                rank = -4.0
+            elif name.startswith(folded):
+                rank = -3.0
+            else:
+                rank = -2.0
+            ranked.append((rank, name, item_id))
+
+        if len(ranked) < self.fuzzy_below:
+            ranked.extend(self._fuzzy(folded, matched))
+
+        if limit is not None and limit < len(ranked):
+            ranked = heapq.nsmallest(limit, ranked)
+        else:
+            ranked.sort()
+        return [self._docs[item_id].item for _, _, item_id in ranked]
+
+    def _fuzzy(self, folded, exclude):
+        """Khớp gần đúng theo hệ số Dice trên trigram.
+
+        Món đạt ngưỡng phải có ít nhất `needed` trigram chung, nên chỉ cần lấy
+        ứng viên từ (số trigram - needed + 1) danh sách hiếm nhất.
+        """
+        query_grams = trigrams(folded)
+        needed = max(1, math.ceil(self.min_similarity * len(query_grams) / (2 - self.min_similarity)))
+        postings = sorted((self._trigrams.get(gram, ()) for gram in query_grams), key=len)
+
+        seen = set()
+        for ids in postings[:len(query_grams) - needed + 1]:
+            seen.update(ids)
+        seen -= exclude
+
+        for item_id in seen:
+            doc = self._docs[item_id]
+            similarity = 2 * len(query_grams & doc.grams) / (len(query_grams) + len(doc.grams))
+            if similarity >= self.min_similarity:
+                yield -similarity, doc.name, item_id
+
+    @staticmethod
+    def _discard(postings, key, item_id):
+        ids = postings.get(key)
+        if ids is not None:
+            ids.discard(item_id)
+            if not ids:
+                del postings[key]
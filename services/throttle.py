@@ -0,0 +1,143 @@
+from utils.paths import get_data_dir
+from collections import deque
+import threading
+import socket
+import json
+import time
+import os
+
+
+class LoginThrottledError(Exception):
+    """Đăng nhập sai quá nhiều lần, đang bị khóa tạm thời"""
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"Đăng nhập sai quá nhiều lần, thử lại sau {int(retry_after) + 1} giây")
+
+
+class LoginThrottle:
+    """Giới hạn đăng nhập sai theo cửa sổ trượt cho từng khóa (username, máy).
+
+    Sai quá `limits[loại khóa]` lần trong `window` giây thì khóa; mỗi lần bị khóa tiếp
+    theo thời gian khóa gấp đôi (tối đa `max_lockout`). Khóa theo username
+    được xóa khi đăng nhập đúng; khóa theo máy chỉ hết theo thời gian để
+    không thể xen một lần đăng nhập đúng vào giữa các lần dò mật khẩu.
+    Nếu có `persist_path`, trạng thái được ghi ra JSON để giữ qua lần khởi động lại.
+    """
+
+    def __init__(self, limits=None, window=300.0, base_lockout=30.0, max_lockout=3600.0,
+                 persist_path=None, max_keys=10000):
+        # Số lần sai tối đa trong cửa sổ theo loại khóa
+        self.limits = limits or {'user': 5, 'terminal': 20}
+        self.window = window
+        self.base_lockout = base_lockout
+        self.max_lockout = max_lockout
+        self.persist_path = persist_path
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._failures = {}  # "loại:giá trị" -> deque thời điểm sai
+        self._lockouts = {}  # "loại:giá trị" -> [khóa đến, số lần đã bị khóa]
+        self._load()
+
+    @staticmethod
+    def keys_for(username, terminal):
+        return [f"user:{username.casefold()}", f"terminal:{terminal}"]
+
+    def check(self, keys):
+        """Báo LoginThrottledError nếu một trong các khóa đang bị khóa"""
+        now = time.time()
+        with self._lock:
+            retry_after = max(
+                (self._lockouts[key][0] - now for key in keys if key in self._lockouts),
+                default=0
+            )
+        if retry_after > 0:
+            raise LoginThrottledError(retry_after)
+
+    def record_failure(self, keys):
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                failures = self._failures.setdefault(key, deque())
+                failures.append(now)
+                self._expire(failures, now)
+                if len(failures) >= self.limits[key.split(':', 1)[0]]:
+                    locked_until, strikes = self._lockouts.get(key, (0, 0))
+                    if locked_until + self.window < now:
+                        strikes = 0  # Lần khóa trước đã lâu: tính lại từ đầu
+                    lockout = min(self.max_lockout, self.base_lockout * 2 ** strikes)
+                    self._lockouts[key] = [now + lockout, strikes + 1]
+                    failures.clear()
+            if len(self._failures) > self.max_keys:
+                self._prune(now)
+            self._save()
+
+    def record_success(self, keys):
+        with self._lock:
+            for key in keys:
+                if key.startswith("user:"):
+                    self._failures.pop(key, None)
+                    self._lockouts.pop(key, None)
+            self._save()
+
+    def _expire(self, failures, now):
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+
+    def _prune(self, now):
+        """Bỏ các khóa không còn lần sai trong cửa sổ và đã hết hạn khóa"""
+        for key in list(self._failures):
+            self._expire(self._failures[key], now)
+            if not self._failures[key]:
+                del self._failures[key]
+        for key, (locked_until, _) in list(self._lockouts.items()):
+            # Giữ số lần bị khóa thêm một cửa sổ để backoff còn tác dụng
+            if locked_until + self.window < now:
+                del self._lockouts[key]
+
+    def _load(self):
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, encoding='utf-8') as f:
+                state = json.load(f)
+            self._failures = {key: deque(times) for key, times in state.get('failures', {}).items()}
+            self._lockouts = {key: list(value) for key, value in state.get('lockouts', {}).items()}
+            self._prune(time.time())
+        except (OSError, ValueError) as e:
+            print(f"Bỏ qua trạng thái giới hạn đăng nhập hỏng: {str(e)}")
+
+    def _save(self):
+        """Ghi trạng thái (gọi khi đang giữ lock)"""
+        if not self.persist_path:
+            return
+        state = {
+            'failures': {key: [round(t, 1) for t in times] for key, times in self._failures.items() if times},
+            'lockouts': self._lockouts,
+        }
+        tmp_path = f"{self.persist_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.persist_path)
+        except OSError as e:
+            print(f"Không ghi được trạng thái giới hạn đăng nhập: {str(e)}")
+
+
+# Mã máy POS hiện tại, dùng làm khóa giới hạn theo máy
+TERMINAL_ID = os.getenv("POS_TERMINAL_ID") or socket.gethostname()
+
+_login_throttle = None
+_login_throttle_lock = threading.Lock()
+
+
+def get_login_throttle():
+    """Bộ giới hạn dùng chung; LOGIN_THROTTLE_PERSIST=1 để giữ trạng thái qua lần chạy sau"""
+    global _login_throttle
+    with _login_throttle_lock:
+        if _login_throttle is None:
+            persist_path = None
+            if os.getenv("LOGIN_THROTTLE_PERSIST") == "1":
+                persist_path = os.path.join(get_data_dir(), "login_throttle.json")
+            _login_throttle = LoginThrottle(persist_path=persist_path)
+        return _login_throttle
@@ -0,0 +1,192 @@
+"""Báo cáo cuối ngày (Z-report): tổng hợp theo món, size, nhân viên, giờ và
+in lại hóa đơn trong khoảng ngày.
+
+    python -m services.zreport                          # hôm nay, chỉ trang tổng hợp
+    python -m services.zreport --date 2025-01-31 --receipts single
+    python -m services.zreport --from 2025-01-01 --to 2025-01-31 --receipts files --workers 4
+"""
+from database.db import Database
+from services.export import build_date_filter
+from datetime import datetime, date
+from itertools import groupby
+import argparse
+import time
+import os
+
+SUMMARY_QUERY = """
+SELECT COUNT(*) AS total_orders, COALESCE(SUM(o.total), 0) AS total_revenue
+FROM orders o
+{where}
+"""
+
+CUPS_QUERY = """
+SELECT COALESCE(SUM(od.quantity), 0) AS total_cups
+FROM orders o
+JOIN order_details od ON od.order_id = o.order_id
+{where}
+"""
+
+# Doanh thu theo món tính bằng đơn giá lúc bán, giống bảng tổng hợp sales_daily_item;
+# menu chỉ dùng để lấy tên
+BY_ITEM_QUERY = """
+SELECT od.item_id, COALESCE(m.name, CONCAT('#', od.item_id)) AS name, od.size,
+       SUM(od.quantity) AS total_cups, SUM(od.quantity * COALESCE(od.unit_price, 0)) AS total_revenue
+FROM orders o
+JOIN order_details od ON od.order_id = o.order_id
+LEFT JOIN menu m ON m.item_id = od.item_id
+{where}
+GROUP BY od.item_id, m.name, od.size
+ORDER BY total_revenue DESC
+"""
+
+BY_SIZE_QUERY = """
+SELECT od.size, SUM(od.quantity) AS total_cups, SUM(od.quantity * COALESCE(od.unit_price, 0)) AS total_revenue
+FROM orders o
+JOIN order_details od ON od.order_id = o.order_id
+{where}
+GROUP BY od.size
+ORDER BY od.size
+"""
+
+BY_STAFF_QUERY = """
+SELECT o.user_id, COALESCE(u.username, '(không rõ)') AS username, COUNT(*) AS total_orders,
+       SUM((SELECT COALESCE(SUM(od.quantity), 0) FROM order_details od WHERE od.order_id = o.order_id)) AS total_cups,
+       SUM(o.total) AS total_revenue
+FROM orders o
+LEFT JOIN users u ON u.user_id = o.user_id
+{where}
+GROUP BY o.user_id, u.username
+ORDER BY total_revenue DESC
+"""
+
+BY_HOUR_QUERY = """
+SELECT HOUR(o.order_date) AS hour, COUNT(*) AS total_orders, SUM(o.total) AS total_revenue
+FROM orders o
+{where}
+GROUP BY HOUR(o.order_date)
+ORDER BY hour
+"""
+
+# Mỗi dòng là một món của một đơn, các dòng cùng đơn đứng liền nhau
+RECEIPTS_QUERY = """
+SELECT o.order_id, o.order_date, o.total, COALESCE(u.username, '') AS username,
+       COALESCE(m.name, CONCAT('#', od.item_id)) AS name, od.size, od.quantity, COALESCE(od.unit_price, 0) AS price
+FROM orders o
+JOIN order_details od ON od.order_id = o.order_id
+LEFT JOIN menu m ON m.item_id = od.item_id
+LEFT JOIN users u ON u.user_id = o.user_id
+{where}
+ORDER BY o.order_date, o.order_id
+"""
+
+
+class ZReportService:
+    def __init__(self, db=None):
+        self.db = db or Database()
+
+    def build(self, date_from, date_to):
+        """Số liệu tổng hợp cho khoảng ngày (tính cả hai đầu)"""
+        if date_from > date_to:
+            raise ValueError(f"Khoảng ngày không hợp lệ: {date_from} sau {date_to}")
+        where, params = build_date_filter(date_from, date_to)
+        summary = self.db.fetch(SUMMARY_QUERY.format(where=where), params)[0]
+        return {
+            'date_from': date_from,
+            'date_to': date_to,
+            'generated_at': datetime.now(),
+            'total_orders': summary['total_orders'],
+            'total_revenue': summary['total_revenue'],
+            'total_cups': self.db.fetch(CUPS_QUERY.format(where=where), params)[0]['total_cups'],
+            'by_item': self.db.fetch(BY_ITEM_QUERY.format(where=where), params),
+            'by_size': self.db.fetch(BY_SIZE_QUERY.format(where=where), params),
+            'by_staff': self.db.fetch(BY_STAFF_QUERY.format(where=where), params),
+            'by_hour': self.db.fetch(BY_HOUR_QUERY.format(where=where), params),
+        }
+
+    def iter_receipts(self, date_from, date_to, batch_size=1000):
+        """Duyệt từng hóa đơn (kèm danh sách món) theo thứ tự thời gian, không nạp hết vào bộ nhớ"""
+        where, params = build_date_filter(date_from, date_to)
+        rows = self.db.fetch_iter(RECEIPTS_QUERY.format(where=where), params, batch_size=batch_size)
+        for order_id, lines in groupby(rows, key=lambda row: row['order_id']):
+            lines = list(lines)
+            yield {
+                'order_id': order_id,
+                'order_date': lines[0]['order_date'],
+                'username': lines[0]['username'],
+                'total': lines[0]['total'],
+                'items': [
+                    {'name': line['name'], 'size': line['size'], 'quantity': line['quantity'], 'price': line['price']}
+                    for line in lines
+                ],
+            }
+
+    def export(self, date_from, date_to, output_dir=None, receipts=None, workers=None):
+        """Tạo file PDF báo cáo; `receipts` là None, 'single' (cùng file) hoặc 'files' (mỗi đơn một file).
+
+        Trả về (đường dẫn báo cáo, số hóa đơn đã in lại).
+        """
+        from utils.exporter import PDFExporter
+
+        output_dir = output_dir or os.path.join(os.path.expanduser("~"), "Downloads")
+        os.makedirs(output_dir, exist_ok=True)
+        report = self.build(date_from, date_to)
+        span = f"{date_from:%Y%m%d}-{date_to:%Y%m%d}"
+        path = os.path.join(output_dir, f"z_report_{span}.pdf")
+
+        if receipts == 'single':
+            count = PDFExporter.export_z_report(report, path, receipts=self.iter_receipts(date_from, date_to))
+            return path, count
+
+        PDFExporter.export_z_report(report, path)
+        if receipts == 'files':
+            count = PDFExporter.export_receipts(
+                self.iter_receipts(date_from, date_to),
+                os.path.join(output_dir, f"receipts_{span}"),
+                expected=report['total_orders'],
+                workers=workers
+            )
+            return path, count
+        return path, 0
+
+
+def _parse_date(text):
+    return datetime.strptime(text, "%Y-%m-%d").date()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Báo cáo cuối ngày (Z-report) ra PDF")
+    parser.add_argument("--date", type=_parse_date, help="Một ngày (YYYY-MM-DD), mặc định hôm nay")
+    parser.add_argument("--from", dest="date_from", type=_parse_date, help="Từ ngày (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", type=_parse_date, help="Đến ngày (YYYY-MM-DD)")
+    parser.add_argument("--receipts", choices=("single", "files"), help="In lại hóa đơn: cùng file hoặc mỗi đơn một file")
+    parser.add_argument("--workers", type=int, help="Số tiến trình khi in nhiều file")
+    parser.add_argument("--out", help="Thư mục lưu file (mặc định ~/Downloads)")
+    args = parser.parse_args()
+
+    date_from = args.date_from or args.date or args.date_to or date.today()
+    date_to = args.date_to or args.date or date_from
+
+    started = time.perf_counter()
+    path, count = ZReportService().export(date_from, date_to, args.out, args.receipts, args.workers)
+    print(f"Đã tạo {path} ({count} hóa đơn in lại) trong {time.perf_counter() - started:.2f}s")
+
+
+# Truy vấn được kiểm tra bằng EXPLAIN (database.query_check):
+# (tên, câu SQL, tham số mẫu, có được phép quét toàn bảng)
+_SAMPLE_FILTER = build_date_filter(date(2025, 1, 1), date(2025, 1, 1))
+EXPLAIN_QUERIES = [
+    (f"ZReportService.{name}", query.format(where=_SAMPLE_FILTER[0]), _SAMPLE_FILTER[1], False)
+    for name, query in (
+        ("summary", SUMMARY_QUERY),
+        ("cups", CUPS_QUERY),
+        ("by_item", BY_ITEM_QUERY),
+        ("by_size", BY_SIZE_QUERY),
+        ("by_staff", BY_STAFF_QUERY),
+        ("by_hour", BY_HOUR_QUERY),
+        ("receipts", RECEIPTS_QUERY),
+    )
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+from decimal import Decimal
+from services.cart import Cart
+import pytest
+
+LATTE = {'item_id': 1, 'name': 'Latte', 'temperature_type': 'hot', 'price': Decimal('35000')}
+TRA_DAO = {'item_id': 2, 'name': 'Trà đào', 'temperature_type': 'cold', 'price': Decimal('30000')}
+
+
+@pytest.fixture
+def cart():
+    return Cart()
+
+
+@pytest.fixture
+def events(cart):
+    received = []
+    cart.add_listener(lambda event, line: received.append((event, line and (line.item_id, line.size, line.quantity))))
+    return received
+
+
+def test_same_item_and_size_merges_quantity(cart):
+    cart.add(LATTE, 'M', 1)
+    cart.add(LATTE, 'M', 2)
+    cart.add(LATTE, 'L', 1)
+
+    assert len(cart) == 2
+    assert cart.get(1, 'M').quantity == 3
+    assert cart.get(1, 'L').quantity == 1
+
+
+def test_set_quantity_zero_removes_line(cart):
+    cart.add(LATTE, 'M', 2)
+    cart.set_quantity(1, 'M', 0)
+
+    assert cart.get(1, 'M') is None
+    assert not cart
+    assert cart.total == 0
+
+
+def test_total_follows_every_change(cart):
+    cart.add(LATTE, 'M', 2)
+    assert cart.total == Decimal('70000')
+
+    cart.add(TRA_DAO, 'S', 1)
+    assert cart.total == Decimal('100000')
+
+    cart.set_quantity(2, 'S', 3)
+    assert cart.total == Decimal('160000')
+
+    cart.remove(1, 'M')
+    assert cart.total == Decimal('90000')
+    assert cart.total == sum(line.subtotal for line in cart)
+
+    cart.clear()
+    assert cart.total == 0
+
+
+def test_events_carry_changed_line(cart, events):
+    cart.add(LATTE, 'M', 1)
+    cart.add(LATTE, 'M', 2)
+    cart.remove(1, 'M')
+    cart.add(TRA_DAO, 'S', 1)
+    cart.clear()
+
+    assert events == [
+        (Cart.ADDED, (1, 'M', 1)),
+        (Cart.UPDATED, (1, 'M', 3)),
+        (Cart.REMOVED, (1, 'M', 3)),
+        (Cart.ADDED, (2, 'S', 1)),
+        (Cart.CLEARED, None),
+    ]
+
+
+def test_subtract_keeps_lines_added_after_checkout(cart):
+    cart.add(LATTE, 'M', 1)
+    submitted = cart.to_items()
+    cart.add(LATTE, 'M', 1)
+    cart.add(TRA_DAO, 'S', 1)
+
+    cart.subtract(submitted)
+
+    assert cart.get(1, 'M').quantity == 1
+    assert cart.get(2, 'S').quantity == 1
+    assert cart.total == Decimal('65000')
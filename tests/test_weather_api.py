@@ -0,0 +1,104 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.api import WeatherAPI
+import threading
+import json
+import time
+import pytest
+
+
+class StubWeatherServer:
+    """Máy chủ HTTP cục bộ trả dữ liệu giống OpenWeatherMap; đặt `status` >= 400 để giả lỗi"""
+
+    def __init__(self):
+        self.status = 200
+        self.temp = 31.5
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                body = json.dumps({
+                    'main': {'temp': stub.temp},
+                    'weather': [{'description': 'nắng nhẹ'}],
+                }).encode('utf-8')
+                self.send_response(stub.status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_port}/weather"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv('WEATHER_API_KEY', 'test-key')
+    stub = StubWeatherServer()
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def cache_file(tmp_path):
+    return str(tmp_path / "weather.json")
+
+
+def wait_for_refresh(api, timeout=5.0):
+    """Chờ luồng làm mới nền chạy xong"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with api._lock:
+            if not api._refreshing:
+                return
+        time.sleep(0.01)
+    raise AssertionError("Làm mới nền không kết thúc")
+
+
+def test_ttl_cache_hit(server, cache_file):
+    api = WeatherAPI(base_url=server.url, ttl=600, cache_file=cache_file)
+
+    assert api.get_weather() == {'temp': 31.5, 'description': 'nắng nhẹ'}
+    server.temp = 20.0
+    assert api.get_weather()['temp'] == 31.5
+    assert server.requests == 1
+
+
+def test_stale_value_served_when_server_errors(server, cache_file):
+    api = WeatherAPI(base_url=server.url, ttl=0.05, cache_file=cache_file)
+    api.get_weather()
+
+    server.status = 500
+    time.sleep(0.1)
+    assert api.get_weather()['temp'] == 31.5  # Hết hạn: trả bản cũ ngay, làm mới nền
+    wait_for_refresh(api)
+
+    assert server.requests == 2
+    assert api.get_weather()['temp'] == 31.5
+    wait_for_refresh(api)
+    with pytest.raises(Exception):
+        api.refresh()
+
+
+def test_disk_fallback_after_restart(server, cache_file):
+    WeatherAPI(base_url=server.url, cache_file=cache_file).get_weather()
+
+    # Khởi động lại khi máy chủ lỗi và bản lưu đã hết hạn: vẫn có thời tiết từ weather.json
+    server.status = 503
+    restarted = WeatherAPI(base_url=server.url, ttl=0, cache_file=cache_file)
+    assert restarted.get_weather() == {'temp': 31.5, 'description': 'nắng nhẹ'}
+    wait_for_refresh(restarted)
+
+    assert server.requests == 2
+    assert restarted.get_weather()['temp'] == 31.5
+    wait_for_refresh(restarted)
@@ -1,26 +1,112 @@
-import requests
-from dotenv import load_dotenv
+from utils.config import load_env
+from utils.paths import get_data_dir
+import threading
+import json
+import time
 import os
 
-load_dotenv()
+load_env()
+
 
 class WeatherAPI:
+    """Thời tiết có cache TTL, làm mới nền khi hết hạn và dự phòng lưu trên đĩa.
+
+    - Còn hạn: trả ngay từ bộ nhớ.
+    - Hết hạn: trả dữ liệu cũ ngay và làm mới trên một luồng nền.
+    - Chưa có gì: gọi API (có timeout); lỗi thì dùng bản lưu gần nhất trên đĩa.
+    """
+
+    DEFAULT_URL = "https://api.openweathermap.org/data/2.5/weather"
+
+    def __init__(self, base_url=None, ttl=600, timeout=5, cache_file=None, city='Hanoi,VN'):
+        self.base_url = base_url or os.getenv('WEATHER_API_URL') or self.DEFAULT_URL
+        self.ttl = ttl
+        self.timeout = timeout
+        self.city = city
+        self.cache_file = cache_file or os.path.join(get_data_dir(), "weather.json")
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._weather = None
+        self._fetched_at = 0.0
+        self._load_last_known()
+
     def get_weather(self):
+        with self._lock:
+            weather, age = self._weather, time.time() - self._fetched_at
+
+        if weather is not None:
+            if age >= self.ttl:
+                self.refresh_async()
+            return dict(weather)
+
+        return dict(self.refresh())
+
+    def refresh(self):
+        """Gọi API ngay trên luồng hiện tại và cập nhật cache"""
+        weather = self._fetch()
+        with self._lock:
+            self._weather = weather
+            self._fetched_at = time.time()
+        self._save_last_known(weather, self._fetched_at)
+        return weather
+
+    def refresh_async(self):
+        """Làm mới trên luồng nền, bỏ qua nếu đang có một lần làm mới khác"""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def worker():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Lỗi làm mới thời tiết: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=worker, name="weather-refresh", daemon=True).start()
+
+    def _fetch(self):
+        import requests  # Nhập khi cần: requests nặng, không làm chậm lúc mở app
+
         API_KEY = os.getenv('WEATHER_API_KEY')
         if not API_KEY:
             raise ValueError("Missing WEATHER_API_KEY in .env file")
 
         response = requests.get(
-            "https://api.openweathermap.org/data/2.5/weather",
+            self.base_url,
             params={
-                'q': 'Hanoi,VN',
+                'q': self.city,
                 'appid': API_KEY,
                 'units': 'metric'  # Sử dụng độ Celsius
-            }
+            },
+            timeout=self.timeout
         )
+        response.raise_for_status()
         data = response.json()
         return {
             'temp': data['main']['temp'],
             # 'temp': 40,
             'description': data['weather'][0]['description']
         }
+
+    def _load_last_known(self):
+        """Nạp bản thời tiết gần nhất đã lưu trên đĩa (nếu có)"""
+        try:
+            with open(self.cache_file, encoding='utf-8') as f:
+                saved = json.load(f)
+            self._weather = {'temp': saved['temp'], 'description': saved['description']}
+            self._fetched_at = float(saved['fetched_at'])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def _save_last_known(self, weather, fetched_at):
+        tmp_path = f"{self.cache_file}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({**weather, 'fetched_at': fetched_at}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            print(f"Không thể lưu cache thời tiết: {str(e)}")
@@ -0,0 +1,14 @@
+from dotenv import load_dotenv
+import threading
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_env():
+    """Nạp .env một lần cho cả tiến trình (gọi lại nhiều lần cũng không đọc lại file)"""
+    global _loaded
+    with _lock:
+        if not _loaded:
+            load_dotenv()
+            _loaded = True
@@ -1,44 +1,371 @@
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from utils.paths import get_asset_path, get_data_dir
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
+from itertools import islice
+import subprocess
+import threading
+import sys
+import io
 import os
-from reportlab.pdfgen import canvas
 
-pdfmetrics.registerFont(TTFont('Arial', 'arial.ttf'))
-pdfmetrics.registerFont(TTFont('Arial-Bold', 'arialbd.ttf'))
+FONT, FONT_BOLD = "ReceiptFont", "ReceiptFont-Bold"
+
+# Font thử lần lượt: Arial của Windows (ReportLab tự tìm trong thư mục font hệ
+# thống), không có thì DejaVu đi kèm ứng dụng, đủ dấu tiếng Việt
+FONT_CANDIDATES = (
+    ("arial.ttf", "arialbd.ttf"),
+    (get_asset_path("fonts", "DejaVuSans.ttf"), get_asset_path("fonts", "DejaVuSans-Bold.ttf")),
+)
+
+_fonts_lock = threading.Lock()
+_fonts_loaded = False
+
+# In lại từ chừng này hóa đơn trở lên (chế độ nhiều file) thì chia cho nhiều tiến trình
+PROCESS_POOL_MIN_RECEIPTS = 200
+RECEIPTS_PER_TASK = 100
+
+
+def load_fonts():
+    """Nhập ReportLab và đăng ký font một lần; gọi sớm trên luồng nền để lần xuất đầu không phải chờ"""
+    global _fonts_loaded
+    with _fonts_lock:
+        if _fonts_loaded:
+            return
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont, TTFError
+
+        errors = []
+        for regular, bold in FONT_CANDIDATES:
+            try:
+                fonts = (TTFont(FONT, regular), TTFont(FONT_BOLD, bold))
+            except (OSError, TTFError) as e:
+                errors.append(str(e))
+                continue
+            for font in fonts:
+                pdfmetrics.registerFont(font)
+            _fonts_loaded = True
+            return
+        raise Exception(f"Không tìm thấy font cho hóa đơn: {'; '.join(errors)}")
+
+
+# Cột của bảng món: (tiêu đề, x, hàm lấy nội dung từ món)
+RECEIPT_COLUMNS = (
+    ("Tên món", 50, lambda item: f"{item['name']} ({item['size']})"),
+    ("Đơn giá", 250, lambda item: f"{item['price']:,.0f} VND"),
+    ("Số lượng", 350, lambda item: str(item['quantity'])),
+    ("Thành tiền", 450, lambda item: f"{item['price'] * item['quantity']:,.0f} VND"),
+)
+
+
+class ReceiptTemplate:
+    """Mẫu hóa đơn được dựng một lần rồi dùng lại cho mọi hóa đơn.
+
+    Lúc khởi tạo tính sẵn vị trí, độ rộng cột và số dòng mỗi trang; phần tĩnh
+    (tên quán, tiêu đề cột) được vẽ thành Form XObject một lần cho mỗi file
+    PDF, các trang sau chỉ tham chiếu lại. Giỏ dài được chia trang, dòng tổng
+    cộng luôn nằm trong trang.
+    """
+
+    HEADER_FORM = "receipt_header"
+    FONT_SIZE = 12
+
+    def __init__(self, page_size=None, title="CAFE TLU", columns=RECEIPT_COLUMNS, line_height=20, margin=50):
+        load_fonts()
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+
+        self.page_size = page_size or A4
+        self.title = title
+        self.line_height = line_height
+        self._string_width = stringWidth
+
+        width, height = self.page_size
+        # Với A4 trùng bố cục cũ: tiêu đề 800, ngày 780, mã đơn 760, hàng tiêu đề cột 700
+        self.title_y = height - 42
+        self.date_y = self.title_y - 20
+        self.order_y = self.date_y - 20
+        self.header_y = self.order_y - 60
+        self.bottom = margin
+        self.rows_per_page = max(1, int((self.header_y - self.bottom) // line_height))
+        # Dòng tổng cộng cách dòng món cuối 40pt
+        self.footer_rows = -(-40 // line_height)
+
+        # Độ rộng tối đa của mỗi cột: tới cột kế tiếp (hoặc lề phải), chừa 10pt
+        edges = [x for _, x, _ in columns[1:]] + [width - margin]
+        self.columns = [
+            (name, x, edge - x - 10, value)
+            for (name, x, value), edge in zip(columns, edges)
+        ]
+
+    def paginate(self, items):
+        """Chia món thành các trang; trang cuối phải còn chỗ cho dòng tổng cộng"""
+        pages = [items[i:i + self.rows_per_page] for i in range(0, len(items), self.rows_per_page)] or [[]]
+        if len(pages[-1]) > self.rows_per_page - self.footer_rows:
+            pages.append([])
+        return pages
+
+    def draw(self, c, order_id, items, total_text, order_date=None):
+        """Vẽ hóa đơn lên canvas bắt đầu từ trang hiện tại"""
+        pages = self.paginate(list(items))
+        date_text = f"Ngày: {(order_date or datetime.now()).strftime('%d/%m/%Y %H:%M')}"
+        y = self.header_y
+
+        for index, rows in enumerate(pages):
+            if index:
+                c.showPage()
+            self._draw_static(c)
+            c.setFont(FONT, self.FONT_SIZE)
+            c.drawString(50, self.date_y, date_text)
+            c.drawString(50, self.order_y, f"Mã đơn: #{order_id}")
+            if len(pages) > 1:
+                c.drawRightString(self.page_size[0] - self.bottom, self.order_y, f"Trang {index + 1}/{len(pages)}")
+
+            y = self.header_y
+            for item in rows:
+                y -= self.line_height
+                for _, x, max_width, value in self.columns:
+                    c.drawString(x, y, self._fit(value(item), max_width))
+
+        # Canh phải theo lề để không tràn trang khi font dự phòng rộng hơn Arial
+        c.setFont(FONT_BOLD, 14)
+        c.drawRightString(self.page_size[0] - self.bottom, y - 40, f"TỔNG CỘNG: {total_text}")
+
+    def render(self, order_id, items, total_text, order_date=None):
+        """Xuất hóa đơn ra PDF trong bộ nhớ, trả về bytes"""
+        from reportlab.pdfgen import canvas
+
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer, pagesize=self.page_size)
+        self.draw(c, order_id, items, total_text, order_date)
+        c.save()
+        return buffer.getvalue()
+
+    def _draw_static(self, c):
+        if not c.hasForm(self.HEADER_FORM):
+            c.beginForm(self.HEADER_FORM)
+            c.setFont(FONT, 16)
+            c.drawString(50, self.title_y, self.title)
+            c.setFont(FONT_BOLD, self.FONT_SIZE)
+            for name, x, _, _ in self.columns:
+                c.drawString(x, self.header_y, name)
+            c.endForm()
+        c.doForm(self.HEADER_FORM)
+
+    def _fit(self, text, max_width):
+        """Cắt bớt chữ quá dài để không đè sang cột bên cạnh"""
+        if self._string_width(text, FONT, self.FONT_SIZE) <= max_width:
+            return text
+        while text and self._string_width(text + "…", FONT, self.FONT_SIZE) > max_width:
+            text = text[:-1]
+        return text + "…"
+
+
+_receipt_template = None
+_receipt_template_lock = threading.Lock()
+
+
+def get_receipt_template():
+    """Mẫu hóa đơn dùng chung trong tiến trình (nạp font và dựng bố cục một lần)"""
+    global _receipt_template
+    with _receipt_template_lock:
+        if _receipt_template is None:
+            _receipt_template = ReceiptTemplate()
+        return _receipt_template
+
+
+class FileSink:
+    """Ghi PDF ra thư mục (mặc định ~/Downloads)"""
+
+    def __init__(self, output_dir=None):
+        self.output_dir = output_dir or os.path.join(os.path.expanduser("~"), "Downloads")
+
+    def send(self, pdf, name):
+        path = os.path.join(self.output_dir, name)
+        with open(path, 'wb') as f:
+            f.write(pdf)
+        return path
+
+
+class PrinterSink:
+    """Gửi PDF tới máy in: Windows in qua ứng dụng PDF mặc định, nơi khác qua hàng đợi lpr"""
+
+    def __init__(self, printer=None):
+        self.printer = printer
+
+    def send(self, pdf, name):
+        if os.name == 'nt':
+            path = FileSink(get_data_dir("receipts", "print")).send(pdf, name)
+            os.startfile(path, "print")
+            return path
+        command = ["lpr", "-T", name] + (["-P", self.printer] if self.printer else [])
+        try:
+            subprocess.run(command, input=pdf, check=True, capture_output=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            raise Exception(f"Lỗi in hóa đơn: {str(e)}")
+        return name
+
+
+class PreviewSink:
+    """Lưu PDF vào thư mục tạm của ứng dụng rồi mở bằng trình xem mặc định"""
+
+    def send(self, pdf, name):
+        path = FileSink(get_data_dir("receipts", "preview")).send(pdf, name)
+        if os.name == 'nt':
+            os.startfile(path)
+        else:
+            subprocess.Popen(["open" if sys.platform == "darwin" else "xdg-open", path])
+        return path
+
+
+def _draw_reprint(c, receipt):
+    get_receipt_template().draw(
+        c, receipt['order_id'], receipt['items'], f"{receipt['total']:,.0f} VND", receipt['order_date']
+    )
+
+
+class _ReportWriter:
+    """Ghi báo cáo từ trên xuống, hết chỗ thì sang trang mới (lặp lại tiêu đề bảng)"""
+
+    TOP, BOTTOM = 800, 50
+
+    def __init__(self, c):
+        self.c = c
+        self.y = self.TOP
+
+    def text(self, text, font=FONT, size=12, gap=18):
+        self._ensure(gap)
+        self.c.setFont(font, size)
+        self.c.drawString(50, self.y, text)
+        self.y -= gap
+
+    def table(self, title, columns, rows):
+        """columns: [(tiêu đề, x)]; cần chỗ cho tiêu đề, hàng tiêu đề và ít nhất một dòng"""
+        self._ensure(20 + 16 * 2)
+        self.text(title, FONT_BOLD, 13, gap=20)
+        self._row([name for name, _ in columns], columns, FONT_BOLD)
+        for values in rows:
+            if self.y - 16 < self.BOTTOM:
+                self._new_page()
+                self._row([name for name, _ in columns], columns, FONT_BOLD)
+            self._row(values, columns, FONT)
+        self.y -= 12
+
+    def _row(self, values, columns, font):
+        self.c.setFont(font, 11)
+        for value, (_, x) in zip(values, columns):
+            self.c.drawString(x, self.y, str(value))
+        self.y -= 16
+
+    def _ensure(self, height):
+        if self.y - height < self.BOTTOM:
+            self._new_page()
+
+    def _new_page(self):
+        self.c.showPage()
+        self.y = self.TOP
+
+
+def _draw_z_report(c, report):
+    writer = _ReportWriter(c)
+    money = "{:,.0f} VND".format
+    span = f"{report['date_from']:%d/%m/%Y}"
+    if report['date_to'] != report['date_from']:
+        span += f" - {report['date_to']:%d/%m/%Y}"
+
+    writer.text("CAFE TLU", size=16, gap=22)
+    writer.text("BÁO CÁO CUỐI NGÀY (Z-REPORT)", FONT_BOLD, 14, gap=20)
+    writer.text(f"Ngày: {span}")
+    writer.text(f"In lúc: {report['generated_at']:%d/%m/%Y %H:%M}", gap=28)
+    writer.text(f"Số đơn: {report['total_orders']}")
+    writer.text(f"Số cốc: {report['total_cups']}")
+    writer.text(f"Doanh thu: {money(report['total_revenue'])}", FONT_BOLD, gap=30)
+
+    writer.table("Theo món", [("Tên món", 50), ("Size", 280), ("Số cốc", 340), ("Doanh thu", 430)], [
+        (row['name'], row['size'], row['total_cups'], money(row['total_revenue'])) for row in report['by_item']
+    ])
+    writer.table("Theo size", [("Size", 50), ("Số cốc", 340), ("Doanh thu", 430)], [
+        (row['size'], row['total_cups'], money(row['total_revenue'])) for row in report['by_size']
+    ])
+    writer.table("Theo nhân viên", [("Nhân viên", 50), ("Số đơn", 250), ("Số cốc", 340), ("Doanh thu", 430)], [
+        (row['username'], row['total_orders'], row['total_cups'], money(row['total_revenue']))
+        for row in report['by_staff']
+    ])
+    writer.table("Theo giờ", [("Giờ", 50), ("Số đơn", 250), ("Doanh thu", 430)], [
+        (f"{row['hour']:02d}:00", row['total_orders'], money(row['total_revenue'])) for row in report['by_hour']
+    ])
+
+
+def _render_receipt_files(receipts, output_dir):
+    """Chạy trong tiến trình con: mỗi hóa đơn một file, trả về số file đã ghi"""
+    template = get_receipt_template()
+    sink = FileSink(output_dir)
+    for receipt in receipts:
+        pdf = template.render(
+            receipt['order_id'], receipt['items'], f"{receipt['total']:,.0f} VND", receipt['order_date']
+        )
+        sink.send(pdf, f"order_{receipt['order_id']}.pdf")
+    return len(receipts)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
 
 class PDFExporter:
     @staticmethod
-    def export_order(order_id, items, total):
-        downloads_dir = os.path.join(os.path.expanduser("~"), "Downloads")
-        filename = os.path.join(downloads_dir, f"order_{order_id}.pdf")
-        c = canvas.Canvas(filename, pagesize=A4)
-
-        c.setFont("Arial", 16)
-        c.drawString(50, 800, "CAFE TLU")
-
-        c.setFont("Arial", 12)
-        c.drawString(50, 780, f"Ngày: {datetime.now().strftime('%d/%m/%Y %H:%M')}")
-        c.drawString(50, 760, f"Mã đơn: #{order_id}")
-
-        y = 700
-        c.setFont("Arial-Bold", 12)
-        c.drawString(50, y, "Tên món")
-        c.drawString(250, y, "Đơn giá")
-        c.drawString(350, y, "Số lượng")
-        c.drawString(450, y, "Thành tiền")
-
-        for item in items:
-            y -= 20
-            c.setFont("Arial", 12)
-            c.drawString(50, y, f"{item['name']} ({item['size']})")
-            c.drawString(250, y, f"{item['price']:,.0f} VND")
-            c.drawString(350, y, str(item['quantity']))
-            c.drawString(450, y, f"{item['price'] * item['quantity']:,.0f} VND")
-
-        total_text = total.split(":")[1].strip()
-        c.setFont("Arial-Bold", 14)
-        c.drawString(400, y - 40, f"TỔNG CỘNG: {total_text}")
-
-        c.save()
\ No newline at end of file
+    def export_order(order_id, items, total, output_dir=None, sink=None):
+        """Xuất một hóa đơn; mặc định ghi file vào `output_dir`, có thể gửi tới máy in/xem trước qua `sink`"""
+        pdf = get_receipt_template().render(order_id, items, total.split(":")[1].strip())
+        return (sink or FileSink(output_dir)).send(pdf, f"order_{order_id}.pdf")
+
+    @staticmethod
+    def export_z_report(report, path, receipts=()):
+        """Báo cáo Z trong một lượt: các trang tổng hợp rồi mỗi hóa đơn in lại một trang, cùng một file.
+
+        `receipts` có thể là generator (ZReportService.iter_receipts); trả về số hóa đơn đã in lại.
+        File được ghi vào tên tạm rồi mới đổi tên, lỗi giữa chừng không để lại PDF hỏng.
+        """
+        from reportlab.pdfgen import canvas
+
+        tmp_path = f"{path}.tmp"
+        try:
+            c = canvas.Canvas(tmp_path, pagesize=get_receipt_template().page_size)
+            _draw_z_report(c, report)
+            count = 0
+            for receipt in receipts:
+                c.showPage()
+                _draw_reprint(c, receipt)
+                count += 1
+            c.save()
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, path)
+        return count
+
+    @staticmethod
+    def export_receipts(receipts, output_dir, expected=None, workers=None):
+        """In lại mỗi hóa đơn ra một file trong `output_dir`, trả về số file.
+
+        Từ PROCESS_POOL_MIN_RECEIPTS hóa đơn (theo `expected`) thì chia theo lô
+        cho nhiều tiến trình; số lô đang chờ được giới hạn để không nạp hết
+        hóa đơn vào bộ nhớ.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        if (expected is not None and expected < PROCESS_POOL_MIN_RECEIPTS) or workers == 1:
+            return _render_receipt_files(list(receipts), output_dir)
+
+        workers = workers or os.cpu_count() or 1
+        count = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for chunk in _chunks(receipts, RECEIPTS_PER_TASK):
+                pending.add(pool.submit(_render_receipt_files, chunk, output_dir))
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    count += sum(future.result() for future in done)
+            count += sum(future.result() for future in pending)
+        return count
@@ -0,0 +1,16 @@
+import sys
+import os
+
+
+def get_data_dir(*parts):
+    """Thư mục lưu dữ liệu cục bộ (CAFETLU_DATA_DIR, mặc định ~/.cafetlu), tự tạo nếu chưa có"""
+    base = os.getenv("CAFETLU_DATA_DIR") or os.path.join(os.path.expanduser("~"), ".cafetlu")
+    path = os.path.join(base, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_asset_path(*parts):
+    """Đường dẫn file đi kèm ứng dụng (assets/), cả khi chạy từ bản đóng gói PyInstaller"""
+    base = getattr(sys, '_MEIPASS', None) or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, "assets", *parts)
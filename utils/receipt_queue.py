@@ -0,0 +1,156 @@
+from utils.exporter import PDFExporter
+from utils.paths import get_data_dir
+from decimal import Decimal
+import threading
+import queue
+import json
+import time
+import os
+
+
+class ReceiptQueueFull(Exception):
+    """Hàng đợi hóa đơn đã đầy"""
+
+
+class ReceiptQueue:
+    """Xuất hóa đơn PDF trên một luồng nền.
+
+    Mỗi job được ghi ra file JSON trước khi vào hàng đợi và chỉ bị xóa khi
+    xuất xong, nên hóa đơn chưa in vẫn còn sau khi tắt ứng dụng. Lỗi thì thử
+    lại với thời gian chờ tăng dần; hết lượt thử thì chuyển sang thư mục failed.
+    Trạng thái báo qua listener(order_id, status, detail) trên luồng worker.
+    """
+
+    QUEUED, DONE, RETRYING, FAILED = 'queued', 'done', 'retrying', 'failed'
+
+    def __init__(self, render=None, maxsize=100, max_attempts=3, retry_delay=2.0, jobs_dir=None):
+        self.render = render or PDFExporter.export_order
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.jobs_dir = jobs_dir or get_data_dir("receipts", "pending")
+        self.failed_dir = os.path.join(os.path.dirname(self.jobs_dir), "failed")
+        os.makedirs(self.failed_dir, exist_ok=True)
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._listeners = []
+        self._recovered = []
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def start(self):
+        """Nạp các job còn dở từ lần chạy trước rồi khởi động worker"""
+        if self._thread is not None:
+            return
+        self._recovered = sorted(
+            os.path.join(self.jobs_dir, name)
+            for name in os.listdir(self.jobs_dir) if name.endswith(".json")
+        )
+        self._thread = threading.Thread(target=self._run, name="receipt-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._queue.put(None)
+
+    def submit(self, order_id, items, total_text):
+        """Đưa một hóa đơn vào hàng đợi, báo ReceiptQueueFull nếu đã đầy"""
+        if self._queue.full():
+            raise ReceiptQueueFull(f"Đang có {self._queue.qsize()} hóa đơn chờ xuất")
+
+        job = {
+            'order_id': order_id,
+            'items': [
+                {
+                    'name': item['name'],
+                    'size': item['size'],
+                    'price': str(item['price']),
+                    'quantity': item['quantity'],
+                }
+                for item in items
+            ],
+            'total': total_text,
+        }
+        path = self._job_path(order_id)
+        self._write_job(path, job)
+        try:
+            self._queue.put_nowait(path)
+        except queue.Full:
+            os.remove(path)
+            raise ReceiptQueueFull(f"Đang có {self._queue.qsize()} hóa đơn chờ xuất")
+        self._notify(order_id, self.QUEUED, None)
+
+    def pending_count(self):
+        return self._queue.qsize() + len(self._recovered)
+
+    def _run(self):
+        while self._recovered and not self._stopping.is_set():
+            self._process(self._recovered[0])
+            self._recovered.pop(0)
+
+        while not self._stopping.is_set():
+            path = self._queue.get()
+            if path is None:
+                break
+            self._process(path)
+
+    def _process(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                job = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Bỏ qua job hóa đơn hỏng {path}: {str(e)}")
+            return
+
+        items = [{**item, 'price': Decimal(item['price'])} for item in job['items']]
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                result = self.render(job['order_id'], items, job['total'])
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    os.replace(path, os.path.join(self.failed_dir, os.path.basename(path)))
+                    self._notify(job['order_id'], self.FAILED, str(e))
+                    return
+                self._notify(job['order_id'], self.RETRYING, str(e))
+                if self._stopping.wait(self.retry_delay * 2 ** (attempt - 1)):
+                    return  # Dừng app: job vẫn còn trên đĩa cho lần sau
+            else:
+                os.remove(path)
+                self._notify(job['order_id'], self.DONE, result)
+                return
+
+    def _notify(self, order_id, status, detail):
+        for listener in list(self._listeners):
+            try:
+                listener(order_id, status, detail)
+            except Exception as e:
+                print(f"Lỗi listener hóa đơn: {str(e)}")
+
+    def _job_path(self, order_id):
+        return os.path.join(self.jobs_dir, f"{time.time_ns()}_{order_id}.json")
+
+    @staticmethod
+    def _write_job(path, job):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+_receipt_queue = None
+_receipt_queue_lock = threading.Lock()
+
+
+def get_receipt_queue():
+    """Hàng đợi hóa đơn dùng chung, khởi động ở lần gọi đầu tiên"""
+    global _receipt_queue
+    with _receipt_queue_lock:
+        if _receipt_queue is None:
+            _receipt_queue = ReceiptQueue()
+            _receipt_queue.start()
+        return _receipt_queue
@@ -0,0 +1,53 @@
+from contextlib import contextmanager
+import threading
+import time
+import sys
+
+
+class StartupProfiler:
+    """Đo thời gian từng giai đoạn khởi động và các module được nhập trong giai đoạn đó.
+
+    Bật bằng `python main.py --profile-startup` hoặc CAFETLU_PROFILE_STARTUP=1;
+    tắt thì `phase` không làm gì. Báo cáo in ra stderr, giống tinh thần của
+    `python -X importtime` nhưng gom theo giai đoạn.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.phases = []  # (tên, luồng, bắt đầu ms, thời gian ms, module mới)
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        before = set(sys.modules)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            # Module mới có thể do luồng khác nhập cùng lúc, chỉ mang tính tham khảo
+            modules = sorted(set(sys.modules) - before)
+            self._record(name, started, elapsed, modules)
+
+    def mark(self, name):
+        """Ghi một mốc thời gian (vd. lúc cửa sổ đăng nhập hiện lên)"""
+        if self.enabled:
+            self._record(name, time.perf_counter(), 0.0, [])
+
+    def _record(self, name, started, elapsed, modules):
+        entry = (name, threading.current_thread().name, (started - self.started) * 1000, elapsed * 1000, modules)
+        with self._lock:
+            self.phases.append(entry)
+        print(self._format(entry), file=sys.stderr)
+
+    @staticmethod
+    def _format(entry):
+        name, thread, offset_ms, elapsed_ms, modules = entry
+        packages = sorted({module.split('.')[0] for module in modules if not module.startswith('_')})
+        imported = f"  +{len(modules)} module ({', '.join(packages[:8])}{', ...' if len(packages) > 8 else ''})" \
+            if modules else ""
+        return f"[startup] {offset_ms:8.1f}ms  {name:<20} {elapsed_ms:8.1f}ms  [{thread}]{imported}"